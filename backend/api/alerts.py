@@ -4,6 +4,7 @@ Alerts API endpoints
 from flask import Blueprint, request, jsonify
 from models.alert import Alert
 from database import db
+from api.pagination import keyset_page, page_args, CursorError
 from datetime import datetime, timedelta
 import uuid
 
@@ -11,10 +12,9 @@ alerts_bp = Blueprint('alerts', __name__)
 
 @alerts_bp.route('/', methods=['GET'])
 def get_alerts():
-    """Get all alerts with optional filters"""
+    """Get alerts with optional filters, newest first (cursor-paginated)"""
     severity = request.args.get('severity', None)
     status = request.args.get('status', None)
-    limit = request.args.get('limit', 50, type=int)
     
     query = Alert.query
     
@@ -23,11 +23,18 @@ def get_alerts():
     if status:
         query = query.filter_by(status=status)
     
-    alerts = query.order_by(Alert.timestamp.desc()).limit(limit).all()
+    try:
+        page = keyset_page(query, Alert, **page_args(default_limit=50))
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
-        'alerts': [alert.to_dict() for alert in alerts],
-        'total': len(alerts)
+        'alerts': [alert.to_dict() for alert in page['items']],
+        # Exact match count only with includeTotal=true, otherwise the page size
+        'total': page.get('total', len(page['items'])),
+        'nextCursor': page['nextCursor'],
+        'prevCursor': page['prevCursor'],
+        'limit': page['limit']
     }), 200
 
 @alerts_bp.route('/unread', methods=['GET'])
@@ -4,16 +4,16 @@ Anomalies API endpoints
 from flask import Blueprint, request, jsonify
 from models.anomaly import Anomaly
 from database import db
-from datetime import datetime, timedelta
+from services.anomaly_stats import anomaly_stats, window_start
+from api.pagination import keyset_page, page_args, CursorError
+from datetime import datetime
 import uuid
 
 anomalies_bp = Blueprint('anomalies', __name__)
 
 @anomalies_bp.route('/', methods=['GET'])
 def get_anomalies():
-    """Get paginated list of anomalies"""
-    page = request.args.get('page', 1, type=int)
-    page_size = request.args.get('pageSize', 10, type=int)
+    """Get anomalies, newest first (cursor-paginated; page/pageSize for numbered pages)"""
     severity = request.args.get('severity', None)
     status = request.args.get('status', None)
     
@@ -24,18 +24,35 @@ def get_anomalies():
     if status:
         query = query.filter_by(status=status)
     
-    query = query.order_by(Anomaly.timestamp.desc())
-    
-    # Paginate
-    pagination = query.paginate(page=page, per_page=page_size, error_out=False)
-    
-    return jsonify({
-        'anomalies': [anomaly.to_dict() for anomaly in pagination.items],
-        'total': pagination.total,
-        'page': page,
-        'pageSize': page_size,
-        'totalPages': pagination.pages
-    }), 200
+    if 'cursor' not in request.args and ('page' in request.args or 'pageSize' in request.args):
+        # Numbered pages: OFFSET scan plus COUNT(*), cost grows with the page number
+        page = request.args.get('page', 1, type=int)
+        page_size = request.args.get('pageSize', 10, type=int)
+        
+        pagination = query.order_by(Anomaly.timestamp.desc()).paginate(page=page, per_page=page_size, error_out=False)
+        
+        return jsonify({
+            'anomalies': [anomaly.to_dict() for anomaly in pagination.items],
+            'total': pagination.total,
+            'page': page,
+            'pageSize': page_size,
+            'totalPages': pagination.pages
+        }), 200
+    
+    try:
+        page = keyset_page(query, Anomaly, **page_args(default_limit=10))
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    response = {
+        'anomalies': [anomaly.to_dict() for anomaly in page['items']],
+        'nextCursor': page['nextCursor'],
+        'prevCursor': page['prevCursor'],
+        'limit': page['limit']
+    }
+    if 'total' in page:
+        response['total'] = page['total']
+    return jsonify(response), 200
 
 @anomalies_bp.route('/recent', methods=['GET'])
 def get_recent_anomalies():
@@ -51,79 +68,13 @@ def get_recent_anomalies():
 @anomalies_bp.route('/stats', methods=['GET'])
 def get_anomaly_stats():
     """Get anomaly statistics"""
-    # Get date range
     time_range = request.args.get('timeRange', '24h')
     
-    if time_range == '1h':
-        since = datetime.utcnow() - timedelta(hours=1)
-    elif time_range == '24h':
-        since = datetime.utcnow() - timedelta(days=1)
-    elif time_range == '7d':
-        since = datetime.utcnow() - timedelta(days=7)
-    elif time_range == '30d':
-        since = datetime.utcnow() - timedelta(days=30)
-    else:
-        since = datetime.utcnow() - timedelta(days=1)
-    
-    # Count by severity
-    critical_count = Anomaly.query.filter(
-        Anomaly.timestamp >= since,
-        Anomaly.severity == 'critical'
-    ).count()
-    
-    high_count = Anomaly.query.filter(
-        Anomaly.timestamp >= since,
-        Anomaly.severity == 'high'
-    ).count()
-    
-    medium_count = Anomaly.query.filter(
-        Anomaly.timestamp >= since,
-        Anomaly.severity == 'medium'
-    ).count()
-    
-    low_count = Anomaly.query.filter(
-        Anomaly.timestamp >= since,
-        Anomaly.severity == 'low'
-    ).count()
-    
-    # Count by type
-    anomalies = Anomaly.query.filter(Anomaly.timestamp >= since).all()
-    type_distribution = {}
-    for anomaly in anomalies:
-        type_distribution[anomaly.type] = type_distribution.get(anomaly.type, 0) + 1
-    
-    # Count by status
-    active_count = Anomaly.query.filter(
-        Anomaly.timestamp >= since,
-        Anomaly.status == 'active'
-    ).count()
-    
-    blocked_count = Anomaly.query.filter(
-        Anomaly.timestamp >= since,
-        Anomaly.status == 'blocked'
-    ).count()
-    
-    resolved_count = Anomaly.query.filter(
-        Anomaly.timestamp >= since,
-        Anomaly.status == 'resolved'
-    ).count()
+    # One grouped query for all distributions
+    stats = anomaly_stats(db.session, window_start(time_range))
+    stats['timeRange'] = time_range
     
-    return jsonify({
-        'totalAnomalies': len(anomalies),
-        'bySeverity': {
-            'critical': critical_count,
-            'high': high_count,
-            'medium': medium_count,
-            'low': low_count
-        },
-        'byType': type_distribution,
-        'byStatus': {
-            'active': active_count,
-            'blocked': blocked_count,
-            'resolved': resolved_count
-        },
-        'timeRange': time_range
-    }), 200
+    return jsonify(stats), 200
 
 @anomalies_bp.route('/<anomaly_id>', methods=['GET'])
 def get_anomaly(anomaly_id):
@@ -4,13 +4,13 @@ Connections API endpoints
 from flask import Blueprint, request, jsonify
 from models.connection import Connection
 from database import db
+from api.pagination import keyset_page, page_args, CursorError
 
 connections_bp = Blueprint('connections', __name__)
 
 @connections_bp.route('/', methods=['GET'])
 def get_connections():
-    """Get active connections"""
-    limit = request.args.get('limit', 100, type=int)
+    """Get connections, newest first (cursor-paginated)"""
     active_only = request.args.get('activeOnly', 'true').lower() == 'true'
     
     query = Connection.query
@@ -18,11 +18,18 @@ def get_connections():
     if active_only:
         query = query.filter_by(is_active=True)
     
-    connections = query.order_by(Connection.timestamp.desc()).limit(limit).all()
+    try:
+        page = keyset_page(query, Connection, **page_args(default_limit=100))
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
-        'connections': [conn.to_dict() for conn in connections],
-        'total': len(connections)
+        'connections': [conn.to_dict() for conn in page['items']],
+        # Exact match count only with includeTotal=true, otherwise the page size
+        'total': page.get('total', len(page['items'])),
+        'nextCursor': page['nextCursor'],
+        'prevCursor': page['prevCursor'],
+        'limit': page['limit']
     }), 200
 
 @connections_bp.route('/stats', methods=['GET'])
@@ -1,16 +1,47 @@
 """
 Model API endpoints
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from models.model_metrics import ModelMetrics
+from services.micro_batcher import MicroBatcher
 from services.ml_service import MLService
+from services.model_registry import ModelRegistry, available_versions
+from services.retrain_jobs import JobManager
+from services.retrain_scheduler import RetrainScheduler
+from services import model_store
+from services import inference_pool
 from database import db
+from config import Config
 from datetime import datetime
+import threading
 
 model_bp = Blueprint('model', __name__)
 
-# Initialize ML service
-ml_service = MLService()
+# Active model version; services are swapped atomically on rollout
+model_registry = ModelRegistry(model_dir=Config.MODEL_PATH)
+
+# Models load lazily on first use; warm them in the background so the
+# worker can accept requests while artifacts are still loading
+if Config.MODEL_WARMUP_ON_START:
+    model_registry.multi_model_service.warm_up(background=True)
+    threading.Thread(target=model_registry.ml_service.ensure_loaded, name='model-warmup-detector', daemon=True).start()
+
+# Background retraining (one job at a time per node)
+retrain_jobs = JobManager(model_dir=Config.MODEL_PATH)
+
+# Periodic retraining of all models (one scheduling worker per node);
+# started by the server (app.py, gunicorn.conf.py), not on import
+retrain_scheduler = RetrainScheduler(model_registry, model_dir=Config.MODEL_PATH)
+
+# Pick up versions rolled out by other workers or nodes
+model_registry.start()
+
+def _predict_batch(records):
+    """Score a batch on the currently active model version"""
+    return model_registry.ml_service.predict_batch(records)
+
+# Coalesce concurrent single-record predictions into batched model calls
+predict_batcher = MicroBatcher(_predict_batch) if Config.MICRO_BATCH_ENABLED else None
 
 @model_bp.route('/status', methods=['GET'])
 def get_model_status():
@@ -65,7 +96,17 @@ def predict():
     
     try:
         # Use ML service to make prediction
-        prediction = ml_service.predict(data)
+        if predict_batcher:
+            try:
+                prediction = predict_batcher.submit(data)
+            except TimeoutError:
+                raise
+            except Exception as e:
+                # Same contract as MLService.predict: bad input scores as 'error'
+                print(f"❌ Prediction error: {e}")
+                prediction = MLService.error_prediction(e)
+        else:
+            prediction = model_registry.ml_service.predict(data)
         
         return jsonify({
             'prediction': prediction['prediction'],
@@ -80,19 +121,212 @@ def predict():
             'message': str(e)
         }), 500
 
-@model_bp.route('/retrain', methods=['POST'])
-def retrain_model():
-    """Trigger model retraining"""
+def _get_batch_records():
+    """Read a batch of records from the request body, or return an error response"""
+    data = request.get_json(silent=True)
+    
+    # Accept either a bare list or {"records": [...]}
+    records = data.get('records') if isinstance(data, dict) else data
+    
+    if not records or not isinstance(records, list):
+        return None, (jsonify({'error': 'No records provided'}), 400)
+    
+    if len(records) > Config.PREDICT_BATCH_MAX_SIZE:
+        return None, (jsonify({
+            'error': 'Batch too large',
+            'message': f'At most {Config.PREDICT_BATCH_MAX_SIZE} records per request'
+        }), 413)
+    
+    if not all(isinstance(record, dict) for record in records):
+        return None, (jsonify({'error': 'Each record must be an object'}), 400)
+    
+    return records, None
+
+def _batch_prediction(prediction):
+    """One entry of a batch response, carrying the reason when its record was rejected"""
+    entry = {
+        'prediction': prediction['prediction'],
+        'confidence': prediction['confidence'],
+        'anomalyScore': prediction['anomaly_score'],
+        'severity': prediction['severity']
+    }
+    if 'error' in prediction:
+        entry['error'] = prediction['error']
+    return entry
+
+@model_bp.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Make predictions on a batch of records in a single pass"""
+    records, error = _get_batch_records()
+    if error:
+        return error
+    
     try:
-        result = ml_service.retrain()
+        predictions = model_registry.ml_service.predict_batch(records)
         
         return jsonify({
-            'message': 'Model retraining initiated',
-            'status': result['status'],
+            'predictions': [_batch_prediction(prediction) for prediction in predictions],
+            'count': len(predictions),
+            'errors': sum(1 for prediction in predictions if 'error' in prediction),
             'timestamp': datetime.utcnow().isoformat()
         }), 200
     except Exception as e:
         return jsonify({
-            'error': 'Retraining failed',
+            'error': 'Prediction failed',
             'message': str(e)
         }), 500
+
+@model_bp.route('/analyze', methods=['POST'])
+def analyze():
+    """Run the multi-model cascade over a batch of flows"""
+    records, error = _get_batch_records()
+    if error:
+        return error
+    
+    try:
+        # Hold one bundle for the whole request in case a new version is swapped in
+        multi_model_service = model_registry.multi_model_service
+        timings = {}
+        results = multi_model_service.analyze_many(records, timings=timings)
+        anomalous = sum(1 for result in results if result['analysis'].get('anomaly_detection', {}).get('is_anomaly'))
+        
+        return jsonify({
+            'results': [result['analysis'] for result in results],
+            'count': len(results),
+            'anomalous': anomalous,
+            'errors': sum(1 for result in results if 'error' in result['analysis']),
+            'timingsMs': timings,
+            'models': multi_model_service.get_models_status(),
+            'timestamp': datetime.utcnow().isoformat()
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'error': 'Analysis failed',
+            'message': str(e)
+        }), 500
+
+@model_bp.route('/batching', methods=['GET'])
+def get_batching_stats():
+    """Get micro-batching statistics for /predict"""
+    if not predict_batcher:
+        return jsonify({'enabled': False}), 200
+    
+    return jsonify(predict_batcher.get_stats()), 200
+
+@model_bp.route('/readiness', methods=['GET'])
+def get_model_readiness():
+    """Get which models are loaded in this worker"""
+    bundle = model_registry.current
+    readiness = bundle.multi_model_service.get_readiness()
+    readiness['detector'] = bundle.ml_service.get_readiness()
+    
+    return jsonify(readiness), 200 if readiness['ready'] else 503
+
+@model_bp.route('/cache', methods=['GET'])
+def get_prediction_cache_stats():
+    """Get prediction cache statistics for the active model"""
+    cache = model_registry.ml_service.prediction_cache
+    if cache is None:
+        return jsonify({'enabled': False}), 200
+    
+    stats = cache.get_stats()
+    stats['version'] = model_registry.version
+    return jsonify(stats), 200
+
+@model_bp.route('/inference', methods=['GET'])
+def get_inference_stats():
+    """Get the inference backend and, for the process backend, its pool statistics"""
+    if Config.INFERENCE_BACKEND != 'process':
+        return jsonify({'backend': Config.INFERENCE_BACKEND}), 200
+    
+    return jsonify(inference_pool.get_pool().get_stats()), 200
+
+@model_bp.route('/memory', methods=['GET'])
+def get_model_memory():
+    """Get this worker's memory usage and the model artifacts it holds"""
+    return jsonify({
+        'memory': model_store.memory_usage(),
+        'models': model_store.get_loaded_models(),
+        'mmapMode': Config.MODEL_MMAP_MODE or None
+    }), 200
+
+@model_bp.route('/versions', methods=['GET'])
+def get_model_versions():
+    """Get the active model version and the versions available on disk"""
+    return jsonify(model_registry.get_status()), 200
+
+@model_bp.route('/versions/activate', methods=['POST'])
+def activate_model_version():
+    """Roll out a model version to every worker without a restart"""
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+    
+    if not version:
+        return jsonify({'error': 'No version provided'}), 400
+    
+    version = str(version)
+    if version not in available_versions(Config.MODEL_PATH):
+        return jsonify({
+            'error': 'Unknown version',
+            'message': f'No artifacts for version {version} in {Config.MODEL_PATH}'
+        }), 404
+    
+    try:
+        result = model_registry.rollout(version)
+        result['timestamp'] = datetime.utcnow().isoformat()
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({
+            'error': 'Activation failed',
+            'message': str(e)
+        }), 500
+
+@model_bp.route('/retrain', methods=['POST'])
+def retrain_model():
+    """Start a background retraining job"""
+    job = retrain_jobs.submit(current_app._get_current_object(), model_registry)
+    
+    if job is None:
+        active = retrain_jobs.active_job()
+        return jsonify({
+            'error': 'Retraining already in progress',
+            'jobId': active.id if active else None
+        }), 409
+    
+    response = job.to_dict()
+    response['message'] = 'Model retraining initiated'
+    response['timestamp'] = datetime.utcnow().isoformat()
+    return jsonify(response), 202, {'Location': f'/api/model/retrain/{job.id}'}
+
+@model_bp.route('/retrain', methods=['GET'])
+def list_retrain_jobs():
+    """List recent retraining jobs of every worker on this node"""
+    return jsonify({'jobs': [job.to_dict() for job in retrain_jobs.list()]}), 200
+
+@model_bp.route('/retrain/schedule', methods=['GET'])
+def get_retrain_schedule():
+    """Get the periodic retraining schedule and the outcome of the last run"""
+    return jsonify(retrain_scheduler.get_status()), 200
+
+@model_bp.route('/retrain/<job_id>', methods=['GET'])
+def get_retrain_job(job_id):
+    """Get the status and progress of a retraining job"""
+    job = retrain_jobs.get(job_id)
+    
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job.to_dict()), 200
+
+@model_bp.route('/retrain/<job_id>', methods=['DELETE'])
+def cancel_retrain_job(job_id):
+    """Cancel a running retraining job"""
+    job = retrain_jobs.cancel(job_id)
+    
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if job.finished and not job.cancel_requested.is_set():
+        return jsonify({'error': 'Job already finished', 'status': job.status}), 409
+    
+    return jsonify(job.to_dict()), 200
@@ -0,0 +1,94 @@
+"""
+Keyset (cursor) pagination for list endpoints
+Rows are ordered newest first on (timestamp, id) and each page is read with a
+row-value seek past the previous page's edge instead of an OFFSET, so every
+page costs one index range scan. Cursors are opaque URL-safe tokens
+"""
+import base64
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import tuple_
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+class CursorError(ValueError):
+    """Raised for a cursor that cannot be decoded"""
+
+def encode_cursor(timestamp, row_id, direction):
+    """Opaque cursor pointing just past a row ('next' = older rows, 'prev' = newer rows)"""
+    payload = json.dumps([timestamp.isoformat(), row_id, direction], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """(timestamp, id, direction) of a cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id, direction = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return datetime.fromisoformat(timestamp), row_id, direction
+    except (ValueError, TypeError) as e:
+        raise CursorError(f'Invalid cursor: {cursor}') from e
+
+def page_args(default_limit=DEFAULT_LIMIT):
+    """cursor, limit and includeTotal request arguments"""
+    limit = request.args.get('limit', default_limit, type=int)
+    return {
+        'cursor': request.args.get('cursor') or None,
+        'limit': max(1, min(limit, MAX_LIMIT)),
+        'with_total': request.args.get('includeTotal', 'false').lower() == 'true'
+    }
+
+def keyset_page(query, model, cursor=None, limit=DEFAULT_LIMIT, with_total=False):
+    """
+    One page of a (filtered) query, newest first.
+
+    Returns a dict with the page's items, nextCursor/prevCursor (None when
+    there is nothing further in that direction) and, only if with_total is
+    set, the exact number of matching rows (a COUNT over the filter).
+    """
+    key = tuple_(model.timestamp, model.id)
+    direction = 'next'
+    page_query = query
+
+    if cursor:
+        timestamp, row_id, direction = decode_cursor(cursor)
+        edge = tuple_(timestamp, row_id)
+        page_query = page_query.filter(key < edge if direction == 'next' else key > edge)
+
+    if direction == 'next':
+        page_query = page_query.order_by(model.timestamp.desc(), model.id.desc())
+    else:
+        page_query = page_query.order_by(model.timestamp.asc(), model.id.asc())
+
+    # One extra row tells whether another page follows in this direction
+    rows = page_query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == 'prev':
+        rows.reverse()
+
+    # Paging back from a cursor always has older rows behind it, and vice versa
+    if direction == 'next':
+        older, newer = has_more, cursor is not None
+    else:
+        older, newer = True, has_more
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if older:
+            next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id, 'next')
+        if newer:
+            prev_cursor = encode_cursor(rows[0].timestamp, rows[0].id, 'prev')
+
+    page = {
+        'items': rows,
+        'nextCursor': next_cursor,
+        'prevCursor': prev_cursor,
+        'limit': limit
+    }
+    if with_total:
+        page['total'] = query.order_by(None).count()
+    return page
@@ -71,6 +71,10 @@ if __name__ == '__main__':
     # Start background monitoring service
     start_monitoring(socketio, app)
     
+    # Periodic retraining (no-op unless RETRAIN_SCHEDULE_ENABLED)
+    from api.model import retrain_scheduler
+    retrain_scheduler.start()
+    
     # Run the application
     print(f"🚀 Starting AI Anomaly Detection Backend on port {port}...")
     print(f"📊 API available at: http://localhost:{port}/api")
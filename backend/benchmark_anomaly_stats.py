@@ -0,0 +1,172 @@
+"""
+Benchmark /api/anomalies/stats aggregation
+Fills an anomalies table with N synthetic rows and times the old per-bucket
+COUNT queries plus full row load against the single grouped query
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import create_engine, insert, select, func
+from sqlalchemy.orm import Session
+from models.anomaly import Anomaly
+from services.anomaly_stats import anomaly_stats, window_start, SEVERITIES, STATUSES
+
+TYPES = ('dos', 'port_scan', 'brute_force', 'data_exfiltration', 'malware', 'suspicious_traffic')
+PROTOCOLS = ('TCP', 'UDP', 'HTTP', 'HTTPS', 'SSH', 'FTP')
+
+INSERT_CHUNK = 50000
+
+def populate(engine, n_rows, days=30, seed=42):
+    """Create the anomalies table and insert n_rows spread over the last days"""
+    table = Anomaly.__table__
+    table.drop(engine, checkfirst=True)
+    table.create(engine)
+
+    # Bulk load without indexes, then build them once
+    for index in table.indexes:
+        index.drop(engine)
+
+    rng = np.random.default_rng(seed)
+    now = datetime.utcnow()
+    window_seconds = days * 86400
+
+    with engine.begin() as connection:
+        for start in range(0, n_rows, INSERT_CHUNK):
+            n = min(INSERT_CHUNK, n_rows - start)
+            offsets = rng.integers(0, window_seconds, size=n)
+            severities = rng.choice(SEVERITIES, size=n, p=[0.05, 0.15, 0.3, 0.5])
+            types = rng.choice(TYPES, size=n)
+            statuses = rng.choice(STATUSES, size=n, p=[0.7, 0.2, 0.1])
+            protocols = rng.choice(PROTOCOLS, size=n)
+            ports = rng.integers(1, 65535, size=(n, 2))
+
+            connection.execute(insert(Anomaly.__table__), [{
+                'id': f'{start + i:032x}',
+                'timestamp': now - timedelta(seconds=int(offsets[i])),
+                'source_ip': f'10.0.{ports[i, 0] % 256}.{ports[i, 1] % 256}',
+                'destination_ip': '192.168.1.10',
+                'source_port': int(ports[i, 0]),
+                'destination_port': int(ports[i, 1]),
+                'type': types[i],
+                'severity': severities[i],
+                'confidence': 0.9,
+                'status': statuses[i],
+                'protocol': protocols[i],
+                'bytes_transferred': int(ports[i, 0]) * 100,
+                'packets': int(ports[i, 1] % 1000)
+            } for i in range(n)])
+            print(f"   {start + n:,}/{n_rows:,} rows", end='\r')
+    print()
+
+    for index in table.indexes:
+        index.create(engine)
+
+def legacy_stats(session, since):
+    """The previous implementation: seven COUNT queries and every row loaded for the type counts"""
+    def count(*conditions):
+        return session.query(Anomaly).filter(Anomaly.timestamp >= since, *conditions).count()
+
+    by_severity = {severity: count(Anomaly.severity == severity) for severity in SEVERITIES}
+
+    anomalies = session.query(Anomaly).filter(Anomaly.timestamp >= since).all()
+    by_type = {}
+    for anomaly in anomalies:
+        by_type[anomaly.type] = by_type.get(anomaly.type, 0) + 1
+
+    by_status = {status: count(Anomaly.status == status) for status in STATUSES}
+
+    return {
+        'totalAnomalies': len(anomalies),
+        'bySeverity': by_severity,
+        'byType': by_type,
+        'byStatus': by_status
+    }
+
+def measure(function, engine, since, repeat):
+    """Best wall time, then peak Python memory (a separate traced run), of one stats implementation"""
+    timings = []
+    for _ in range(repeat):
+        with Session(engine) as session:
+            started = time.perf_counter()
+            result = function(session, since)
+            timings.append(time.perf_counter() - started)
+
+    with Session(engine) as session:
+        tracemalloc.start()
+        function(session, since)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return min(timings), peak, result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark anomaly stats aggregation')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000000, 10000000], help='Table sizes to benchmark')
+    parser.add_argument('--database-url', default=None,
+                        help='Database to benchmark on; its anomalies table is dropped and refilled '
+                             '(default: a temporary SQLite file)')
+    parser.add_argument('--legacy-max-rows', type=int, default=1000000,
+                        help='Skip the old implementation above this many rows (it loads every row into memory)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per implementation (best time is reported)')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    database_url = args.database_url
+    if database_url is None:
+        tmp_dir = tempfile.mkdtemp(prefix='anomaly-stats-')
+        database_url = f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}"
+
+    engine = create_engine(database_url)
+    since = window_start('30d')
+    report = []
+
+    try:
+        for n_rows in args.rows:
+            print(f"\n🔄 Inserting {n_rows:,} anomalies ({engine.dialect.name})...")
+            started = time.perf_counter()
+            populate(engine, n_rows)
+            print(f"   Loaded in {time.perf_counter() - started:.1f}s")
+
+            grouped_seconds, grouped_peak, grouped = measure(anomaly_stats, engine, since, args.repeat)
+            row = {'rows': n_rows, 'grouped': (grouped_seconds, grouped_peak), 'legacy': None}
+
+            if n_rows <= args.legacy_max_rows:
+                legacy_seconds, legacy_peak, legacy = measure(legacy_stats, engine, since, 1)
+                if legacy != grouped:
+                    raise RuntimeError(f'Results differ at {n_rows:,} rows: {legacy} != {grouped}')
+                row['legacy'] = (legacy_seconds, legacy_peak)
+            report.append(row)
+
+            with engine.connect() as connection:
+                total = connection.execute(select(func.count()).select_from(Anomaly.__table__)).scalar()
+            print(f"   ✅ {total:,} rows, {grouped['totalAnomalies']:,} in the 30d window")
+    finally:
+        engine.dispose()
+        if tmp_dir:
+            for filename in os.listdir(tmp_dir):
+                os.remove(os.path.join(tmp_dir, filename))
+            os.rmdir(tmp_dir)
+
+    print("\n" + "=" * 78)
+    print("📊 /api/anomalies/stats (timeRange=30d)".center(78))
+    print("=" * 78)
+    print(f"   {'Rows':>12s} {'Old time':>12s} {'Old peak mem':>14s} {'Grouped time':>14s} {'Grouped mem':>12s} {'Speedup':>9s}")
+    for row in report:
+        grouped_seconds, grouped_peak = row['grouped']
+        if row['legacy']:
+            legacy_seconds, legacy_peak = row['legacy']
+            legacy = f"{legacy_seconds:>11.2f}s {legacy_peak / 1024 / 1024:>11.1f} MB"
+            speedup = f"{legacy_seconds / grouped_seconds:>8.1f}x"
+        else:
+            legacy = f"{'skipped':>12s} {'':>14s}"
+            speedup = f"{'-':>9s}"
+        print(f"   {row['rows']:>12,} {legacy} {grouped_seconds:>13.3f}s {grouped_peak / 1024:>9.1f} KB {speedup}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Gradient boosting engines for the severity predictor and traffic forecaster
+'exact' is sklearn's GradientBoosting*, 'hist' the histogram-binned
+HistGradientBoosting* with early stopping and multi-threaded training.
+Both expose predict/predict_proba, so the serving code loads either as is
+"""
+from sklearn.ensemble import (
+    GradientBoostingClassifier, GradientBoostingRegressor,
+    HistGradientBoostingClassifier, HistGradientBoostingRegressor
+)
+from threadpoolctl import threadpool_limits
+from config import Config
+
+ENGINES = ('exact', 'hist')
+
+def boosting_engine(engine=None):
+    """Validated engine name, defaulting to BOOSTING_ENGINE"""
+    engine = (engine or Config.BOOSTING_ENGINE).lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown boosting engine '{engine}' (expected one of: {', '.join(ENGINES)})")
+    return engine
+
+def build_model(task, engine=None, n_estimators=100, learning_rate=0.1, max_depth=5,
+                min_samples_split=2, random_state=42, verbose=1):
+    """Unfitted boosting model for task 'classifier' or 'regressor'"""
+    if boosting_engine(engine) == 'hist':
+        model_class = HistGradientBoostingClassifier if task == 'classifier' else HistGradientBoostingRegressor
+        return model_class(
+            max_iter=n_estimators,
+            learning_rate=learning_rate,
+            max_depth=max_depth,
+            # Stop once the held-out loss stops improving
+            early_stopping=True,
+            validation_fraction=0.1,
+            n_iter_no_change=10,
+            random_state=random_state,
+            verbose=verbose
+        )
+
+    model_class = GradientBoostingClassifier if task == 'classifier' else GradientBoostingRegressor
+    return model_class(
+        n_estimators=n_estimators,
+        learning_rate=learning_rate,
+        max_depth=max_depth,
+        min_samples_split=min_samples_split,
+        random_state=random_state,
+        verbose=verbose
+    )
+
+def fit_model(model, X, y, n_jobs=-1):
+    """Fit a model, limiting its OpenMP threads to n_jobs (-1 = all cores; exact boosting is single-threaded)"""
+    if n_jobs and n_jobs > 0:
+        with threadpool_limits(limits=n_jobs, user_api='openmp'):
+            return model.fit(X, y)
+    return model.fit(X, y)
+
+def model_engine(model):
+    """Engine a fitted model was built with"""
+    return 'hist' if hasattr(model, '_predictors') else 'exact'
+
+def boosting_iterations(model):
+    """Boosting iterations actually fitted (fewer than requested after early stopping)"""
+    if hasattr(model, 'n_iter_'):
+        return int(model.n_iter_)
+    return int(getattr(model, 'n_estimators_', 0))
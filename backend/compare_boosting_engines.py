@@ -0,0 +1,129 @@
+"""
+Compare the boosting engines of the severity predictor and traffic forecaster
+Fits both engines on the same cached feature matrices and reports fit time,
+single-row latency, batch throughput, accuracy and model size side by side
+"""
+import sys
+import io
+import contextlib
+import tempfile
+import json
+import time
+import argparse
+import joblib
+import numpy as np
+from sklearn.metrics import accuracy_score, r2_score
+from boosting import ENGINES, boosting_iterations
+from dataset_store import dataset_path
+
+DATA_DIR = './data/datasets'
+
+def load_trainers(engine, model_dir):
+    """Severity predictor and traffic forecaster trainers for one engine"""
+    from train_severity_predictor import SeverityPredictor
+    from train_traffic_forecaster import TrafficForecaster
+
+    return {
+        'severity_predictor': SeverityPredictor(model_dir=model_dir, data_dir=DATA_DIR, engine=engine),
+        'traffic_forecaster': TrafficForecaster(model_dir=model_dir, data_dir=DATA_DIR, engine=engine)
+    }
+
+def ensure_datasets():
+    """Generate the training datasets that do not exist yet"""
+    trainers = load_trainers('exact', tempfile.gettempdir())
+    if not dataset_path(DATA_DIR, 'severity_prediction'):
+        trainers['severity_predictor'].generate_severity_dataset(n_samples=3000)
+    if not dataset_path(DATA_DIR, 'traffic_forecasting'):
+        trainers['traffic_forecaster'].generate_timeseries_dataset(n_days=30, samples_per_day=96)
+
+def single_row_latency_ms(predict, X, rows=200):
+    """Median latency of scoring one row at a time (as the API does per request)"""
+    timings = []
+    for i in range(min(rows, len(X))):
+        row = X[i:i + 1]
+        started = time.perf_counter()
+        predict(row)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings) * 1000)
+
+def batch_throughput(predict, X, min_rows=50000):
+    """Rows scored per second on one large batch"""
+    batch = np.tile(X, (max(1, -(-min_rows // len(X))), 1))
+    started = time.perf_counter()
+    predict(batch)
+    return len(batch) / (time.perf_counter() - started)
+
+def benchmark(name, trainer, features, n_jobs):
+    """Fit one model with one engine and measure it"""
+    # Silence the trainers' progress output
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        trainer.train_model(features=features, n_jobs=n_jobs)
+        fit_seconds = time.perf_counter() - started
+
+    model = trainer.model
+    X_test, y_test = np.asarray(features.X_test), features.y_test
+
+    if name == 'severity_predictor':
+        # The service scores severity through predict_proba
+        predict = model.predict_proba
+        score_name, score = 'accuracy', accuracy_score(y_test, model.predict(X_test))
+    else:
+        predict = model.predict
+        score_name, score = 'r2_score', r2_score(y_test, model.predict(X_test))
+
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+
+    return {
+        'fitSeconds': round(fit_seconds, 3),
+        'iterations': boosting_iterations(model),
+        'singleRowLatencyMs': round(single_row_latency_ms(predict, X_test), 4),
+        'batchRowsPerSecond': round(batch_throughput(predict, X_test)),
+        score_name: round(float(score), 4),
+        'artifactBytes': buffer.getbuffer().nbytes
+    }
+
+def print_report(report):
+    """Print the side-by-side table"""
+    print("\n" + "=" * 70)
+    print("⚖️  BOOSTING ENGINES".center(70))
+    print("=" * 70)
+
+    for name, engines in report['models'].items():
+        print(f"\n📦 {name.replace('_', ' ').title()}")
+        print(f"   {'':24s}" + ''.join(f"{engine:>16s}" for engine in engines))
+        for metric in next(iter(engines.values())):
+            values = ''.join(f"{engines[engine][metric]:>16,}" if isinstance(engines[engine][metric], int)
+                             else f"{engines[engine][metric]:>16.4f}" for engine in engines)
+            print(f"   {metric:24s}{values}")
+
+    print(f"\n   n_jobs={report['nJobs']}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare exact and histogram gradient boosting')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES), help='Engines to compare')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='Training threads of the histogram engine (-1 = all cores)')
+    parser.add_argument('--output', default=None, help='Also write the report to this JSON file')
+    args = parser.parse_args()
+
+    ensure_datasets()
+
+    report = {'nJobs': args.n_jobs, 'models': {}}
+    for engine in args.engines:
+        # Nothing is saved; model_dir only has to exist
+        for name, trainer in load_trainers(engine, tempfile.gettempdir()).items():
+            print(f"🔄 {name.replace('_', ' ').title()}: {engine} boosting...")
+            features = trainer.load_features()
+            report['models'].setdefault(name, {})[engine] = benchmark(name, trainer, features, args.n_jobs)
+
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved: {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -31,11 +31,57 @@ class Config:
     MODEL_VERSION = os.getenv('MODEL_VERSION', '1.0.0')
     PREDICTION_THRESHOLD = float(os.getenv('PREDICTION_THRESHOLD', 0.7))
     RETRAIN_INTERVAL = int(os.getenv('RETRAIN_INTERVAL', 86400))
+    RETRAIN_SCHEDULE_ENABLED = os.getenv('RETRAIN_SCHEDULE_ENABLED', 'false').lower() == 'true'  # opt in: trains on fresh data and rolls out
+    RETRAIN_OFF_PEAK_HOURS = os.getenv('RETRAIN_OFF_PEAK_HOURS', '1-5')  # UTC hours, end exclusive
+    RETRAIN_NICE = int(os.getenv('RETRAIN_NICE', 10))  # niceness of the training process
+    RETRAIN_MAX_REGRESSION = float(os.getenv('RETRAIN_MAX_REGRESSION', 0.01))  # allowed metric drop before rejecting
+    PREDICT_BATCH_MAX_SIZE = int(os.getenv('PREDICT_BATCH_MAX_SIZE', 10000))
+    FAST_FOREST_SCORING = os.getenv('FAST_FOREST_SCORING', 'false').lower() == 'true'
+    FOLD_SCALERS = os.getenv('FOLD_SCALERS', 'true').lower() == 'true'
+    MODEL_MMAP_MODE = os.getenv('MODEL_MMAP_MODE', 'r')  # maps the flat scorer bundle; sklearn tree nodes are always copied, empty to disable
+    MODEL_PRELOAD = os.getenv('MODEL_PRELOAD', 'true').lower() == 'true'
+    MODEL_LAZY_LOADING = os.getenv('MODEL_LAZY_LOADING', 'true').lower() == 'true'
+    MODEL_WARMUP_ON_START = os.getenv('MODEL_WARMUP_ON_START', 'true').lower() == 'true'
+    MODEL_LOAD_WORKERS = int(os.getenv('MODEL_LOAD_WORKERS', 4))
+    MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', 5))  # seconds between ACTIVE_VERSION checks
+    MODEL_ROLLOUT_REDIS = os.getenv('MODEL_ROLLOUT_REDIS', 'false').lower() == 'true'
+    MODEL_ROLLOUT_CHANNEL = os.getenv('MODEL_ROLLOUT_CHANNEL', 'model-rollout')
+    
+    # Prediction cache (repeated flows skip model scoring)
+    PREDICTION_CACHE_ENABLED = os.getenv('PREDICTION_CACHE_ENABLED', 'true').lower() == 'true'
+    PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 100000))
+    PREDICTION_CACHE_TTL = float(os.getenv('PREDICTION_CACHE_TTL', 300))  # seconds, 0 = no expiry
+    PREDICTION_CACHE_QUANTIZE_BITS = int(os.getenv('PREDICTION_CACHE_QUANTIZE_BITS', 0))  # float32 mantissa bits dropped, 0 = exact
+    
+    # Inference backend: inline (in the API worker) or process (dedicated scoring processes)
+    INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'inline').lower()
+    INFERENCE_PROCESSES = int(os.getenv('INFERENCE_PROCESSES', 2))  # per API worker, 0 = one per CPU
+    INFERENCE_TIMEOUT = float(os.getenv('INFERENCE_TIMEOUT', 30))
+    
+    # Training data extraction
+    TRAINING_WINDOW_DAYS = int(os.getenv('TRAINING_WINDOW_DAYS', 30))  # 0 = all stored anomalies
+    TRAINING_SAMPLE_SIZE = int(os.getenv('TRAINING_SAMPLE_SIZE', 100000))  # reservoir size, 0 = no sampling
+    TRAINING_CHUNK_SIZE = int(os.getenv('TRAINING_CHUNK_SIZE', 10000))  # rows per server-side cursor fetch
+    DATASET_FORMAT = os.getenv('DATASET_FORMAT', 'arrow').lower()  # arrow (needs pyarrow) or csv
+    FEATURE_CACHE_ENABLED = os.getenv('FEATURE_CACHE_ENABLED', 'true').lower() == 'true'
+    FEATURE_CACHE_DIR = os.getenv('FEATURE_CACHE_DIR', './data/cache/features')
+    BOOSTING_ENGINE = os.getenv('BOOSTING_ENGINE', 'exact').lower()  # exact or hist (severity predictor, traffic forecaster)
+    ATTACK_COMPRESSION_ENABLED = os.getenv('ATTACK_COMPRESSION_ENABLED', 'true').lower() == 'true'
+    ATTACK_LATENCY_BUDGET_MS = float(os.getenv('ATTACK_LATENCY_BUDGET_MS', 5))  # single-row predict_proba of the served forest
+    ATTACK_ACCURACY_TOLERANCE = float(os.getenv('ATTACK_ACCURACY_TOLERANCE', 0.01))  # max accuracy drop vs the full forest
+    
+    # Micro-batching of concurrent /predict calls
+    MICRO_BATCH_ENABLED = os.getenv('MICRO_BATCH_ENABLED', 'true').lower() == 'true'
+    MICRO_BATCH_WINDOW_MS = float(os.getenv('MICRO_BATCH_WINDOW_MS', 2))
+    MICRO_BATCH_MAX_SIZE = int(os.getenv('MICRO_BATCH_MAX_SIZE', 256))
+    MICRO_BATCH_TIMEOUT = float(os.getenv('MICRO_BATCH_TIMEOUT', 5))
     
     # Network Monitoring
     INTERFACE = os.getenv('INTERFACE', 'eth0')
     PACKET_CAPTURE_ENABLED = os.getenv('PACKET_CAPTURE_ENABLED', 'true').lower() == 'true'
     TRAFFIC_WINDOW = int(os.getenv('TRAFFIC_WINDOW', 300))
+    TRAFFIC_MAX_POINTS = int(os.getenv('TRAFFIC_MAX_POINTS', 1000))  # per /api/traffic response (buckets are widened to fit)
+    TRAFFIC_ROLLUPS_ENABLED = os.getenv('TRAFFIC_ROLLUPS_ENABLED', 'true').lower() == 'true'  # 1m/1h/1d aggregates kept at ingest
     
     # GeoIP
     GEOIP_DB_PATH = os.getenv('GEOIP_DB_PATH', './data/GeoLite2-City.mmdb')
@@ -0,0 +1,177 @@
+"""
+Columnar dataset store for training and stats tools
+Datasets are written as uncompressed Arrow IPC files with typed columns and
+precomputed time features, and read back memory-mapped with column
+projection. Falls back to CSV when pyarrow is not installed
+"""
+import os
+import pandas as pd
+from config import Config
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    ARROW_AVAILABLE = False
+
+FORMATS = {'arrow': '.arrow', 'csv': '.csv'}
+
+def dataset_format():
+    """Format new datasets are written in ('arrow' unless configured or pyarrow is missing)"""
+    if Config.DATASET_FORMAT == 'arrow' and ARROW_AVAILABLE:
+        return 'arrow'
+    return 'csv'
+
+def dataset_name(filename):
+    """Dataset name without a format extension ('x.csv' and 'x' both give 'x')"""
+    name, extension = os.path.splitext(os.path.basename(filename))
+    return name if extension in FORMATS.values() else os.path.basename(filename)
+
+def dataset_path(data_dir, filename):
+    """Path of an existing dataset (Arrow preferred over CSV), or None"""
+    name = dataset_name(filename)
+    for dataset_format_name, extension in FORMATS.items():
+        if dataset_format_name == 'arrow' and not ARROW_AVAILABLE:
+            continue
+        path = os.path.join(data_dir, name + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+def add_time_features(df):
+    """Append hour and day_of_week derived from the timestamp column (if not present)"""
+    if 'timestamp' not in df.columns or 'hour' in df.columns:
+        return df
+
+    timestamps = pd.to_datetime(df['timestamp'])
+    df['hour'] = timestamps.dt.hour
+    df['day_of_week'] = timestamps.dt.dayofweek
+    return df
+
+class DatasetWriter:
+    """Write a dataset in chunks; the file is replaced atomically on close"""
+
+    def __init__(self, data_dir, filename, format=None):
+        self.format = format or dataset_format()
+        self.path = os.path.join(data_dir, dataset_name(filename) + FORMATS[self.format])
+        self.tmp_path = self.path + '.tmp'
+        self.rows = 0
+
+        self.sink = None
+        self.writer = None
+        self.schema = None
+
+    def write(self, df):
+        """Append one chunk (a DataFrame with the same columns as the first)"""
+        df = add_time_features(df)
+
+        if self.format == 'arrow':
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self.writer is None:
+                self.schema = table.schema.remove_metadata()
+                self.sink = pa.OSFile(self.tmp_path, 'wb')
+                self.writer = pa.ipc.new_file(self.sink, self.schema)
+            self.writer.write_table(table.cast(self.schema))
+        else:
+            df.to_csv(self.tmp_path, index=False, mode='w' if self.rows == 0 else 'a', header=(self.rows == 0))
+
+        self.rows += len(df)
+
+    def close(self):
+        """Finish the file and move it into place"""
+        if self.writer is not None:
+            self.writer.close()
+            self.sink.close()
+
+        if os.path.exists(self.tmp_path):
+            os.replace(self.tmp_path, self.path)
+
+            # Drop the same dataset in the other format so readers don't pick up a stale copy
+            for extension in FORMATS.values():
+                stale = os.path.splitext(self.path)[0] + extension
+                if stale != self.path and os.path.exists(stale):
+                    os.remove(stale)
+        return self.path
+
+    def abort(self):
+        """Discard a partially written file"""
+        if self.writer is not None:
+            self.writer.close()
+            self.sink.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+def write_dataset(df, data_dir, filename, format=None):
+    """Write a whole dataset; returns its path"""
+    with DatasetWriter(data_dir, filename, format=format) as writer:
+        writer.write(df)
+    return writer.path
+
+def read_dataset(data_dir, filename, columns=None, memory_map=True):
+    """
+    Load a dataset as a DataFrame, reading only the given columns.
+
+    Arrow files are memory-mapped: unselected columns are never read, and
+    numeric columns are returned as zero-copy (read-only) views of the file.
+    CSV datasets get the same derived time features as Arrow ones.
+    """
+    path = dataset_path(data_dir, filename)
+    if path is None:
+        raise FileNotFoundError(f"Dataset not found: {os.path.join(data_dir, dataset_name(filename))}")
+
+    if path.endswith(FORMATS['arrow']):
+        source = pa.memory_map(path, 'r') if memory_map else pa.OSFile(path, 'rb')
+        table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(list(columns))
+        # split_blocks avoids consolidating columns into fresh 2-D blocks
+        return table.to_pandas(split_blocks=True)
+
+    needed = None
+    if columns is not None:
+        derived = {'hour', 'day_of_week'} & set(columns)
+        # Time features of a CSV dataset are derived from its timestamp
+        needed = lambda column: column in columns or (derived and column == 'timestamp')
+
+    data = add_time_features(pd.read_csv(path, usecols=needed))
+    return data[list(columns)] if columns is not None else data
+
+def dataset_info(data_dir, filename):
+    """Path, format, row count and columns (as read_dataset returns them) of a dataset without loading it"""
+    path = dataset_path(data_dir, filename)
+    if path is None:
+        return None
+
+    if path.endswith(FORMATS['arrow']):
+        with pa.memory_map(path, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            rows = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+            columns = reader.schema.names
+        dataset_format_name = 'arrow'
+    else:
+        columns = pd.read_csv(path, nrows=0).columns.tolist()
+        if 'timestamp' in columns and 'hour' not in columns:
+            # Derived on load (see add_time_features)
+            columns += ['hour', 'day_of_week']
+        with open(path, 'rb') as f:
+            rows = max(0, sum(1 for _ in f) - 1)
+        dataset_format_name = 'csv'
+
+    return {
+        'path': path,
+        'format': dataset_format_name,
+        'rows': rows,
+        'columns': columns,
+        'size': os.path.getsize(path)
+    }
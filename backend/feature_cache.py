@@ -0,0 +1,213 @@
+"""
+Cache of preprocessed feature matrices
+Encoded, split and scaled train/test matrices are stored as .npy files (read
+back memory-mapped) together with the fitted scaler, keyed by the dataset's
+sha256, the feature schema and PREPROCESSING_VERSION
+"""
+import os
+import json
+import hashlib
+import shutil
+import tempfile
+from datetime import datetime
+import joblib
+import numpy as np
+from sklearn.model_selection import train_test_split
+from config import Config
+from dataset_store import dataset_path, read_dataset
+
+# Bump when encoding, splitting or scaling changes so old entries are not reused
+PREPROCESSING_VERSION = 1
+
+# Label encoding of the protocol column
+PROTOCOL_MAP = {'TCP': 1, 'UDP': 2, 'HTTP': 3, 'HTTPS': 4, 'SSH': 5, 'FTP': 6}
+
+HASH_INDEX_FILE = 'datasets.json'
+
+class FeatureSet:
+    """Train/test matrices with the fitted preprocessing objects"""
+
+    ARRAYS = ('X_train', 'X_test', 'y_train', 'y_test')
+
+    def __init__(self, X_train, X_test, y_train, y_test, feature_names, scaler,
+                 label_encoder=None, key=None, cached=False):
+        self.X_train = X_train
+        self.X_test = X_test
+        self.y_train = y_train
+        self.y_test = y_test
+        self.feature_names = feature_names
+        self.scaler = scaler
+        self.label_encoder = label_encoder
+        self.key = key
+        self.cached = cached
+
+    def save(self, path):
+        """Write the entry to path (a directory that must not exist yet)"""
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), np.asarray(getattr(self, name)))
+        joblib.dump(self.scaler, os.path.join(path, 'scaler.pkl'))
+        if self.label_encoder is not None:
+            joblib.dump(self.label_encoder, os.path.join(path, 'label_encoder.pkl'))
+
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({
+                'key': self.key,
+                'features': self.feature_names,
+                'preprocessingVersion': PREPROCESSING_VERSION,
+                'createdAt': datetime.utcnow().isoformat()
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Load an entry, memory-mapping the matrices"""
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+
+        arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+            for name in cls.ARRAYS
+        }
+        encoder_file = os.path.join(path, 'label_encoder.pkl')
+
+        return cls(
+            feature_names=meta['features'],
+            scaler=joblib.load(os.path.join(path, 'scaler.pkl')),
+            label_encoder=joblib.load(encoder_file) if os.path.exists(encoder_file) else None,
+            key=meta['key'],
+            cached=True,
+            **arrays
+        )
+
+def split_and_scale(X, y, scaler, test_size=0.2, random_state=42, stratify=False, shuffle=True):
+    """Split encoded features, fit the scaler on the training part and scale both parts"""
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state,
+        stratify=y if stratify else None, shuffle=shuffle
+    )
+
+    return FeatureSet(
+        X_train=scaler.fit_transform(X_train),
+        X_test=scaler.transform(X_test),
+        y_train=np.asarray(y_train),
+        y_test=np.asarray(y_test),
+        feature_names=X.columns.tolist(),
+        scaler=scaler
+    )
+
+def cache_dir():
+    """Directory holding the cache entries"""
+    return Config.FEATURE_CACHE_DIR
+
+def file_sha256(path):
+    """sha256 of a dataset file, remembered per (size, mtime) so unchanged files are not re-read"""
+    stat = os.stat(path)
+    index_file = os.path.join(cache_dir(), HASH_INDEX_FILE)
+    path = os.path.abspath(path)
+
+    try:
+        with open(index_file, 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+
+    entry = index.get(path)
+    if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+        return entry['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+
+    index[path] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+    os.makedirs(cache_dir(), exist_ok=True)
+    # Trainers may run in parallel; replace the index atomically (last writer wins)
+    fd, tmp_file = tempfile.mkstemp(dir=cache_dir(), prefix='.datasets-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_file, index_file)
+
+    return digest.hexdigest()
+
+def cache_key(dataset_sha256, schema):
+    """Key of the entry for a dataset and a feature schema"""
+    payload = json.dumps({
+        'dataset': dataset_sha256,
+        'schema': schema,
+        'preprocessing': PREPROCESSING_VERSION
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+def entry_path(key):
+    """Directory of one cache entry"""
+    return os.path.join(cache_dir(), key)
+
+def load_entry(key):
+    """Load a cache entry by key, or None if it is missing or unreadable"""
+    path = entry_path(key)
+    if not key or not os.path.isdir(path):
+        return None
+    try:
+        return FeatureSet.load(path)
+    except Exception as e:
+        print(f"⚠️  Ignoring unreadable feature cache entry {key}: {e}")
+        return None
+
+def load_or_build(data_dir, filename, schema, build):
+    """
+    Feature matrices of a dataset, from the cache or built and cached on a miss.
+
+    schema describes everything the matrices depend on besides the file
+    contents (its 'columns' are the only ones read on a miss). build(data)
+    turns the loaded DataFrame into a FeatureSet.
+    """
+    path = dataset_path(data_dir, filename)
+    if path is None:
+        raise FileNotFoundError(f"Dataset not found: {os.path.join(data_dir, filename)}")
+
+    if not Config.FEATURE_CACHE_ENABLED:
+        return build(read_dataset(data_dir, filename, columns=schema.get('columns')))
+
+    key = cache_key(file_sha256(path), schema)
+    features = load_entry(key)
+    if features is not None:
+        print(f"⚡ Feature cache hit: {key} ({len(features.X_train) + len(features.X_test):,} rows)")
+        return features
+
+    features = build(read_dataset(data_dir, filename, columns=schema.get('columns')))
+    features.key = key
+
+    # Build in a temporary directory and rename, so readers never see a partial entry
+    os.makedirs(cache_dir(), exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=cache_dir(), prefix='.tmp-')
+    try:
+        features.save(tmp_path)
+        os.rename(tmp_path, entry_path(key))
+        print(f"💾 Feature cache entry saved: {key}")
+    except OSError:
+        # Another process stored the same entry first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+    return features
+
+def cache_entries():
+    """Summary of the cached entries"""
+    entries = []
+    if not os.path.isdir(cache_dir()):
+        return entries
+
+    for key in sorted(os.listdir(cache_dir())):
+        meta_file = os.path.join(cache_dir(), key, 'meta.json')
+        if not os.path.exists(meta_file):
+            continue
+        with open(meta_file, 'r') as f:
+            meta = json.load(f)
+        size = sum(entry.stat().st_size for entry in os.scandir(os.path.join(cache_dir(), key)))
+        entries.append({
+            'key': key,
+            'features': len(meta['features']),
+            'preprocessingVersion': meta['preprocessingVersion'],
+            'createdAt': meta['createdAt'],
+            'size': size
+        })
+    return entries
@@ -0,0 +1,161 @@
+"""
+Compression of the attack classifier's Random Forest for serving
+Smaller candidates (tree subsets, depth-capped forests and forests distilled
+from the full one) are compared with the full forest; the most accurate one
+within the accuracy tolerance and the single-row latency budget is served
+"""
+import copy
+import time
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+
+# Tree counts tried for greedy tree-subset selection
+SUBSET_SIZES = (10, 25, 50)
+
+# Depth limits of the refitted depth-capped forests, and their tree count
+DEPTH_CAPS = (8, 12)
+DEPTH_CAP_TREES = 50
+
+# Student sizes and training set augmentation of distillation
+DISTILLED_SIZES = (10, 25)
+DISTILLATION_SAMPLES = 2  # teacher-labelled jittered copies per training row
+DISTILLATION_NOISE = 0.1  # jitter std, in standardized feature units
+
+# Rows timed one at a time for the latency estimate
+LATENCY_ROWS = 200
+
+def serving_copy(model):
+    """Shallow copy that predicts single-threaded and quietly (as the API calls it)"""
+    model = copy.copy(model)
+    model.set_params(n_jobs=None, verbose=0)
+    return model
+
+def tree_subset(model, indices):
+    """Forest made of some of a fitted forest's trees"""
+    subset = serving_copy(model)
+    subset.estimators_ = [model.estimators_[i] for i in indices]
+    subset.n_estimators = len(subset.estimators_)
+    return subset
+
+def greedy_subset(model, X_val, y_val, n_trees):
+    """
+    Indices of n_trees trees picked by forward selection on a validation set.
+
+    Each step adds the tree that maximizes validation accuracy of the
+    averaged probabilities, ties broken by the probability of the true class.
+    """
+    probabilities = np.stack([tree.predict_proba(X_val) for tree in model.estimators_])
+    rows = np.arange(len(y_val))
+    targets = np.searchsorted(model.classes_, y_val)
+
+    selected = []
+    total = np.zeros_like(probabilities[0])
+    remaining = set(range(len(probabilities)))
+
+    for _ in range(min(n_trees, len(probabilities))):
+        best, best_score = None, None
+        for i in remaining:
+            combined = total + probabilities[i]
+            score = ((combined.argmax(axis=1) == targets).mean(), combined[rows, targets].sum())
+            if best_score is None or score > best_score:
+                best, best_score = i, score
+        selected.append(best)
+        remaining.discard(best)
+        total += probabilities[best]
+
+    return selected
+
+def depth_capped(model, X_train, y_train, max_depth, n_trees=DEPTH_CAP_TREES, n_jobs=-1):
+    """Forest refitted with the full forest's settings, fewer trees and a depth limit"""
+    forest = clone(model).set_params(n_estimators=n_trees, max_depth=max_depth, n_jobs=n_jobs, verbose=0)
+    return serving_copy(forest.fit(X_train, y_train))
+
+def distilled(model, X_train, n_trees, n_jobs=-1, random_state=42):
+    """Smaller forest fitted to the full forest's predictions on jittered training rows"""
+    rng = np.random.default_rng(random_state)
+    X_train = np.asarray(X_train)
+
+    jittered = np.repeat(X_train, DISTILLATION_SAMPLES, axis=0)
+    jittered = jittered + rng.normal(0, DISTILLATION_NOISE, size=jittered.shape)
+    X_student = np.vstack([X_train, jittered])
+
+    student = clone(model).set_params(n_estimators=n_trees, n_jobs=n_jobs, verbose=0)
+    return serving_copy(student.fit(X_student, model.predict(X_student)))
+
+def single_row_latency_ms(model, X):
+    """Median predict_proba latency for one row"""
+    model.predict_proba(X[:1])
+    timings = []
+    for i in range(min(LATENCY_ROWS, len(X))):
+        started = time.perf_counter()
+        model.predict_proba(X[i:i + 1])
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings) * 1000)
+
+def describe(name, technique, params, model, X_eval, y_eval):
+    """Accuracy, latency and size of one candidate"""
+    return {
+        'name': name,
+        'technique': technique,
+        'params': params,
+        'trees': len(model.estimators_),
+        'nodes': int(sum(tree.tree_.node_count for tree in model.estimators_)),
+        'accuracy': round(float(accuracy_score(y_eval, model.predict(X_eval))), 4),
+        'latencyMs': round(single_row_latency_ms(model, X_eval), 4)
+    }
+
+def compress_forest(model, X_train, y_train, X_test, y_test, latency_budget_ms, accuracy_tolerance,
+                    n_jobs=-1, random_state=42):
+    """
+    Choose the serving model for a fitted Random Forest.
+
+    The test set is split in two: tree subsets are selected on one half and
+    every candidate is scored on the other. Among candidates whose accuracy
+    is within accuracy_tolerance of the full forest, the most accurate one
+    within the latency budget is chosen (the fastest one if none is).
+    Returns (model, report).
+    """
+    X_val, X_eval, y_val, y_eval = train_test_split(
+        np.asarray(X_test), np.asarray(y_test), test_size=0.5, random_state=random_state, stratify=y_test
+    )
+
+    candidates = [('full', 'none', {'trees': len(model.estimators_)}, serving_copy(model))]
+    for n_trees in SUBSET_SIZES:
+        if n_trees < len(model.estimators_):
+            indices = greedy_subset(model, X_val, y_val, n_trees)
+            candidates.append((f'subset-{n_trees}', 'tree_subset', {'trees': n_trees}, tree_subset(model, indices)))
+    for max_depth in DEPTH_CAPS:
+        candidates.append((
+            f'depth-{max_depth}', 'depth_cap', {'trees': DEPTH_CAP_TREES, 'max_depth': max_depth},
+            depth_capped(model, X_train, y_train, max_depth, n_jobs=n_jobs)
+        ))
+    for n_trees in DISTILLED_SIZES:
+        candidates.append((
+            f'distilled-{n_trees}', 'distillation', {'trees': n_trees},
+            distilled(model, X_train, n_trees, n_jobs=n_jobs, random_state=random_state)
+        ))
+
+    models = {name: candidate for name, _, _, candidate in candidates}
+    results = [describe(name, technique, params, candidate, X_eval, y_eval)
+               for name, technique, params, candidate in candidates]
+
+    full_accuracy = results[0]['accuracy']
+    eligible = [result for result in results if result['accuracy'] >= full_accuracy - accuracy_tolerance]
+    within_budget = [result for result in eligible if result['latencyMs'] <= latency_budget_ms]
+
+    if within_budget:
+        chosen = max(within_budget, key=lambda result: (result['accuracy'], -result['latencyMs']))
+    else:
+        chosen = min(eligible, key=lambda result: result['latencyMs'])
+
+    report = {
+        'selected': chosen['name'],
+        'withinBudget': bool(within_budget),
+        'latencyBudgetMs': latency_budget_ms,
+        'accuracyTolerance': accuracy_tolerance,
+        'evaluationRows': len(y_eval),
+        'candidates': results
+    }
+    return models[chosen['name']], report
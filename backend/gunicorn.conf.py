@@ -2,8 +2,14 @@
 Gunicorn Configuration File
 Production-ready WSGI server settings for AI Anomaly Detection Backend
 """
+import gc
 import multiprocessing
 import os
+import sys
+
+# Backend modules (config, services) are imported from this directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import Config
 
 # Server socket
 bind = f"0.0.0.0:{os.getenv('API_PORT', '5000')}"
@@ -48,10 +54,64 @@ limit_request_line = 4094
 limit_request_fields = 100
 limit_request_field_size = 8190
 
+# Model preloading: load artifacts once in the master so forked workers share them
+preload_models = Config.MODEL_PRELOAD
+
+def _memory_usage():
+    """Memory of the current process, or None if the store is not importable"""
+    try:
+        from services.model_store import memory_usage
+        return memory_usage()
+    except Exception:
+        return None
+
+def _preload_models():
+    """Load every model into the master process before workers are forked"""
+    try:
+        from services import model_store
+        from services.model_registry import read_active_version
+        
+        before = model_store.memory_usage()
+        loaded = model_store.preload_models(version=read_active_version())
+        
+        # Keep the garbage collector from touching (and un-sharing) preloaded objects
+        gc.freeze()
+        after = model_store.memory_usage()
+        
+        print(f"🧠 Preloaded models: {', '.join(name for name, ok in loaded.items() if ok) or 'none'}")
+        print(f"   Master memory: {before['rssMb']} MB -> {after['rssMb']} MB RSS")
+    except Exception as e:
+        print(f"⚠️  Model preload skipped: {e}")
+
+def _start_retrain_scheduler():
+    """Start periodic retraining in this worker (the worker holding the scheduler lock runs it)"""
+    try:
+        from api.model import retrain_scheduler
+        retrain_scheduler.start()
+    except Exception as e:
+        print(f"⚠️  Retrain scheduler not started: {e}")
+
 # Server hooks
 def on_starting(server):
     """Called just before the master process is initialized."""
     print("🚀 Starting Gunicorn server...")
+    
+    if preload_models:
+        _preload_models()
+
+def post_fork(server, worker):
+    """Called just after a worker has been forked."""
+    usage = _memory_usage()
+    if usage:
+        print(f"🧠 Worker {worker.pid} after fork: {usage}")
+
+def post_worker_init(worker):
+    """Called just after a worker has initialized the application."""
+    usage = _memory_usage()
+    if usage:
+        print(f"🧠 Worker {worker.pid} after app load: {usage}")
+    
+    _start_retrain_scheduler()
 
 def on_reload(server):
     """Called when the server is reloaded."""
@@ -9,14 +9,18 @@ CREATE INDEX IF NOT EXISTS idx_anomalies_timestamp ON anomalies(timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_anomalies_severity ON anomalies(severity);
 CREATE INDEX IF NOT EXISTS idx_anomalies_status ON anomalies(status);
 CREATE INDEX IF NOT EXISTS idx_anomalies_source_ip ON anomalies(source_ip);
+CREATE INDEX IF NOT EXISTS idx_anomalies_timestamp_stats ON anomalies(timestamp, severity, type, status);
+CREATE INDEX IF NOT EXISTS idx_anomalies_timestamp_id ON anomalies(timestamp, id);
 
 CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts(timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_alerts_severity ON alerts(severity);
 CREATE INDEX IF NOT EXISTS idx_alerts_status ON alerts(status);
+CREATE INDEX IF NOT EXISTS idx_alerts_timestamp_id ON alerts(timestamp, id);
 
 CREATE INDEX IF NOT EXISTS idx_connections_timestamp ON connections(timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_connections_source_ip ON connections(source_ip);
 CREATE INDEX IF NOT EXISTS idx_connections_is_active ON connections(is_active);
+CREATE INDEX IF NOT EXISTS idx_connections_timestamp_id ON connections(timestamp, id);
 
 CREATE INDEX IF NOT EXISTS idx_model_metrics_timestamp ON model_metrics(timestamp DESC);
 
@@ -6,5 +6,7 @@ from models.alert import Alert
 from models.network_traffic import NetworkTraffic
 from models.connection import Connection
 from models.model_metrics import ModelMetrics
+from models.traffic_rollup import TrafficRollup1m, TrafficRollup1h, TrafficRollup1d, TrafficRollupCoverage
 
-__all__ = ['Anomaly', 'Alert', 'NetworkTraffic', 'Connection', 'ModelMetrics']
+__all__ = ['Anomaly', 'Alert', 'NetworkTraffic', 'Connection', 'ModelMetrics',
+           'TrafficRollup1m', 'TrafficRollup1h', 'TrafficRollup1d', 'TrafficRollupCoverage']
@@ -7,6 +7,10 @@ from datetime import datetime
 class Alert(db.Model):
     """Alert notification record"""
     __tablename__ = 'alerts'
+    __table_args__ = (
+        # Keyset pagination order (see api/pagination.py)
+        db.Index('idx_alerts_timestamp_id', 'timestamp', 'id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
@@ -0,0 +1,47 @@
+"""
+Network traffic rollup database models
+"""
+from database import db
+
+# NetworkTraffic columns aggregated by the rollups
+ROLLUP_METRICS = [
+    'incoming_mbps', 'outgoing_mbps', 'total_mbps',
+    'tcp_traffic', 'udp_traffic', 'http_traffic', 'https_traffic',
+    'ssh_traffic', 'ftp_traffic', 'other_traffic',
+    'active_connections', 'anomaly_count', 'blocked_threats', 'avg_response_time'
+]
+
+class TrafficRollupMixin:
+    """Per-bucket sum, max and non-null count of every metric (mean = sum / count)"""
+    bucket = db.Column(db.DateTime, primary_key=True)
+    samples = db.Column(db.Integer, nullable=False, default=0)
+
+for _metric in ROLLUP_METRICS:
+    setattr(TrafficRollupMixin, f'{_metric}_sum', db.Column(db.Float, nullable=False, default=0))
+    setattr(TrafficRollupMixin, f'{_metric}_max', db.Column(db.Float))
+    setattr(TrafficRollupMixin, f'{_metric}_count', db.Column(db.Integer, nullable=False, default=0))
+
+class TrafficRollup1m(TrafficRollupMixin, db.Model):
+    """Traffic aggregated per minute"""
+    __tablename__ = 'traffic_rollup_1m'
+
+    bucket_seconds = 60
+
+class TrafficRollup1h(TrafficRollupMixin, db.Model):
+    """Traffic aggregated per hour"""
+    __tablename__ = 'traffic_rollup_1h'
+
+    bucket_seconds = 3600
+
+class TrafficRollup1d(TrafficRollupMixin, db.Model):
+    """Traffic aggregated per day"""
+    __tablename__ = 'traffic_rollup_1d'
+
+    bucket_seconds = 86400
+
+class TrafficRollupCoverage(db.Model):
+    """Whether the rollups hold every raw row of a day that has ended"""
+    __tablename__ = 'traffic_rollup_coverage'
+
+    day = db.Column(db.DateTime, primary_key=True)
+    complete = db.Column(db.Boolean, nullable=False)
@@ -4,173 +4,230 @@ Dataset downloader and generator for network anomaly detection
 import os
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
+from dataset_store import DatasetWriter, read_dataset, dataset_path, dataset_info
 import urllib.request
 import zipfile
 import json
 
+def sample_column(rng, spec, n):
+    """Draw n values from a column spec like ('randint', low, high) or ('choice', values, p)"""
+    kind, *args = spec
+    if kind == 'randint':
+        return rng.integers(args[0], args[1], size=n)
+    if kind == 'uniform':
+        return rng.uniform(args[0], args[1], size=n)
+    if kind == 'normal':
+        return rng.normal(args[0], args[1], size=n)
+    if kind == 'choice':
+        return rng.choice(np.asarray(args[0]), size=n, p=args[1] if len(args) > 1 else None)
+    if kind == 'const':
+        return np.full(n, args[0])
+    raise ValueError(f'Unknown column spec: {kind}')
+
+def sample_profiles(rng, profiles, assignment):
+    """DataFrame whose row i is drawn from profiles[assignment[i]], sampled column by column"""
+    assignment = np.asarray(assignment)
+    rows_by_profile = [np.flatnonzero(assignment == index) for index in range(len(profiles))]
+    
+    columns = {}
+    for column in profiles[0]:
+        parts = [
+            (rows, sample_column(rng, profile[column], len(rows)))
+            for profile, rows in zip(profiles, rows_by_profile) if len(rows)
+        ]
+        values = np.empty(len(assignment), dtype=np.result_type(*(part for _, part in parts)) if parts else np.float64)
+        for rows, part in parts:
+            values[rows] = part
+        columns[column] = values
+    
+    return pd.DataFrame(columns)
+
+def chunk_bounds(n_samples, chunk_size):
+    """(start, end) row ranges splitting n_samples into chunks of at most chunk_size"""
+    return [(start, min(start + chunk_size, n_samples)) for start in range(0, n_samples, chunk_size)]
+
 class DatasetManager:
     """Manage datasets for anomaly detection"""
     
+    # Rows generated in memory at once; larger datasets are streamed to disk
+    CHUNK_SIZE = 1000000
+    
+    # Column specs of normal traffic (see sample_column)
+    NORMAL_PROFILE = {
+        'source_port': ('randint', 1024, 65535),
+        'dest_port': ('choice', [80, 443, 22, 3306, 5432], [0.4, 0.3, 0.15, 0.1, 0.05]),
+        'protocol': ('choice', ['TCP', 'UDP', 'HTTP', 'HTTPS'], [0.4, 0.2, 0.2, 0.2]),
+        'packet_size': ('normal', 512, 200),  # Normal packet size
+        'packets': ('randint', 10, 100),
+        'bytes': ('randint', 1000, 50000),
+        'duration': ('uniform', 0.1, 5.0),
+        'flag_count': ('randint', 0, 3),
+        'syn_flag': ('choice', [0, 1], [0.9, 0.1]),
+        'ack_flag': ('choice', [0, 1], [0.3, 0.7]),
+        'rst_flag': ('const', 0),
+        'connection_rate': ('uniform', 0, 5),
+        'label': ('const', 0)  # Normal traffic
+    }
+    
+    # Column specs of each anomaly type, drawn with equal probability
+    ANOMALY_PROFILES = {
+        # DoS attack: high packet count, small packets, high rate
+        'dos': {
+            'source_port': ('randint', 1024, 65535),
+            'dest_port': ('choice', [80, 443]),
+            'protocol': ('const', 'TCP'),
+            'packet_size': ('normal', 100, 50),  # Small packets
+            'packets': ('randint', 1000, 10000),  # Many packets
+            'bytes': ('randint', 100000, 1000000),
+            'duration': ('uniform', 0.01, 0.5),  # Short duration
+            'flag_count': ('randint', 5, 15),
+            'syn_flag': ('const', 1),
+            'ack_flag': ('const', 0),
+            'rst_flag': ('choice', [0, 1]),
+            'connection_rate': ('uniform', 50, 200),  # High rate
+            'label': ('const', 1)  # Anomaly
+        },
+        # Port scan: many different ports, small packets
+        'port_scan': {
+            'source_port': ('randint', 1024, 65535),
+            'dest_port': ('randint', 1, 65535),  # Random ports
+            'protocol': ('const', 'TCP'),
+            'packet_size': ('normal', 64, 20),  # Very small packets
+            'packets': ('randint', 1, 5),
+            'bytes': ('randint', 64, 500),
+            'duration': ('uniform', 0.001, 0.1),
+            'flag_count': ('randint', 1, 3),
+            'syn_flag': ('const', 1),
+            'ack_flag': ('const', 0),
+            'rst_flag': ('const', 1),
+            'connection_rate': ('uniform', 10, 50),
+            'label': ('const', 1)
+        },
+        # Brute force: repeated connections to auth ports
+        'brute_force': {
+            'source_port': ('randint', 1024, 65535),
+            'dest_port': ('choice', [22, 3389, 21, 23]),  # Auth ports
+            'protocol': ('choice', ['TCP', 'SSH']),
+            'packet_size': ('normal', 300, 100),
+            'packets': ('randint', 5, 50),
+            'bytes': ('randint', 1000, 10000),
+            'duration': ('uniform', 1.0, 10.0),
+            'flag_count': ('randint', 3, 10),
+            'syn_flag': ('const', 1),
+            'ack_flag': ('const', 1),
+            'rst_flag': ('choice', [0, 1]),
+            'connection_rate': ('uniform', 20, 100),  # High rate
+            'label': ('const', 1)
+        },
+        # Data exfiltration: large data transfer
+        'data_exfiltration': {
+            'source_port': ('randint', 1024, 65535),
+            'dest_port': ('choice', [80, 443, 8080]),
+            'protocol': ('choice', ['HTTP', 'HTTPS']),
+            'packet_size': ('normal', 1400, 200),  # Large packets
+            'packets': ('randint', 500, 5000),
+            'bytes': ('randint', 500000, 5000000),  # Large data
+            'duration': ('uniform', 10.0, 300.0),  # Long duration
+            'flag_count': ('randint', 2, 5),
+            'syn_flag': ('const', 1),
+            'ack_flag': ('const', 1),
+            'rst_flag': ('const', 0),
+            'connection_rate': ('uniform', 1, 10),
+            'label': ('const', 1)
+        }
+    }
+    
     def __init__(self, data_dir='./data/datasets'):
         self.data_dir = data_dir
         os.makedirs(data_dir, exist_ok=True)
         print(f"📁 Dataset directory: {data_dir}")
     
-    def generate_synthetic_dataset(self, n_samples=10000, anomaly_ratio=0.1):
-        """Generate synthetic network traffic dataset"""
+    def generate_synthetic_dataset(self, n_samples=10000, anomaly_ratio=0.1, seed=42,
+                                   chunk_size=None, end_time=None):
+        """
+        Generate synthetic network traffic dataset.
+        
+        The same seed and chunk_size give the same rows (timestamps are relative
+        to end_time, default now). Datasets larger than chunk_size are generated
+        and appended to the dataset file chunk by chunk, and None is returned
+        instead of a DataFrame.
+        """
         print(f"\n🔄 Generating synthetic dataset with {n_samples} samples...")
         
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        end_time = pd.Timestamp(end_time or datetime.now())
+        
         # Calculate number of normal and anomaly samples
         n_anomalies = int(n_samples * anomaly_ratio)
         n_normal = n_samples - n_anomalies
         
-        # Generate normal traffic
-        normal_data = self._generate_normal_traffic(n_normal)
-        
-        # Generate anomalous traffic
-        anomaly_data = self._generate_anomalous_traffic(n_anomalies)
+        bounds = chunk_bounds(n_samples, chunk_size) or [(0, 0)]
+        # Independent streams per chunk, so chunks don't depend on each other
+        seeds = np.random.SeedSequence(seed).spawn(len(bounds))
         
-        # Combine and shuffle
-        data = pd.concat([normal_data, anomaly_data], ignore_index=True)
-        data = data.sample(frac=1, random_state=42).reset_index(drop=True)
+        data = None
+        with DatasetWriter(self.data_dir, 'synthetic_network_traffic') as writer:
+            for i, ((start, end), chunk_seed) in enumerate(zip(bounds, seeds)):
+                rng = np.random.default_rng(chunk_seed)
+            
+                # Spread the anomalies evenly over the chunks
+                chunk_anomalies = (end * n_anomalies // n_samples - start * n_anomalies // n_samples) if n_samples else 0
+            
+                # Generate normal and anomalous traffic, then shuffle
+                data = pd.concat([
+                    self._generate_normal_traffic(end - start - chunk_anomalies, rng, end_time),
+                    self._generate_anomalous_traffic(chunk_anomalies, rng, end_time)
+                ], ignore_index=True)
+                data = data.iloc[rng.permutation(len(data))].reset_index(drop=True)
+            
+                # Save (Arrow IPC, or CSV without pyarrow)
+                writer.write(data)
+                if len(bounds) > 1:
+                    print(f"   Chunk {i + 1}/{len(bounds)}: {end:,} rows written")
         
-        # Save to CSV
-        filepath = os.path.join(self.data_dir, 'synthetic_network_traffic.csv')
-        data.to_csv(filepath, index=False)
+        if len(bounds) > 1:
+            data = None
         
-        print(f"✅ Synthetic dataset generated: {filepath}")
-        print(f"   Total samples: {len(data)}")
-        print(f"   Normal: {n_normal} ({n_normal/len(data)*100:.1f}%)")
-        print(f"   Anomalies: {n_anomalies} ({n_anomalies/len(data)*100:.1f}%)")
+        print(f"✅ Synthetic dataset generated: {writer.path}")
+        print(f"   Total samples: {n_samples}")
+        if n_samples:
+            print(f"   Normal: {n_normal} ({n_normal/n_samples*100:.1f}%)")
+            print(f"   Anomalies: {n_anomalies} ({n_anomalies/n_samples*100:.1f}%)")
         
         return data
     
-    def _generate_normal_traffic(self, n_samples):
+    def _timestamps(self, n_samples, rng, end_time):
+        """Timestamps spread over the day before end_time"""
+        return end_time - pd.to_timedelta(rng.integers(0, 86400, size=n_samples), unit='s')
+    
+    def _generate_normal_traffic(self, n_samples, rng, end_time):
         """Generate normal network traffic patterns"""
-        data = []
-        
-        for _ in range(n_samples):
-            record = {
-                'timestamp': datetime.now() - timedelta(seconds=np.random.randint(0, 86400)),
-                'source_port': np.random.randint(1024, 65535),
-                'dest_port': np.random.choice([80, 443, 22, 3306, 5432], p=[0.4, 0.3, 0.15, 0.1, 0.05]),
-                'protocol': np.random.choice(['TCP', 'UDP', 'HTTP', 'HTTPS'], p=[0.4, 0.2, 0.2, 0.2]),
-                'packet_size': np.random.normal(512, 200),  # Normal packet size
-                'packets': np.random.randint(10, 100),
-                'bytes': np.random.randint(1000, 50000),
-                'duration': np.random.uniform(0.1, 5.0),
-                'flag_count': np.random.randint(0, 3),
-                'syn_flag': np.random.choice([0, 1], p=[0.9, 0.1]),
-                'ack_flag': np.random.choice([0, 1], p=[0.3, 0.7]),
-                'rst_flag': 0,
-                'connection_rate': np.random.uniform(0, 5),
-                'label': 0  # Normal traffic
-            }
-            data.append(record)
-        
-        return pd.DataFrame(data)
+        data = sample_profiles(rng, [self.NORMAL_PROFILE], np.zeros(n_samples, dtype=np.int64))
+        data.insert(0, 'timestamp', self._timestamps(n_samples, rng, end_time))
+        return data
     
-    def _generate_anomalous_traffic(self, n_samples):
+    def _generate_anomalous_traffic(self, n_samples, rng, end_time):
         """Generate anomalous network traffic patterns"""
-        data = []
-        
-        anomaly_types = ['dos', 'port_scan', 'brute_force', 'data_exfiltration']
+        profiles = list(self.ANOMALY_PROFILES.values())
+        anomaly_types = rng.integers(0, len(profiles), size=n_samples)
         
-        for _ in range(n_samples):
-            anomaly_type = np.random.choice(anomaly_types)
-            
-            if anomaly_type == 'dos':
-                # DoS attack: high packet count, small packets, high rate
-                record = {
-                    'timestamp': datetime.now() - timedelta(seconds=np.random.randint(0, 86400)),
-                    'source_port': np.random.randint(1024, 65535),
-                    'dest_port': np.random.choice([80, 443]),
-                    'protocol': 'TCP',
-                    'packet_size': np.random.normal(100, 50),  # Small packets
-                    'packets': np.random.randint(1000, 10000),  # Many packets
-                    'bytes': np.random.randint(100000, 1000000),
-                    'duration': np.random.uniform(0.01, 0.5),  # Short duration
-                    'flag_count': np.random.randint(5, 15),
-                    'syn_flag': 1,
-                    'ack_flag': 0,
-                    'rst_flag': np.random.choice([0, 1]),
-                    'connection_rate': np.random.uniform(50, 200),  # High rate
-                    'label': 1  # Anomaly
-                }
-            
-            elif anomaly_type == 'port_scan':
-                # Port scan: many different ports, small packets
-                record = {
-                    'timestamp': datetime.now() - timedelta(seconds=np.random.randint(0, 86400)),
-                    'source_port': np.random.randint(1024, 65535),
-                    'dest_port': np.random.randint(1, 65535),  # Random ports
-                    'protocol': 'TCP',
-                    'packet_size': np.random.normal(64, 20),  # Very small packets
-                    'packets': np.random.randint(1, 5),
-                    'bytes': np.random.randint(64, 500),
-                    'duration': np.random.uniform(0.001, 0.1),
-                    'flag_count': np.random.randint(1, 3),
-                    'syn_flag': 1,
-                    'ack_flag': 0,
-                    'rst_flag': 1,
-                    'connection_rate': np.random.uniform(10, 50),
-                    'label': 1  # Anomaly
-                }
-            
-            elif anomaly_type == 'brute_force':
-                # Brute force: repeated connections to auth ports
-                record = {
-                    'timestamp': datetime.now() - timedelta(seconds=np.random.randint(0, 86400)),
-                    'source_port': np.random.randint(1024, 65535),
-                    'dest_port': np.random.choice([22, 3389, 21, 23]),  # Auth ports
-                    'protocol': np.random.choice(['TCP', 'SSH']),
-                    'packet_size': np.random.normal(300, 100),
-                    'packets': np.random.randint(5, 50),
-                    'bytes': np.random.randint(1000, 10000),
-                    'duration': np.random.uniform(1.0, 10.0),
-                    'flag_count': np.random.randint(3, 10),
-                    'syn_flag': 1,
-                    'ack_flag': 1,
-                    'rst_flag': np.random.choice([0, 1]),
-                    'connection_rate': np.random.uniform(20, 100),  # High rate
-                    'label': 1  # Anomaly
-                }
-            
-            else:  # data_exfiltration
-                # Data exfiltration: large data transfer
-                record = {
-                    'timestamp': datetime.now() - timedelta(seconds=np.random.randint(0, 86400)),
-                    'source_port': np.random.randint(1024, 65535),
-                    'dest_port': np.random.choice([80, 443, 8080]),
-                    'protocol': np.random.choice(['HTTP', 'HTTPS']),
-                    'packet_size': np.random.normal(1400, 200),  # Large packets
-                    'packets': np.random.randint(500, 5000),
-                    'bytes': np.random.randint(500000, 5000000),  # Large data
-                    'duration': np.random.uniform(10.0, 300.0),  # Long duration
-                    'flag_count': np.random.randint(2, 5),
-                    'syn_flag': 1,
-                    'ack_flag': 1,
-                    'rst_flag': 0,
-                    'connection_rate': np.random.uniform(1, 10),
-                    'label': 1  # Anomaly
-                }
-            
-            data.append(record)
-        
-        return pd.DataFrame(data)
+        data = sample_profiles(rng, profiles, anomaly_types)
+        data.insert(0, 'timestamp', self._timestamps(n_samples, rng, end_time))
+        return data
     
-    def load_dataset(self, filename='synthetic_network_traffic.csv'):
-        """Load dataset from file"""
-        filepath = os.path.join(self.data_dir, filename)
+    def load_dataset(self, filename='synthetic_network_traffic', columns=None):
+        """Load dataset from file (only the given columns)"""
+        filepath = dataset_path(self.data_dir, filename)
         
-        if not os.path.exists(filepath):
-            print(f"⚠️  Dataset not found: {filepath}")
+        if filepath is None:
+            print(f"⚠️  Dataset not found: {os.path.join(self.data_dir, filename)}")
             print("Generating new dataset...")
-            return self.generate_synthetic_dataset()
+            data = self.generate_synthetic_dataset()
+            return data[list(columns)] if columns is not None else data
         
         print(f"📂 Loading dataset: {filepath}")
-        data = pd.read_csv(filepath)
+        data = read_dataset(self.data_dir, filename, columns=columns)
         print(f"✅ Dataset loaded: {len(data)} samples")
         
         return data
@@ -198,14 +255,17 @@ class DatasetManager:
         datasets = []
         
         if os.path.exists(self.data_dir):
-            for file in os.listdir(self.data_dir):
-                if file.endswith('.csv'):
-                    filepath = os.path.join(self.data_dir, file)
-                    size = os.path.getsize(filepath)
+            for file in sorted(os.listdir(self.data_dir)):
+                if file.endswith(('.csv', '.arrow')):
+                    info = dataset_info(self.data_dir, file)
+                    if info is None or info['path'] != os.path.join(self.data_dir, file):
+                        continue
                     datasets.append({
                         'name': file,
-                        'path': filepath,
-                        'size': f"{size / 1024:.2f} KB"
+                        'path': info['path'],
+                        'format': info['format'],
+                        'rows': info['rows'],
+                        'size': f"{info['size'] / 1024:.2f} KB"
                     })
         
         return datasets
@@ -0,0 +1,53 @@
+"""
+Aggregated anomaly statistics
+Severity, type and status distributions of a time window come from a single
+query grouped by (severity, type, status), so only counts leave the database
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+
+TIME_RANGES = {
+    '1h': timedelta(hours=1),
+    '24h': timedelta(days=1),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30)
+}
+
+# Buckets always present in the response (zero when empty)
+SEVERITIES = ('critical', 'high', 'medium', 'low')
+STATUSES = ('active', 'blocked', 'resolved')
+
+def window_start(time_range, now=None):
+    """Start of a stats window like '24h' (unknown ranges fall back to 24h)"""
+    return (now or datetime.utcnow()) - TIME_RANGES.get(time_range, TIME_RANGES['24h'])
+
+def anomaly_stats(session, since):
+    """Total and severity/type/status distributions of the anomalies seen since a time"""
+    from models.anomaly import Anomaly
+
+    # At most |severities| x |types| x |statuses| rows come back, whatever the window size
+    rows = session.execute(
+        select(Anomaly.severity, Anomaly.type, Anomaly.status, func.count())
+        .where(Anomaly.timestamp >= since)
+        .group_by(Anomaly.severity, Anomaly.type, Anomaly.status)
+    ).all()
+
+    total = 0
+    by_severity = dict.fromkeys(SEVERITIES, 0)
+    by_type = {}
+    by_status = dict.fromkeys(STATUSES, 0)
+
+    for severity, anomaly_type, status, count in rows:
+        total += count
+        if severity in by_severity:
+            by_severity[severity] += count
+        by_type[anomaly_type] = by_type.get(anomaly_type, 0) + count
+        if status in by_status:
+            by_status[status] += count
+
+    return {
+        'totalAnomalies': total,
+        'bySeverity': by_severity,
+        'byType': by_type,
+        'byStatus': by_status
+    }
@@ -0,0 +1,66 @@
+"""
+Inter-process file lock
+Used to keep one training run at a time across all workers on a node
+"""
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+class FileLock:
+    """Non-blocking exclusive lock on a file, shared by threads and processes"""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+        self.thread_lock = threading.Lock()
+
+    def acquire(self):
+        """Try to take the lock; returns False if another thread or process holds it"""
+        if not self.thread_lock.acquire(blocking=False):
+            return False
+
+        if fcntl is None:
+            return True
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                self.thread_lock.release()
+                return False
+        except Exception:
+            self.thread_lock.release()
+            raise
+
+        # Record the holder for debugging
+        os.ftruncate(fd, 0)
+        os.write(fd, f'{os.getpid()}\n'.encode())
+        self.fd = fd
+        return True
+
+    def release(self):
+        """Release the lock"""
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+        self.thread_lock.release()
+
+    def locked(self):
+        """Whether this process holds the lock"""
+        return self.thread_lock.locked()
+
+    def __enter__(self):
+        if not self.acquire():
+            raise RuntimeError(f'Lock {self.path} is held by another process')
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
@@ -0,0 +1,172 @@
+"""
+Flattened NumPy evaluator for fitted Isolation Forests
+Scores batches with vectorized traversal instead of sklearn's per-estimator loop
+"""
+import json
+import os
+import numpy as np
+
+def average_path_length(n_samples):
+    """Average path length of an unsuccessful BST search (same as sklearn)"""
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    result = np.zeros(n_samples.shape)
+
+    mask_2 = n_samples == 2
+    not_mask = n_samples > 2
+
+    result[mask_2] = 1.0
+    result[not_mask] = (
+        2.0 * (np.log(n_samples[not_mask] - 1.0) + np.euler_gamma)
+        - 2.0 * (n_samples[not_mask] - 1.0) / n_samples[not_mask]
+    )
+
+    return result
+
+class FlatIsolationForest:
+    """Isolation Forest exported into flat node arrays"""
+
+    # Rows scored per traversal step, bounds the (rows x trees) work arrays
+    CHUNK_SIZE = 4096
+
+    # Node arrays persisted by save() and memory-mapped by load()
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'leaf_value', 'roots')
+
+    def __init__(self, feature, threshold, left, right, leaf_value, roots,
+                 max_depth, denominator, offset, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.denominator = denominator
+        self.offset = offset
+        self.n_features = n_features
+
+    @classmethod
+    def from_model(cls, model):
+        """Export a fitted sklearn IsolationForest into flat arrays"""
+        features, thresholds, lefts, rights, leaf_values, roots = [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+
+        for estimator, estimator_features in zip(model.estimators_, model.estimators_features_):
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            children_left = tree.children_left
+            children_right = tree.children_right
+            is_leaf = children_left == -1
+
+            # Depth of every node (parents always precede children in sklearn trees)
+            depth = np.zeros(n_nodes, dtype=np.int64)
+            for node in range(n_nodes):
+                if not is_leaf[node]:
+                    depth[children_left[node]] = depth[node] + 1
+                    depth[children_right[node]] = depth[node] + 1
+            max_depth = max(max_depth, int(depth.max()))
+
+            node_ids = np.arange(n_nodes)
+
+            # Map subset feature indices back to input columns; leaves loop to themselves
+            feature = np.where(is_leaf, 0, np.asarray(estimator_features)[np.maximum(tree.feature, 0)])
+            threshold = np.where(is_leaf, np.inf, tree.threshold)
+            left = np.where(is_leaf, node_ids, children_left) + offset
+            right = np.where(is_leaf, node_ids, children_right) + offset
+
+            # Path length contributed by a sample ending in each leaf
+            leaf_value = np.where(
+                is_leaf,
+                depth + average_path_length(tree.n_node_samples),
+                0.0
+            )
+
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append(left)
+            rights.append(right)
+            leaf_values.append(leaf_value)
+            roots.append(offset)
+            offset += n_nodes
+
+        denominator = len(model.estimators_) * average_path_length([model.max_samples_])[0]
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            leaf_value=np.concatenate(leaf_values).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            denominator=float(denominator),
+            offset=float(model.offset_),
+            n_features=int(model.n_features_in_)
+        )
+
+    def save(self, path):
+        """Write the node arrays as .npy files plus a meta.json into a directory"""
+        os.makedirs(path, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({
+                'max_depth': self.max_depth,
+                'denominator': self.denominator,
+                'offset': self.offset,
+                'n_features': self.n_features
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Load a saved evaluator; with mmap_mode the node arrays stay on shared pages"""
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+
+        arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in cls.ARRAYS
+        }
+        return cls(**arrays, **meta)
+
+    @property
+    def nbytes(self):
+        """Size of the node arrays in bytes"""
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def _path_lengths(self, X):
+        """Total path length over all trees for each row of X"""
+        n_samples = X.shape[0]
+        rows = np.arange(n_samples)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_samples, len(self.roots))).copy()
+
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.leaf_value[nodes].sum(axis=1)
+
+    def score_samples(self, X):
+        """Opposite of the anomaly score, as IsolationForest.score_samples"""
+        # sklearn trees split on float32 inputs
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got shape {X.shape}")
+
+        depths = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], self.CHUNK_SIZE):
+            end = start + self.CHUNK_SIZE
+            depths[start:end] = self._path_lengths(X[start:end])
+
+        if self.denominator == 0:
+            return -np.ones_like(depths)
+        return -(2 ** (-depths / self.denominator))
+
+    def decision_function(self, X):
+        """Score shifted by the fitted offset (negative means anomaly)"""
+        return self.score_samples(X) - self.offset
+
+    def predict(self, X):
+        """Predict -1 for anomalies and 1 for normal samples"""
+        return np.where(self.decision_function(X) < 0, -1, 1)
@@ -0,0 +1,264 @@
+"""
+Process-pool inference backend
+Anomaly scoring runs in dedicated model-holding worker processes; feature
+matrices are passed through shared memory so API workers (eventlet green
+threads) only wait on a pipe while the CPU work happens elsewhere
+"""
+import atexit
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection, wait
+import numpy as np
+from config import Config
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Smallest share of a batch worth sending to another worker process
+MIN_CHUNK_ROWS = 2048
+
+def _attach(name):
+    """Attach to a parent's shared memory block without tracking it in this process"""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        # The parent owns (and unlinks) the block; don't let this process's
+        # resource tracker unlink it too on exit
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm
+
+def _worker_main(conn):
+    """Worker process loop: score matrices from shared memory until told to stop"""
+    from services import model_store
+    from services.ml_service import MLService
+
+    services = {}
+    buffers = {}
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+
+        shm_name, rows, n_features, version, model_dir = message
+        try:
+            service = services.get((model_dir, version))
+            if service is None:
+                service = services[(model_dir, version)] = MLService(
+                    lazy=False, version=version, model_path=model_dir, in_worker=True
+                )
+            elif model_store.get_model('anomaly_detector', version, model_dir).model is not service.model:
+                # The artifact was retrained in place; pick up the new fit
+                service.load_model()
+
+            if shm_name not in buffers:
+                # The parent replaced this worker's buffer with a larger one
+                for shm in buffers.values():
+                    shm.close()
+                buffers = {shm_name: _attach(shm_name)}
+            features = np.ndarray((rows, n_features), dtype=np.float64, buffer=buffers[shm_name].buf)
+
+            labels, scores = service.score_matrix(features)
+            conn.send(('ok', np.asarray(labels), np.asarray(scores)))
+        except Exception as e:
+            conn.send(('error', f'{type(e).__name__}: {e}'))
+
+    for shm in buffers.values():
+        shm.close()
+
+def _worker_entry(fd):
+    """Entry point of a worker interpreter started by _WorkerSlot"""
+    _worker_main(Connection(fd))
+
+class _WorkerSlot:
+    """One worker process with its pipe and shared input buffer"""
+
+    def __init__(self):
+        parent_sock, child_sock = socket.socketpair()
+        child_fd = child_sock.detach()
+
+        # A fresh interpreter: no eventlet hub, threads or app state inherited,
+        # and unlike multiprocessing's spawn it does not re-import __main__
+        self.process = subprocess.Popen(
+            [sys.executable, '-c', f'from services.inference_pool import _worker_entry; _worker_entry({child_fd})'],
+            cwd=BACKEND_DIR,
+            pass_fds=(child_fd,)
+        )
+        os.close(child_fd)
+        self.conn = Connection(parent_sock.detach())
+        self.shm = None
+
+    def is_alive(self):
+        """Whether the worker process is still running"""
+        return self.process.poll() is None
+
+    def buffer(self, nbytes):
+        """Shared input buffer with room for nbytes, grown (and replaced) as needed"""
+        if self.shm is None or self.shm.size < nbytes:
+            self.release_buffer()
+            # Over-allocate so slowly growing batches don't reallocate every call
+            self.shm = shared_memory.SharedMemory(create=True, size=max(nbytes * 2, 1 << 20))
+        return self.shm
+
+    def release_buffer(self):
+        """Free the shared input buffer"""
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def stop(self):
+        """Ask the worker to exit, terminating it if it does not"""
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.conn.close()
+        self.release_buffer()
+
+class InferencePool:
+    """Pool of model-holding processes scoring feature matrices"""
+
+    def __init__(self, processes=None, timeout=None):
+        self.processes = processes or Config.INFERENCE_PROCESSES or os.cpu_count() or 1
+        self.timeout = timeout or Config.INFERENCE_TIMEOUT
+
+        self.idle = queue.Queue()
+        self.slots = []
+        self.lock = threading.Lock()
+
+        # Counters for observability
+        self.batches = 0
+        self.rows = 0
+        self.failures = 0
+
+    def start(self):
+        """Spawn the worker processes if they are not running"""
+        with self.lock:
+            if self.slots:
+                return
+            for _ in range(self.processes):
+                slot = _WorkerSlot()
+                self.slots.append(slot)
+                self.idle.put(slot)
+            print(f"✅ Inference pool started ({self.processes} processes)")
+
+    def _replace(self, slot):
+        """Restart a worker that died or stopped answering"""
+        self.failures += 1
+        slot.stop()
+        with self.lock:
+            replacement = _WorkerSlot()
+            self.slots[self.slots.index(slot)] = replacement
+        return replacement
+
+    def _acquire(self, wanted):
+        """Take one idle worker (waiting if needed) plus up to wanted-1 more that are free"""
+        slots = [self.idle.get(timeout=self.timeout)]
+        while len(slots) < wanted:
+            try:
+                slots.append(self.idle.get_nowait())
+            except queue.Empty:
+                break
+
+        # Replace workers that exited while idle
+        return [slot if slot.is_alive() else self._replace(slot) for slot in slots]
+
+    def score(self, features, version, model_dir=None):
+        """Score a feature matrix on the pool, returning (labels, scores)"""
+        model_dir = os.path.abspath(model_dir or Config.MODEL_PATH)
+        self.start()
+
+        features = np.ascontiguousarray(features, dtype=np.float64)
+        rows, n_features = features.shape
+        wanted = max(1, min(self.processes, rows // MIN_CHUNK_ROWS))
+        slots = self._acquire(wanted)
+
+        bounds = np.linspace(0, rows, len(slots) + 1).astype(int)
+        pending = {}
+        try:
+            for slot, start, end in zip(slots, bounds[:-1], bounds[1:]):
+                chunk = features[start:end]
+                shm = slot.buffer(chunk.nbytes)
+                np.ndarray(chunk.shape, dtype=np.float64, buffer=shm.buf)[:] = chunk
+                slot.conn.send((shm.name, end - start, n_features, version, model_dir))
+                pending[slot.conn] = (slot, start, end)
+
+            labels = np.empty(rows, dtype=np.int64)
+            scores = np.empty(rows, dtype=np.float64)
+            errors = []
+
+            # connection.wait() selects on the pipes, which yields under eventlet
+            while pending:
+                ready = wait(list(pending), timeout=self.timeout)
+                if not ready:
+                    raise TimeoutError('Inference pool timed out')
+                for conn in ready:
+                    slot, start, end = pending.pop(conn)
+                    reply = conn.recv()
+                    if reply[0] == 'ok':
+                        labels[start:end] = reply[1]
+                        scores[start:end] = reply[2]
+                    else:
+                        errors.append(reply[1])
+        except (EOFError, OSError, TimeoutError):
+            # Workers still holding a request (or gone) are in an unknown state
+            for i, slot in enumerate(slots):
+                if slot.conn in pending or not slot.is_alive():
+                    slots[i] = self._replace(slot)
+            raise
+        finally:
+            for slot in slots:
+                self.idle.put(slot)
+
+        if errors:
+            raise RuntimeError(errors[0])
+
+        self.batches += 1
+        self.rows += rows
+        return labels, scores
+
+    def shutdown(self):
+        """Stop all worker processes and free their buffers"""
+        with self.lock:
+            slots, self.slots = self.slots, []
+        for slot in slots:
+            slot.stop()
+        self.idle = queue.Queue()
+
+    def get_stats(self):
+        """Get pool statistics"""
+        return {
+            'backend': 'process',
+            'processes': self.processes,
+            'alive': sum(1 for slot in self.slots if slot.is_alive()),
+            'idle': self.idle.qsize(),
+            'batches': self.batches,
+            'rows': self.rows,
+            'failures': self.failures
+        }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Process-wide inference pool, created on first use (after gunicorn forks)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = InferencePool()
+            atexit.register(_pool.shutdown)
+        return _pool
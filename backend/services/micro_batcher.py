@@ -0,0 +1,119 @@
+"""
+Micro-batching queue for ML inference
+Coalesces concurrent single-record predictions into one matrix per model call
+"""
+import threading
+import queue
+import time
+from config import Config
+
+class _PendingPrediction:
+    """A single record waiting for its batch to be scored"""
+
+    __slots__ = ('record', 'result', 'error', 'done')
+
+    def __init__(self, record):
+        self.record = record
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+class MicroBatcher:
+    """Collect concurrent predict calls and score them as one batch"""
+
+    def __init__(self, predict_batch, window_ms=None, max_batch_size=None, timeout=None):
+        self.predict_batch = predict_batch
+        self.window = (window_ms if window_ms is not None else Config.MICRO_BATCH_WINDOW_MS) / 1000.0
+        self.max_batch_size = max_batch_size or Config.MICRO_BATCH_MAX_SIZE
+        self.timeout = timeout or Config.MICRO_BATCH_TIMEOUT
+
+        self.queue = queue.Queue()
+        self.worker = None
+        self.lock = threading.Lock()
+
+        # Counters for observability
+        self.batches = 0
+        self.records = 0
+        self.fallbacks = 0
+
+    def start(self):
+        """Start the batching worker thread if it is not running"""
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self._run, daemon=True)
+                self.worker.start()
+
+    def submit(self, record):
+        """Queue a record and block until its prediction is ready"""
+        # Rejected here so a malformed record never reaches a shared batch
+        if not isinstance(record, dict):
+            raise TypeError(f'Record must be an object, not {type(record).__name__}')
+
+        self.start()
+
+        pending = _PendingPrediction(record)
+        self.queue.put(pending)
+
+        if not pending.done.wait(self.timeout):
+            raise TimeoutError('Prediction batch timed out')
+        if pending.error is not None:
+            raise pending.error
+
+        return pending.result
+
+    def _collect(self):
+        """Block for the first record, then gather more until the window closes"""
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        """Worker loop: score each collected batch and hand back rows"""
+        while True:
+            batch = self._collect()
+
+            try:
+                results = self.predict_batch([pending.record for pending in batch])
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            except Exception as e:
+                print(f"❌ Micro-batch prediction error: {e}")
+                self._score_separately(batch)
+
+            self.batches += 1
+            self.records += len(batch)
+
+            for pending in batch:
+                pending.done.set()
+
+    def _score_separately(self, batch):
+        """Score a failed batch row by row so only the offending records get the error"""
+        for pending in batch:
+            try:
+                pending.result = self.predict_batch([pending.record])[0]
+            except Exception as e:
+                pending.error = e
+        self.fallbacks += 1
+
+    def get_stats(self):
+        """Get batching statistics"""
+        return {
+            'enabled': True,
+            'windowMs': self.window * 1000,
+            'maxBatchSize': self.max_batch_size,
+            'batches': self.batches,
+            'records': self.records,
+            'avgBatchSize': round(self.records / self.batches, 2) if self.batches else 0,
+            'rowByRowFallbacks': self.fallbacks,
+            'queued': self.queue.qsize()
+        }
@@ -5,27 +5,70 @@ import numpy as np
 import pandas as pd
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
-import joblib
+from sklearn.base import clone
 import os
+import time
+import threading
 from datetime import datetime
 from config import Config
+from services.forest_evaluator import FlatIsolationForest
+from services.multi_model_service import TRAFFIC_FEATURES, FeatureContext
+from services.prediction_cache import PredictionCache
+from services.scaler_folding import fold_scaler
+from services import model_store
+from services import inference_pool
 
 class MLService:
     """Machine Learning service for anomaly detection"""
     
-    def __init__(self):
+    def __init__(self, lazy=None, version=None, model_path=None, in_worker=False):
         self.model = None
+        self.fast_scorer = None
         self.scaler = StandardScaler()
+        self.input_scaler = self.scaler
         self.feature_names = []
-        self.model_path = Config.MODEL_PATH
-        self.model_version = Config.MODEL_VERSION
+        self.model_path = model_path or Config.MODEL_PATH
+        self.model_version = version or Config.MODEL_VERSION
         self.threshold = Config.PREDICTION_THRESHOLD
+        self.in_worker = in_worker
+        self.model_mtime = None
+        self.loaded = False
+        self.load_time_ms = None
+        self.load_lock = threading.Lock()
+        
+        # Scores of recently seen feature vectors (repeated flows skip the forest)
+        self.prediction_cache = PredictionCache() if Config.PREDICTION_CACHE_ENABLED else None
         
         # Create models directory if it doesn't exist
         os.makedirs(self.model_path, exist_ok=True)
         
-        # Load or initialize model
-        self.load_model()
+        if lazy is None:
+            lazy = Config.MODEL_LAZY_LOADING
+        
+        # Load or initialize model (deferred to first use when lazy)
+        if not lazy:
+            self.ensure_loaded()
+    
+    def ensure_loaded(self):
+        """Load the model once, on first use"""
+        if self.loaded:
+            return
+        
+        with self.load_lock:
+            if not self.loaded:
+                started = time.perf_counter()
+                self.load_model()
+                self.load_time_ms = round((time.perf_counter() - started) * 1000, 2)
+                self.loaded = True
+    
+    def get_readiness(self):
+        """Report whether the model is loaded and fitted"""
+        return {
+            'loaded': self.loaded,
+            'fitted': self.loaded and self.is_fitted(),
+            'loadTimeMs': self.load_time_ms,
+            'version': self.model_version
+        }
     
     def load_model(self):
         """Load trained model from disk"""
@@ -35,8 +78,13 @@ class MLService:
         
         try:
             if os.path.exists(model_file) and os.path.exists(scaler_file):
-                self.model = joblib.load(model_file)
-                self.scaler = joblib.load(scaler_file)
+                # Shared, already-prepared copy from the process-wide store
+                entry = model_store.get_model('anomaly_detector', self.model_version, self.model_path)
+                self.model = entry.model
+                self.scaler = entry.scaler
+                self.input_scaler = entry.input_scaler
+                self.fast_scorer = entry.fast_scorer
+                self.model_mtime = entry.mtime
                 
                 # Load feature names if available
                 if os.path.exists(features_file):
@@ -54,8 +102,27 @@ class MLService:
             print(f"❌ Error loading model: {e}")
             self.initialize_model()
     
+    def prepare_scoring(self):
+        """Fold the scaler into the fitted model and build the optional fast scorer"""
+        self.fast_scorer = None
+        self.input_scaler = self.scaler
+        
+        if Config.FOLD_SCALERS and self.is_fitted():
+            self.input_scaler = fold_scaler(self.model, self.scaler)
+            if self.input_scaler is not self.scaler:
+                print("✅ Scaler folded into model thresholds")
+        
+        if Config.FAST_FOREST_SCORING and self.is_fitted():
+            try:
+                self.fast_scorer = FlatIsolationForest.from_model(self.model)
+                print("✅ Fast forest scorer enabled")
+            except Exception as e:
+                print(f"⚠️  Fast forest scorer unavailable, using sklearn: {e}")
+    
     def initialize_model(self):
         """Initialize a new Isolation Forest model"""
+        self.fast_scorer = None
+        self.input_scaler = self.scaler
         self.model = IsolationForest(
             contamination=0.1,
             max_samples=256,
@@ -70,102 +137,214 @@ class MLService:
         scaler_file = os.path.join(self.model_path, f'scaler_{self.model_version}.pkl')
         
         try:
-            joblib.dump(self.model, model_file)
-            joblib.dump(self.scaler, scaler_file)
+            model_store.dump_artifact(self.model, model_file)
+            model_store.dump_artifact(self.scaler, scaler_file)
+            self.model_mtime = os.path.getmtime(model_file)
             print(f"✅ Model saved to {model_file}")
         except Exception as e:
             print(f"❌ Error saving model: {e}")
     
+    PROTOCOL_MAP = {'TCP': 1, 'UDP': 2, 'HTTP': 3, 'HTTPS': 4, 'SSH': 5, 'FTP': 6}
+    
+    # Same input layout as the cascade's anomaly detector: flow features, hour, day of week
+    N_FEATURES = len(TRAFFIC_FEATURES) + 2
+    
+    # /predict field names that differ from the flow feature names
+    FIELD_ALIASES = {'sourcePort': 'source_port', 'destinationPort': 'dest_port'}
+    
+    def flow_record(self, data):
+        """Map a network record onto the flow feature names (missing features keep their defaults)"""
+        record = dict(data)
+        for alias, name in self.FIELD_ALIASES.items():
+            if alias in data:
+                record.setdefault(name, data[alias])
+        
+        # Protocol encoding (TCP=1, UDP=2, HTTP=3, HTTPS=4, SSH=5, FTP=6, Other=0)
+        protocol = record.get('protocol')
+        if 'protocol' in record and not isinstance(protocol, (int, float)):
+            record['protocol'] = self.PROTOCOL_MAP.get(str(protocol or 'OTHER').upper(), 0)
+        return record
+    
     def extract_features(self, data):
         """Extract features from network data"""
-        features = []
+        return self.extract_features_batch([data])
+    
+    def feature_context(self, records, now=None):
+        """Features of a list of network records, with unreadable records set aside"""
+        # Hour and day of week (for temporal patterns) are shared by the whole batch
+        return FeatureContext([self.flow_record(data) for data in records], now=now or datetime.utcnow())
+    
+    def extract_features_batch(self, records, now=None):
+        """Extract features from a list of network records into one matrix, failing on any bad record"""
+        context = self.feature_context(records, now=now)
+        if context.errors:
+            i, reason = next(iter(context.errors.items()))
+            raise ValueError(f"Record {i}: {reason}")
+        return context.traffic_features
+    
+    def is_fitted(self):
+        """Check whether the loaded model has been fitted"""
+        return hasattr(self.model, 'offset_')
+    
+    def score_matrix(self, features):
+        """Score a feature matrix, returning (labels, anomaly_scores)"""
+        # Offload CPU-bound scoring to the model-holding worker processes
+        if Config.INFERENCE_BACKEND == 'process' and not self.in_worker:
+            return inference_pool.get_pool().score(features, self.model_version, self.model_path)
+        
+        # Scale features (skipped when the scaler is folded into the model)
+        features_scaled = features if self.input_scaler is None else self.input_scaler.transform(features)
         
-        # Convert data to feature vector
-        features.append(data.get('sourcePort', 0))
-        features.append(data.get('destinationPort', 0))
-        features.append(data.get('bytes', 0))
-        features.append(data.get('packets', 0))
-        features.append(data.get('duration', 0))
+        # One pass over the forest; label follows IsolationForest.predict
+        # (-1 for anomaly, 1 for normal) from the same scores
+        if self.fast_scorer is not None:
+            scores = self.fast_scorer.score_samples(features_scaled)
+        else:
+            scores = self.model.score_samples(features_scaled)
+        labels = np.where(scores - self.model.offset_ < 0, -1, 1)
         
-        # Protocol encoding (TCP=1, UDP=2, HTTP=3, HTTPS=4, Other=0)
-        protocol_map = {'TCP': 1, 'UDP': 2, 'HTTP': 3, 'HTTPS': 4, 'SSH': 5, 'FTP': 6}
-        protocol = data.get('protocol', 'OTHER').upper()
-        features.append(protocol_map.get(protocol, 0))
+        return labels, scores
+    
+    def format_prediction(self, label, anomaly_score):
+        """Build the prediction result dict for one scored record"""
+        # Calculate confidence (0-1)
+        confidence = abs(anomaly_score)
         
-        # Hour of day (for temporal patterns)
-        hour = datetime.utcnow().hour
-        features.append(hour)
+        # Determine severity based on score
+        if confidence > 0.8:
+            severity = 'critical'
+        elif confidence > 0.6:
+            severity = 'high'
+        elif confidence > 0.4:
+            severity = 'medium'
+        else:
+            severity = 'low'
         
-        return np.array(features).reshape(1, -1)
+        return {
+            'prediction': 'anomaly' if label == -1 else 'normal',
+            'confidence': float(confidence),
+            'anomaly_score': float(anomaly_score),
+            'severity': severity if label == -1 else 'low'
+        }
     
     def predict(self, data):
         """Make prediction on new data"""
         try:
+            self.ensure_loaded()
+            
             # Extract features
             features = self.extract_features(data)
             
             # Check if model is fitted
-            if not hasattr(self.model, 'offset_'):
+            if not self.is_fitted():
                 # If not fitted, return default prediction
-                return {
-                    'prediction': 'normal',
-                    'confidence': 0.5,
-                    'anomaly_score': 0.0,
-                    'severity': 'low'
-                }
-            
-            # Scale features
-            features_scaled = self.scaler.transform(features)
-            
-            # Make prediction (-1 for anomaly, 1 for normal)
-            prediction = self.model.predict(features_scaled)[0]
-            
-            # Get anomaly score
-            anomaly_score = self.model.score_samples(features_scaled)[0]
-            
-            # Calculate confidence (0-1)
-            confidence = abs(anomaly_score)
-            
-            # Determine severity based on score
-            if confidence > 0.8:
-                severity = 'critical'
-            elif confidence > 0.6:
-                severity = 'high'
-            elif confidence > 0.4:
-                severity = 'medium'
-            else:
-                severity = 'low'
+                return self.default_prediction()
             
-            result = {
-                'prediction': 'anomaly' if prediction == -1 else 'normal',
-                'confidence': float(confidence),
-                'anomaly_score': float(anomaly_score),
-                'severity': severity if prediction == -1 else 'low'
-            }
+            if self.prediction_cache is not None:
+                return self.predict_cached(features)[0]
             
-            return result
+            labels, scores = self.score_matrix(features)
+            return self.format_prediction(labels[0], scores[0])
             
         except Exception as e:
             print(f"❌ Prediction error: {e}")
-            return {
-                'prediction': 'error',
-                'confidence': 0.0,
-                'anomaly_score': 0.0,
-                'severity': 'low',
-                'error': str(e)
+            return self.error_prediction(e)
+    
+    @staticmethod
+    def error_prediction(error):
+        """Prediction returned for a record that could not be scored"""
+        return {
+            'prediction': 'error',
+            'confidence': 0.0,
+            'anomaly_score': 0.0,
+            'severity': 'low',
+            'error': str(error)
+        }
+    
+    def predict_batch(self, records):
+        """Make predictions on many records in a single pass, in input order"""
+        if not records:
+            return []
+        
+        self.ensure_loaded()
+        context = self.feature_context(records)
+        
+        # Only the records that could be read are scored; the others report why
+        return context.in_input_order(self._predict_matrix(context.traffic_features), self.error_prediction)
+    
+    def _predict_matrix(self, features):
+        """Predictions for every row of a feature matrix"""
+        if not len(features):
+            return []
+        
+        if not self.is_fitted():
+            return [self.default_prediction() for _ in range(len(features))]
+        
+        if self.prediction_cache is None:
+            labels, scores = self.score_matrix(features)
+            return [self.format_prediction(label, score) for label, score in zip(labels, scores)]
+        
+        return self.predict_cached(features)
+    
+    def predict_cached(self, features):
+        """Score only the rows whose (label, score) is not already cached"""
+        cache = self.prediction_cache
+        keys = cache.keys(features, self.model_version)
+        results = cache.get_many(keys)
+        
+        # Score each distinct missing vector once
+        missing = {}
+        for i, (key, result) in enumerate(zip(keys, results)):
+            if result is None:
+                missing.setdefault(key, i)
+        
+        if missing:
+            rows = list(missing.values())
+            labels, scores = self.score_matrix(features[rows])
+            scored = {
+                key: (int(label), float(score))
+                for key, label, score in zip(missing, labels, scores)
             }
+            cache.put_many(scored.items())
+            
+            results = [result if result is not None else scored[key] for key, result in zip(keys, results)]
+        
+        return [self.format_prediction(label, score) for label, score in results]
+    
+    def default_prediction(self):
+        """Prediction returned while no fitted model is available"""
+        return {
+            'prediction': 'normal',
+            'confidence': 0.5,
+            'anomaly_score': 0.0,
+            'severity': 'low'
+        }
     
     def train(self, X_train):
         """Train the model with data"""
         try:
-            # Scale the data
-            X_scaled = self.scaler.fit_transform(X_train)
+            self.ensure_loaded()
+            
+            # Fit fresh copies: the loaded model and scaler may be shared with
+            # other services and the model's thresholds may be folded
+            scaler = clone(self.scaler)
+            X_scaled = scaler.fit_transform(X_train)
+            
+            model = clone(self.model)
+            model.fit(X_scaled)
             
-            # Fit the model
-            self.model.fit(X_scaled)
+            self.fast_scorer = None
+            self.scaler = scaler
+            self.input_scaler = scaler
+            self.model = model
             
             # Save the model
             self.save_model()
+            self.prepare_scoring()
+            
+            # Cached scores came from the previous fit
+            if self.prediction_cache is not None:
+                self.prediction_cache.clear()
             
             print("✅ Model training completed")
             return {'status': 'success'}
@@ -174,47 +353,59 @@ class MLService:
             print(f"❌ Training error: {e}")
             return {'status': 'error', 'message': str(e)}
     
-    def retrain(self):
-        """Retrain model with latest data"""
-        from models.anomaly import Anomaly
+    def load_training_data(self, start=None, end=None, sample_size=None, progress=None):
+        """Build the training matrix from stored anomalies, returning (X, dataset_size)"""
         from database import db
+        from services.training_data import extract_training_matrix, training_window
+        
+        # Default to the configured window ending now
+        if start is None and end is None:
+            start, end = training_window()
         
+        X_train, rows_seen = extract_training_matrix(
+            db.session,
+            self.PROTOCOL_MAP,
+            self.N_FEATURES,
+            start=start,
+            end=end,
+            sample_size=sample_size,
+            progress=progress
+        )
+        
+        if rows_seen > len(X_train):
+            print(f"ℹ️  Sampled {len(X_train)} of {rows_seen} anomalies for training")
+        
+        return X_train, len(X_train)
+    
+    def record_training(self, dataset_size, duration=None):
+        """Store a ModelMetrics row for a completed training run"""
+        from models.model_metrics import ModelMetrics
+        from database import db
+        
+        metrics = ModelMetrics(
+            timestamp=datetime.utcnow(),
+            model_version=self.model_version,
+            status='active',
+            last_trained=datetime.utcnow(),
+            training_duration=int(duration) if duration is not None else None,
+            dataset_size=dataset_size
+        )
+        db.session.add(metrics)
+        db.session.commit()
+    
+    def retrain(self):
+        """Retrain model with latest data"""
         try:
-            # Get recent anomalies for retraining
-            anomalies = Anomaly.query.limit(10000).all()
+            X_train, dataset_size = self.load_training_data()
             
-            if len(anomalies) < 100:
+            if dataset_size < 100:
                 return {'status': 'insufficient_data', 'message': 'Not enough data for retraining'}
             
-            # Convert to feature matrix
-            X_train = []
-            for anomaly in anomalies:
-                features = self.extract_features({
-                    'sourcePort': anomaly.source_port,
-                    'destinationPort': anomaly.destination_port,
-                    'bytes': anomaly.bytes_transferred or 0,
-                    'packets': anomaly.packets or 0,
-                    'protocol': anomaly.protocol,
-                    'duration': 0
-                })
-                X_train.append(features[0])
-            
-            X_train = np.array(X_train)
-            
             # Train the model
             result = self.train(X_train)
             
             # Update model metrics
-            from models.model_metrics import ModelMetrics
-            metrics = ModelMetrics(
-                timestamp=datetime.utcnow(),
-                model_version=self.model_version,
-                status='active',
-                last_trained=datetime.utcnow(),
-                dataset_size=len(anomalies)
-            )
-            db.session.add(metrics)
-            db.session.commit()
+            self.record_training(dataset_size)
             
             return result
             
@@ -0,0 +1,297 @@
+"""
+Model registry with atomic hot-swap of model versions
+The active version is recorded in an ACTIVE_VERSION file in MODEL_PATH; every
+worker on the node watches it (and optionally a Redis channel for other nodes),
+loads and warms the new version off the request path, then swaps it in
+"""
+import os
+import glob
+import threading
+import tempfile
+import time
+from datetime import datetime
+from config import Config
+from services import model_store
+from services.ml_service import MLService
+from services.multi_model_service import MultiModelService
+
+ACTIVE_VERSION_FILE = 'ACTIVE_VERSION'
+
+class ModelBundle:
+    """Services for one model version, swapped in and out as a unit"""
+
+    def __init__(self, version, ml_service, multi_model_service, artifact_mtimes=None):
+        self.version = version
+        self.ml_service = ml_service
+        self.multi_model_service = multi_model_service
+        self.artifact_mtimes = artifact_mtimes or {}
+        self.activated_at = datetime.utcnow()
+
+def artifact_mtimes(version, model_dir=None):
+    """Modification time of each model artifact of a version (None when missing)"""
+    model_dir = model_dir or Config.MODEL_PATH
+    mtimes = {}
+
+    for name, prefixes in model_store.MODEL_ARTIFACTS.items():
+        path = model_store.artifact_path(model_dir, prefixes['model'], version)
+        mtimes[name] = os.path.getmtime(path) if os.path.exists(path) else None
+
+    return mtimes
+
+def active_version_path(model_dir=None):
+    """Path of the file naming the active model version"""
+    return os.path.join(model_dir or Config.MODEL_PATH, ACTIVE_VERSION_FILE)
+
+def read_active_version(model_dir=None):
+    """Version named in ACTIVE_VERSION, or MODEL_VERSION when there is none"""
+    try:
+        with open(active_version_path(model_dir), 'r') as f:
+            version = f.read().strip()
+        if version:
+            return version
+    except OSError:
+        pass
+    return Config.MODEL_VERSION
+
+def write_active_version(version, model_dir=None):
+    """Record the active version atomically so watchers never read a partial file"""
+    path = active_version_path(model_dir)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(f'{version}\n')
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def available_versions(model_dir=None):
+    """Versions with a complete anomaly detector artifact set on disk"""
+    model_dir = model_dir or Config.MODEL_PATH
+    versions = []
+
+    for path in glob.glob(model_store.artifact_path(model_dir, 'anomaly_detector', '*')):
+        version = os.path.basename(path)[len('anomaly_detector_'):-len('.pkl')]
+        if os.path.exists(model_store.artifact_path(model_dir, 'scaler', version)):
+            versions.append(version)
+
+    return sorted(versions)
+
+class ModelRegistry:
+    """Holds the active ModelBundle and replaces it when a new version is rolled out"""
+
+    def __init__(self, model_dir=None):
+        self.model_dir = model_dir or Config.MODEL_PATH
+        self.swap_lock = threading.Lock()
+        self.watcher = None
+        self.subscriber = None
+        self.last_error = None
+        self.swaps = 0
+
+        # Startup keeps lazy loading: the first bundle warms in the background
+        version = read_active_version(self.model_dir)
+        self.current = self._build_bundle(version, lazy=None)
+        self.watched_version = version
+
+    @property
+    def ml_service(self):
+        """Anomaly detector service of the active version"""
+        return self.current.ml_service
+
+    @property
+    def multi_model_service(self):
+        """Multi-model service of the active version"""
+        return self.current.multi_model_service
+
+    @property
+    def version(self):
+        """Active model version"""
+        return self.current.version
+
+    def _build_bundle(self, version, lazy=False):
+        """Create the services for one version (fully loaded unless lazy)"""
+        # Read before loading: a file replaced meanwhile shows up as a change on the next check
+        mtimes = artifact_mtimes(version, self.model_dir)
+        return ModelBundle(
+            version,
+            MLService(lazy=lazy, version=version, model_path=self.model_dir),
+            MultiModelService(model_dir=self.model_dir, version=version, lazy=lazy),
+            mtimes
+        )
+
+    def _warm_up(self, bundle):
+        """Run each model once so memory-mapped pages are touched before serving"""
+        # An empty record scores with every feature at its default
+        try:
+            bundle.ml_service.predict_batch([{}])
+        except Exception as e:
+            print(f"⚠️  Detector warm-up failed for {bundle.version}: {e}")
+
+        bundle.multi_model_service.analyze_many([{}])
+
+    def activate(self, version):
+        """Load, warm and swap in a version in this process"""
+        with self.swap_lock:
+            if version == self.current.version:
+                return {'status': 'unchanged', 'version': version}
+
+            if version not in available_versions(self.model_dir):
+                raise ValueError(f'Model version {version} not found in {self.model_dir}')
+
+            started = time.perf_counter()
+            print(f"🔄 Loading model version {version}...")
+            bundle = self._build_bundle(version)
+            self._warm_up(bundle)
+            previous = self._swap(bundle)
+
+            # The old bundle's services keep their models alive until released
+            model_store.evict(previous.version, self.model_dir)
+
+            load_ms = round((time.perf_counter() - started) * 1000, 2)
+            print(f"✅ Model version {previous.version} -> {version} ({load_ms} ms)")
+            return {'status': 'activated', 'version': version, 'previousVersion': previous.version, 'loadTimeMs': load_ms}
+
+    def _swap(self, bundle):
+        """Make a warmed bundle the active one; returns the bundle it replaced"""
+        # A single reference assignment: requests that already hold the old
+        # bundle finish on it, new requests see the new one
+        previous = self.current
+        self.current = bundle
+        self.watched_version = bundle.version
+        self.swaps += 1
+
+        if previous.ml_service.prediction_cache is not None:
+            previous.ml_service.prediction_cache.clear()
+        return previous
+
+    def reload(self):
+        """Rebuild, warm and swap in the active version after its artifacts were replaced in place"""
+        with self.swap_lock:
+            version = self.current.version
+            started = time.perf_counter()
+            print(f"🔄 Reloading model version {version}...")
+
+            # model_store notices the new mtimes, so every service gets the new artifacts
+            bundle = self._build_bundle(version)
+            self._warm_up(bundle)
+            self._swap(bundle)
+
+            load_ms = round((time.perf_counter() - started) * 1000, 2)
+            print(f"✅ Reloaded retrained model {version} ({load_ms} ms)")
+            return {'status': 'reloaded', 'version': version, 'loadTimeMs': load_ms}
+
+    def rollout(self, version):
+        """Activate a version here, then on every worker and (optionally) every node"""
+        result = self.activate(version)
+
+        # Other workers on this node pick the file up on their next poll
+        write_active_version(version, self.model_dir)
+
+        if Config.MODEL_ROLLOUT_REDIS:
+            result['published'] = self._publish(version)
+
+        return result
+
+    def check_active_version(self):
+        """Activate the version named in ACTIVE_VERSION if it changed"""
+        version = read_active_version(self.model_dir)
+        if version == self.watched_version:
+            return
+
+        # Only try a given version once; a failed rollout waits for the next change
+        self.watched_version = version
+        try:
+            self.activate(version)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = f'{version}: {e}'
+            print(f"❌ Model rollout to {version} failed: {e}")
+
+    def check_retrained(self):
+        """Rebuild the active bundle if any of its artifacts was retrained in place (by this or another process)"""
+        bundle = self.current
+        mtimes = artifact_mtimes(bundle.version, self.model_dir)
+        if mtimes == bundle.artifact_mtimes:
+            return False
+
+        try:
+            self.reload()
+            self.last_error = None
+            return True
+        except Exception as e:
+            # Only try a given set of artifacts once; a failed reload waits for the next change
+            bundle.artifact_mtimes = mtimes
+            self.last_error = f'{bundle.version}: {e}'
+            print(f"❌ Reloading retrained model failed: {e}")
+            return False
+
+    def _watch(self, interval):
+        """Watcher loop polling ACTIVE_VERSION and the active artifacts"""
+        while True:
+            time.sleep(interval)
+            self.check_active_version()
+            self.check_retrained()
+
+    def _redis_client(self):
+        """Redis connection for rollout notifications (redis is imported on demand)"""
+        import redis
+
+        return redis.Redis(
+            host=Config.REDIS_HOST,
+            port=Config.REDIS_PORT,
+            db=Config.REDIS_DB,
+            decode_responses=True,
+            socket_connect_timeout=1
+        )
+
+    def _publish(self, version):
+        """Tell other nodes to roll out a version; returns False when Redis is unavailable"""
+        try:
+            self._redis_client().publish(Config.MODEL_ROLLOUT_CHANNEL, version)
+            return True
+        except Exception as e:
+            print(f"⚠️  Model rollout not published: {e}")
+            return False
+
+    def _subscribe(self):
+        """Redis subscriber loop: record published versions in ACTIVE_VERSION"""
+        while True:
+            try:
+                pubsub = self._redis_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(Config.MODEL_ROLLOUT_CHANNEL)
+
+                for message in pubsub.listen():
+                    version = str(message.get('data', '')).strip()
+                    if version and version != read_active_version(self.model_dir):
+                        # Every worker on the node follows the file; the write is idempotent
+                        write_active_version(version, self.model_dir)
+                        self.check_active_version()
+            except Exception as e:
+                print(f"⚠️  Model rollout subscriber error: {e}")
+                time.sleep(Config.MODEL_WATCH_INTERVAL)
+
+    def start(self, interval=None):
+        """Start the ACTIVE_VERSION watcher (and Redis subscriber) in this process"""
+        interval = interval if interval is not None else Config.MODEL_WATCH_INTERVAL
+
+        if interval > 0 and (self.watcher is None or not self.watcher.is_alive()):
+            self.watcher = threading.Thread(target=self._watch, args=(interval,), name='model-watcher', daemon=True)
+            self.watcher.start()
+
+        if Config.MODEL_ROLLOUT_REDIS and (self.subscriber is None or not self.subscriber.is_alive()):
+            self.subscriber = threading.Thread(target=self._subscribe, name='model-rollout', daemon=True)
+            self.subscriber.start()
+
+    def get_status(self):
+        """Describe the active bundle and the versions on disk"""
+        return {
+            'activeVersion': self.current.version,
+            'activatedAt': self.current.activated_at.isoformat(),
+            'fileVersion': read_active_version(self.model_dir),
+            'availableVersions': available_versions(self.model_dir),
+            'swaps': self.swaps,
+            'watching': self.watcher is not None and self.watcher.is_alive(),
+            'redisRollout': Config.MODEL_ROLLOUT_REDIS,
+            'lastError': self.last_error
+        }
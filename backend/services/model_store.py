@@ -0,0 +1,315 @@
+"""
+Process-wide store of loaded model artifacts
+Artifacts are loaded once per process and shared by every service that uses
+them. sklearn trees copy their node arrays when unpickled, so tree models are
+private memory of the loading process; workers share them only copy-on-write
+when the gunicorn master loads them before fork. The flat anomaly detector
+scorer is the one model served from memory-mapped .npy files
+"""
+import os
+import json
+import shutil
+import threading
+import tempfile
+from datetime import datetime
+import joblib
+import numpy as np
+from config import Config
+from services.forest_evaluator import FlatIsolationForest
+from services.scaler_folding import fold_scaler
+
+# Artifact file prefixes for each model: {prefix}_{version}.pkl
+MODEL_ARTIFACTS = {
+    'anomaly_detector': {'model': 'anomaly_detector', 'scaler': 'scaler', 'encoder': None},
+    'attack_classifier': {'model': 'attack_classifier', 'scaler': 'attack_scaler', 'encoder': 'attack_encoder'},
+    'severity_predictor': {'model': 'severity_predictor', 'scaler': 'severity_scaler', 'encoder': 'severity_encoder'},
+    'traffic_forecaster': {'model': 'traffic_forecaster', 'scaler': 'traffic_scaler', 'encoder': None}
+}
+
+# Size of one sklearn tree node record (children, feature, threshold, impurity, counts)
+NODE_RECORD_BYTES = 64
+
+class LoadedModel:
+    """A model with its scaler/encoder, prepared for serving"""
+
+    def __init__(self, name, version, model, scaler, encoder, files):
+        self.pid = os.getpid()
+        self.name = name
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.encoder = encoder
+        self.files = files
+        self.mtime = os.path.getmtime(files['model'])
+        # Scaler to apply before scoring: None when folded into the model
+        self.input_scaler = scaler
+        self.fast_scorer = None
+
+    @property
+    def scaler_folded(self):
+        """Whether (some of) the scaler was folded into the model"""
+        return self.input_scaler is not self.scaler
+
+    @property
+    def artifact_bytes(self):
+        """Size of the artifact files on disk"""
+        return sum(os.path.getsize(path) for path in self.files.values() if os.path.exists(path))
+
+    @property
+    def mapped_bytes(self):
+        """Bytes of arrays read from memory-mapped files (shared through the page cache)"""
+        if self.fast_scorer is None:
+            return 0
+        arrays = [getattr(self.fast_scorer, name) for name in FlatIsolationForest.ARRAYS]
+        return sum(array.nbytes for array in arrays if isinstance(array, np.memmap))
+
+    @property
+    def memory_bytes(self):
+        """Estimated in-memory size of the model's arrays, mapped ones included (artifact size otherwise)"""
+        predictors = getattr(self.model, '_predictors', None)
+        if predictors is not None:
+            # HistGradientBoosting: one node array per tree
+            return sum(predictor.nodes.nbytes for iteration in predictors for predictor in iteration)
+
+        estimators = getattr(self.model, 'estimators_', None)
+        if estimators is None:
+            return self.artifact_bytes
+
+        total = 0
+        for estimator in np.ravel(estimators):
+            tree = getattr(estimator, 'tree_', None)
+            if tree is None:
+                return self.artifact_bytes
+            total += tree.node_count * NODE_RECORD_BYTES + tree.value.nbytes
+
+        if self.fast_scorer is not None:
+            total += self.fast_scorer.nbytes
+        return total
+
+_models = {}
+_load_locks = {}
+# Guards the two dicts only; loads hold the per-key lock from _load_locks
+_lock = threading.Lock()
+
+def artifact_path(model_dir, prefix, version):
+    """Path of one versioned artifact file"""
+    return os.path.join(model_dir, f'{prefix}_{version}.pkl')
+
+def load_artifact(path):
+    """
+    Load a joblib artifact, memory-mapping its plain NumPy arrays if configured.
+
+    sklearn's Tree.__setstate__ copies the node arrays it is given, so the
+    trees of forests and boosting models end up in private memory either way.
+    """
+    return joblib.load(path, mmap_mode=Config.MODEL_MMAP_MODE or None)
+
+def dump_artifact(obj, path):
+    """
+    Write a joblib artifact atomically.
+
+    Other processes may have the old file memory-mapped; replacing it with a
+    rename keeps their pages valid instead of truncating the file under them.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.pkl')
+    os.close(fd)
+    try:
+        joblib.dump(obj, tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def manifest_path(model_dir, version):
+    """Path of the training manifest (evaluation metrics) of one version"""
+    return os.path.join(model_dir, f'training_manifest_{version}.json')
+
+def _manifest_value(value):
+    """JSON-safe metric value: NumPy scalars become floats or ints, ints stay ints"""
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(value)
+    return value
+
+def write_training_manifest(model_dir, version, results, timing=None):
+    """Record per-model training results and evaluation metrics for a version"""
+    path = manifest_path(model_dir, version)
+    manifest = {
+        'version': version,
+        'trainedAt': datetime.utcnow().isoformat(),
+        'models': {
+            name: {key: _manifest_value(value) for key, value in result.items()}
+            for name, result in results.items()
+        }
+    }
+    if timing:
+        manifest['timing'] = timing
+
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return path
+
+def read_training_manifest(model_dir, version):
+    """Training manifest of a version, or None if it was trained without one"""
+    try:
+        with open(manifest_path(model_dir, version), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _load_fast_scorer(entry):
+    """Load (or build and cache on disk) the flat scorer for an anomaly detector"""
+    bundle_dir = os.path.splitext(entry.files['model'])[0] + '.flat'
+    source_file = os.path.join(bundle_dir, 'source.json')
+    source = {'model_mtime': entry.mtime, 'scaler_folded': entry.scaler_folded}
+
+    try:
+        if os.path.exists(source_file):
+            with open(source_file, 'r') as f:
+                if json.load(f) == source:
+                    return FlatIsolationForest.load(bundle_dir, mmap_mode=Config.MODEL_MMAP_MODE or None)
+    except Exception as e:
+        print(f"⚠️  Could not load flat scorer bundle {bundle_dir}: {e}")
+
+    scorer = FlatIsolationForest.from_model(entry.model)
+
+    # Persist next to the model so later processes can memory-map it
+    try:
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(bundle_dir), prefix='.tmp-flat-')
+        scorer.save(tmp_dir)
+        with open(os.path.join(tmp_dir, 'source.json'), 'w') as f:
+            json.dump(source, f)
+        if os.path.exists(bundle_dir):
+            old_dir = f'{bundle_dir}.old-{os.getpid()}'
+            os.rename(bundle_dir, old_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        os.rename(tmp_dir, bundle_dir)
+        return FlatIsolationForest.load(bundle_dir, mmap_mode=Config.MODEL_MMAP_MODE or None)
+    except Exception as e:
+        print(f"⚠️  Could not save flat scorer bundle {bundle_dir}: {e}")
+        return scorer
+
+def _load_model(name, version, model_dir):
+    """Load and prepare one model from disk"""
+    prefixes = MODEL_ARTIFACTS[name]
+    files = {
+        kind: artifact_path(model_dir, prefix, version)
+        for kind, prefix in prefixes.items() if prefix
+    }
+
+    missing = [path for path in files.values() if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Missing artifacts for {name}: {', '.join(missing)}")
+
+    entry = LoadedModel(
+        name=name,
+        version=version,
+        model=load_artifact(files['model']),
+        scaler=load_artifact(files['scaler']),
+        encoder=load_artifact(files['encoder']) if 'encoder' in files else None,
+        files=files
+    )
+
+    # Prepare once here so forked workers never write to the shared pages
+    if Config.FOLD_SCALERS:
+        entry.input_scaler = fold_scaler(entry.model, entry.scaler)
+    if name == 'anomaly_detector' and Config.FAST_FOREST_SCORING:
+        entry.fast_scorer = _load_fast_scorer(entry)
+
+    return entry
+
+def _load_lock(key):
+    """Lock serialising loads of one (name, version, model_dir) key"""
+    with _lock:
+        return _load_locks.setdefault(key, threading.Lock())
+
+def _current(key, model_file):
+    """Cached entry of a key if its artifact has not been replaced on disk"""
+    with _lock:
+        entry = _models.get(key)
+    if entry is None or not os.path.exists(model_file) or os.path.getmtime(model_file) != entry.mtime:
+        return None
+    return entry
+
+def get_model(name, version=None, model_dir=None):
+    """Get a prepared model, loading it on first use in this process"""
+    version = version or Config.MODEL_VERSION
+    model_dir = os.path.abspath(model_dir or Config.MODEL_PATH)
+    key = (name, version, model_dir)
+    model_file = artifact_path(model_dir, MODEL_ARTIFACTS[name]['model'], version)
+
+    entry = _current(key, model_file)
+    if entry is not None:
+        return entry
+
+    # Different models load in parallel; concurrent callers of one model wait for a single load
+    with _load_lock(key):
+        # Reload if the artifact was replaced on disk (e.g. retrained in place)
+        entry = _current(key, model_file)
+        if entry is None:
+            entry = _load_model(name, version, model_dir)
+            with _lock:
+                _models[key] = entry
+        return entry
+
+def evict(version, model_dir=None):
+    """Drop cached entries of one version (services still holding them keep them alive)"""
+    model_dir = os.path.abspath(model_dir or Config.MODEL_PATH)
+
+    with _lock:
+        for key in [key for key in _models if key[1] == version and key[2] == model_dir]:
+            del _models[key]
+            _load_locks.pop(key, None)
+
+def preload_models(version=None, model_dir=None):
+    """Load every available model into this process (call before forking workers)"""
+    loaded = {}
+    for name in MODEL_ARTIFACTS:
+        try:
+            get_model(name, version, model_dir)
+            loaded[name] = True
+        except Exception as e:
+            print(f"   ⚠️  {name} not preloaded: {e}")
+            loaded[name] = False
+    return loaded
+
+def get_loaded_models():
+    """Describe the models held by this process"""
+    with _lock:
+        entries = list(_models.values())
+
+    pid = os.getpid()
+    return [{
+        'name': entry.name,
+        'version': entry.version,
+        'scalerFolded': entry.scaler_folded,
+        'fastScorer': entry.fast_scorer is not None,
+        'artifactBytes': entry.artifact_bytes,
+        'memoryBytes': entry.memory_bytes,
+        # Only these bytes are shared through memory-mapped files
+        'mappedBytes': entry.mapped_bytes,
+        # Loaded by the parent before fork: private pages are shared copy-on-write
+        'inheritedFromParent': entry.pid != pid
+    } for entry in entries]
+
+def memory_usage():
+    """Resident memory of the current process in MB (PSS/USS where the OS reports them)"""
+    import psutil
+
+    process = psutil.Process()
+    try:
+        info = process.memory_full_info()
+    except Exception:
+        info = process.memory_info()
+
+    usage = {'pid': process.pid, 'rssMb': round(info.rss / 1024 / 1024, 2)}
+    # PSS splits shared pages between the processes mapping them
+    for field in ('pss', 'uss', 'shared'):
+        if hasattr(info, field):
+            usage[f'{field}Mb'] = round(getattr(info, field) / 1024 / 1024, 2)
+    return usage
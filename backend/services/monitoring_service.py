@@ -18,6 +18,7 @@ def generate_mock_traffic_data():
     """Generate mock network traffic data"""
     from models.network_traffic import NetworkTraffic
     from database import db
+    from services import traffic_rollups
     
     # Generate realistic traffic patterns
     base_traffic = random.uniform(10, 50)
@@ -40,6 +41,7 @@ def generate_mock_traffic_data():
     )
     
     db.session.add(traffic)
+    traffic_rollups.record(db.session, traffic)
     db.session.commit()
     
     return traffic
@@ -2,27 +2,208 @@
 Multi-Model ML Service
 Service quản lý và sử dụng tất cả các ML models
 """
-import os
-import joblib
-import json
 import numpy as np
 import pandas as pd
 from datetime import datetime
+import math
+import time
+import threading
 import warnings
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from services import model_store
 
 # Suppress scikit-learn version warnings
 warnings.filterwarnings('ignore', category=UserWarning, module='sklearn')
 
+# Flow features shared by the anomaly detector and attack classifier,
+# in training column order (hour and day_of_week are appended per request)
+TRAFFIC_FEATURES = [
+    ('source_port', 0),
+    ('dest_port', 0),
+    ('protocol', 1),
+    ('packet_size', 500),
+    ('packets', 50),
+    ('bytes', 25000),
+    ('duration', 1.0),
+    ('flag_count', 2),
+    ('syn_flag', 1),
+    ('ack_flag', 1),
+    ('rst_flag', 0),
+    ('connection_rate', 5.0)
+]
+
+SEVERITY_FEATURES = [
+    ('connection_rate', 10),
+    ('failed_attempts', 5),
+    ('data_volume_mb', 10),
+    ('unique_sources', 5),
+    ('unique_destinations', 5),
+    ('unusual_ports', 2),
+    ('time_window_minutes', 10),
+    ('is_encrypted', 0),
+    ('matches_known_signature', 0),
+    ('geographic_anomaly', 0),
+    ('affected_systems', 1),
+    ('business_hours', 1)
+]
+
+# Alert-level context read from the flow record: (severity feature column, name, default)
+ALERT_CONTEXT = [
+    (0, 'connection_rate', 10),
+    (1, 'failed_attempts', 5),
+    (3, 'unique_sources', 1),
+    (4, 'unique_destinations', 1),
+    (5, 'unusual_ports', 0),
+    (7, 'is_encrypted', 0),
+    (9, 'geographic_anomaly', 0),
+    (10, 'affected_systems', 1)
+]
+
+FORECAST_TIME_FEATURES = ['hour', 'day_of_week', 'day_of_month', 'is_weekend', 'is_business_hours']
+
+FORECAST_TRAFFIC_FEATURES = [
+    ('traffic_mbps', 100),
+    ('connections_count', 500),
+    ('packets_per_sec', 5000),
+    ('avg_packet_size', 600),
+    ('tcp_ratio', 0.7),
+    ('udp_ratio', 0.2),
+    ('http_ratio', 0.4),
+    ('traffic_lag_1', 100),
+    ('traffic_lag_2', 100),
+    ('traffic_lag_3', 100)
+]
+
+def _elapsed_ms(started):
+    """Milliseconds since a time.perf_counter() reading"""
+    return round((time.perf_counter() - started) * 1000, 3)
+
+def feature_value(record, name, default):
+    """Numeric value of one record field; missing or null fields take the default"""
+    value = record.get(name)
+    if value is None:
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = math.nan
+    if not math.isfinite(number):
+        raise ValueError(f"Field '{name}' must be a finite number, got {value!r}")
+    return number
+
+class FeatureContext:
+    """Per-request features built once and shared by all models
+    
+    Records whose fields cannot be read as numbers are left out of the
+    matrices: `errors` maps their input index to the reason, and `records`,
+    `valid` and the feature rows cover only the remaining ones.
+    """
+    
+    def __init__(self, records, now=None):
+        self.now = now or datetime.now()
+        self.n_input = len(records)
+        self.errors = {}
+        
+        flow_rows = []
+        alert_rows = []
+        for i, record in enumerate(records):
+            try:
+                flow = [feature_value(record, name, default) for name, default in TRAFFIC_FEATURES]
+                alert = [feature_value(record, name, default) for _, name, default in ALERT_CONTEXT]
+            except ValueError as e:
+                self.errors[i] = str(e)
+                continue
+            flow_rows.append(flow)
+            alert_rows.append(alert)
+        
+        self.valid = [i for i in range(len(records)) if i not in self.errors]
+        self.records = [records[i] for i in self.valid]
+        
+        n_flow = len(TRAFFIC_FEATURES)
+        self.traffic_features = np.empty((len(self.valid), n_flow + 2), dtype=np.float64)
+        self.traffic_features[:, :n_flow] = np.array(flow_rows, dtype=np.float64).reshape(-1, n_flow)
+        self.traffic_features[:, n_flow] = self.now.hour
+        self.traffic_features[:, n_flow + 1] = self.now.weekday()
+        self.alert_context = np.array(alert_rows, dtype=np.float64).reshape(-1, len(ALERT_CONTEXT))
+    
+    def in_input_order(self, results, error_result):
+        """Per-record results for the valid rows, with error_result(reason) for the rejected ones"""
+        ordered = [None] * self.n_input
+        for i, result in zip(self.valid, results):
+            ordered[i] = result
+        for i, reason in self.errors.items():
+            ordered[i] = error_result(reason)
+        return ordered
+    
+    @staticmethod
+    def time_features(now):
+        """Calendar features used by the traffic forecaster"""
+        return [
+            now.hour,
+            now.weekday(),
+            now.day,
+            int(now.weekday() >= 5),
+            int(8 <= now.hour <= 18)
+        ]
+    
+    def column(self, name):
+        """View of one flow feature column"""
+        return self.traffic_features[:, [n for n, _ in TRAFFIC_FEATURES].index(name)]
+    
+    def severity_features(self, rows, attack_confidence):
+        """Severity predictor inputs for the selected rows"""
+        X = np.empty((len(rows), len(SEVERITY_FEATURES)), dtype=np.float64)
+        
+        X[:, 2] = self.column('bytes')[rows] / 1024 / 1024
+        X[:, 6] = self.column('duration')[rows] / 60
+        X[:, 8] = attack_confidence > 80
+        X[:, 11] = int(8 <= self.now.hour <= 18)
+        
+        # Alert-level context is only known when the caller supplies it
+        X[:, [column for column, _, _ in ALERT_CONTEXT]] = self.alert_context[rows]
+        
+        return X
+    
+    def forecast_features(self):
+        """Traffic forecaster inputs derived from each flow"""
+        n_time = len(FORECAST_TIME_FEATURES)
+        X = np.empty((len(self.records), n_time + len(FORECAST_TRAFFIC_FEATURES)), dtype=np.float64)
+        
+        duration = self.column('duration')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            traffic_mbps = np.where(duration != 0, self.column('bytes') / 1024 / 1024 / duration * 8, 0.0)
+            packets_per_sec = np.where(duration != 0, self.column('packets') / duration, 0.0)
+        
+        X[:, :n_time] = self.time_features(self.now)
+        X[:, n_time] = traffic_mbps
+        X[:, n_time + 1] = 500
+        X[:, n_time + 2] = packets_per_sec
+        X[:, n_time + 3] = self.column('packet_size')
+        X[:, n_time + 4:] = [default for _, default in FORECAST_TRAFFIC_FEATURES[4:]]
+        
+        return X
+
 class MultiModelService:
     """Service to manage multiple ML models"""
     
-    def __init__(self, model_dir='./models', version='1.0.0'):
+    # Service attributes filled from each model_store entry:
+    # name -> (display name, model attr, scaler attr, encoder attr)
+    MODELS = {
+        'anomaly_detector': ('Anomaly Detector', 'anomaly_detector', 'anomaly_scaler', None),
+        'attack_classifier': ('Attack Classifier', 'attack_classifier', 'attack_scaler', 'attack_encoder'),
+        'severity_predictor': ('Severity Predictor', 'severity_predictor', 'severity_scaler', 'severity_encoder'),
+        'traffic_forecaster': ('Traffic Forecaster', 'traffic_forecaster', 'traffic_scaler', None)
+    }
+    
+    def __init__(self, model_dir='./models', version='1.0.0', lazy=None):
         self.model_dir = model_dir
         self.version = version
         
         # Models
         self.anomaly_detector = None
         self.anomaly_scaler = None
+        self.anomaly_fast_scorer = None
         
         self.attack_classifier = None
         self.attack_scaler = None
@@ -35,272 +216,314 @@ class MultiModelService:
         self.traffic_forecaster = None
         self.traffic_scaler = None
         
-        # Load all models
-        self.load_all_models()
+        # Readiness of each model (filled as models load)
+        self.readiness = {
+            name: {'loaded': False, 'attempted': False, 'error': None, 'loadTimeMs': None,
+                   'artifactBytes': None, 'memoryBytes': None, 'estimator': None}
+            for name in self.MODELS
+        }
+        self._load_locks = {name: threading.Lock() for name in self.MODELS}
+        self._warmup = None
+        
+        if lazy is None:
+            lazy = Config.MODEL_LAZY_LOADING
+        
+        # Load all models up front unless they load on first use
+        if not lazy:
+            self.load_all_models()
+    
+    def load_model(self, name, force=False):
+        """Load one model if it has not been loaded yet; returns True when available"""
+        status = self.readiness[name]
+        label, model_attr, scaler_attr, encoder_attr = self.MODELS[name]
+        
+        with self._load_locks[name]:
+            if status['attempted'] and not force:
+                return status['loaded']
+            
+            started = time.perf_counter()
+            try:
+                entry = model_store.get_model(name, self.version, self.model_dir)
+            except Exception as e:
+                status.update(loaded=False, attempted=True, error=str(e))
+                print(f"   ⚠️  {label} not found")
+                return False
+            
+            setattr(self, model_attr, entry.model)
+            setattr(self, scaler_attr, entry.input_scaler)
+            if encoder_attr:
+                setattr(self, encoder_attr, entry.encoder)
+            if name == 'anomaly_detector':
+                self.anomaly_fast_scorer = entry.fast_scorer
+            
+            status.update(
+                loaded=True,
+                attempted=True,
+                error=None,
+                loadTimeMs=_elapsed_ms(started),
+                artifactBytes=entry.artifact_bytes,
+                memoryBytes=entry.memory_bytes,
+                # Exact and histogram boosting artifacts load the same way
+                estimator=type(entry.model).__name__
+            )
+            print(f"   ✅ {label} loaded ({status['loadTimeMs']} ms)")
+            return True
+    
+    def _ensure_loaded(self, name):
+        """Lazily load a model on first use"""
+        if not self.readiness[name]['attempted']:
+            self.load_model(name)
     
     def load_all_models(self):
         """Load all available models"""
         print("\n🔄 Loading ML models...")
+        self.warm_up(background=False, force=True)
+    
+    def warm_up(self, background=True, force=False, max_workers=None):
+        """Load all models concurrently in a thread pool
         
-        # 1. Anomaly Detector
-        try:
-            self.anomaly_detector = joblib.load(
-                os.path.join(self.model_dir, f'anomaly_detector_{self.version}.pkl'))
-            self.anomaly_scaler = joblib.load(
-                os.path.join(self.model_dir, f'scaler_{self.version}.pkl'))
-            print("   ✅ Anomaly Detector loaded")
-        except:
-            print("   ⚠️  Anomaly Detector not found")
-        
-        # 2. Attack Classifier
-        try:
-            self.attack_classifier = joblib.load(
-                os.path.join(self.model_dir, f'attack_classifier_{self.version}.pkl'))
-            self.attack_scaler = joblib.load(
-                os.path.join(self.model_dir, f'attack_scaler_{self.version}.pkl'))
-            self.attack_encoder = joblib.load(
-                os.path.join(self.model_dir, f'attack_encoder_{self.version}.pkl'))
-            print("   ✅ Attack Classifier loaded")
-        except:
-            print("   ⚠️  Attack Classifier not found")
-        
-        # 3. Severity Predictor
-        try:
-            self.severity_predictor = joblib.load(
-                os.path.join(self.model_dir, f'severity_predictor_{self.version}.pkl'))
-            self.severity_scaler = joblib.load(
-                os.path.join(self.model_dir, f'severity_scaler_{self.version}.pkl'))
-            self.severity_encoder = joblib.load(
-                os.path.join(self.model_dir, f'severity_encoder_{self.version}.pkl'))
-            print("   ✅ Severity Predictor loaded")
-        except:
-            print("   ⚠️  Severity Predictor not found")
-        
-        # 4. Traffic Forecaster
-        try:
-            self.traffic_forecaster = joblib.load(
-                os.path.join(self.model_dir, f'traffic_forecaster_{self.version}.pkl'))
-            self.traffic_scaler = joblib.load(
-                os.path.join(self.model_dir, f'traffic_scaler_{self.version}.pkl'))
-            print("   ✅ Traffic Forecaster loaded")
-        except:
-            print("   ⚠️  Traffic Forecaster not found")
+        With background=True this returns immediately and models become
+        available one by one; get_readiness() reports progress.
+        """
+        executor = ThreadPoolExecutor(
+            max_workers=max_workers or Config.MODEL_LOAD_WORKERS,
+            thread_name_prefix='model-warmup'
+        )
+        futures = [executor.submit(self.load_model, name, force) for name in self.MODELS]
+        executor.shutdown(wait=not background)
+        
+        self._warmup = futures
+        return futures
+    
+    def get_readiness(self):
+        """Report which models are loaded, with load time and memory"""
+        models = {name: dict(status) for name, status in self.readiness.items()}
+        warming = bool(self._warmup) and not all(future.done() for future in self._warmup)
+        
+        return {
+            'ready': all(status['loaded'] for status in models.values()),
+            'warmingUp': warming,
+            'version': self.version,
+            'models': models
+        }
+    
+    @staticmethod
+    def _scale(scaler, X):
+        """Apply a scaler unless it has been folded into the model"""
+        return X if scaler is None else scaler.transform(X)
     
     def detect_anomaly(self, traffic_data):
         """Detect if traffic is anomalous"""
+        self._ensure_loaded('anomaly_detector')
         if not self.anomaly_detector:
             return {'error': 'Anomaly detector not loaded'}
         
         try:
-            # Prepare features
-            features = [
-                traffic_data.get('source_port', 0),
-                traffic_data.get('dest_port', 0),
-                traffic_data.get('protocol', 1),
-                traffic_data.get('packet_size', 500),
-                traffic_data.get('packets', 50),
-                traffic_data.get('bytes', 25000),
-                traffic_data.get('duration', 1.0),
-                traffic_data.get('flag_count', 2),
-                traffic_data.get('syn_flag', 1),
-                traffic_data.get('ack_flag', 1),
-                traffic_data.get('rst_flag', 0),
-                traffic_data.get('connection_rate', 5.0),
-                datetime.now().hour,
-                datetime.now().weekday()
-            ]
-            
-            X = np.array(features).reshape(1, -1)
-            X_scaled = self.anomaly_scaler.transform(X)
-            
-            prediction = self.anomaly_detector.predict(X_scaled)[0]
-            score = self.anomaly_detector.score_samples(X_scaled)[0]
-            
-            is_anomaly = prediction == -1
-            confidence = min(100, max(0, abs(score) * 100))
-            
-            return {
-                'is_anomaly': bool(is_anomaly),
-                'confidence': float(confidence),
-                'anomaly_score': float(score)
-            }
+            context = FeatureContext([traffic_data])
+            if context.errors:
+                return {'error': context.errors[0]}
+            return self._detect_anomaly_batch(context.traffic_features)[0]
         except Exception as e:
             return {'error': str(e)}
     
     def classify_attack(self, traffic_data):
         """Classify attack type"""
+        self._ensure_loaded('attack_classifier')
         if not self.attack_classifier:
             return {'error': 'Attack classifier not loaded'}
         
         try:
-            features = [
-                traffic_data.get('source_port', 0),
-                traffic_data.get('dest_port', 0),
-                traffic_data.get('protocol', 1),
-                traffic_data.get('packet_size', 500),
-                traffic_data.get('packets', 50),
-                traffic_data.get('bytes', 25000),
-                traffic_data.get('duration', 1.0),
-                traffic_data.get('flag_count', 2),
-                traffic_data.get('syn_flag', 1),
-                traffic_data.get('ack_flag', 1),
-                traffic_data.get('rst_flag', 0),
-                traffic_data.get('connection_rate', 5.0),
-                datetime.now().hour,
-                datetime.now().weekday()
-            ]
-            
-            X = np.array(features).reshape(1, -1)
-            X_scaled = self.attack_scaler.transform(X)
-            
-            prediction = self.attack_classifier.predict(X_scaled)[0]
-            probabilities = self.attack_classifier.predict_proba(X_scaled)[0]
-            
-            attack_type = self.attack_encoder.inverse_transform([prediction])[0]
-            confidence = float(max(probabilities) * 100)
-            
-            # Get all probabilities
-            all_types = {}
-            for i, prob in enumerate(probabilities):
-                type_name = self.attack_encoder.inverse_transform([i])[0]
-                all_types[type_name] = float(prob * 100)
-            
-            return {
-                'attack_type': attack_type,
-                'confidence': confidence,
-                'probabilities': all_types
-            }
+            context = FeatureContext([traffic_data])
+            if context.errors:
+                return {'error': context.errors[0]}
+            return self._classify_attack_batch(context.traffic_features)[0]
         except Exception as e:
             return {'error': str(e)}
     
     def predict_severity(self, alert_data):
         """Predict alert severity level"""
+        self._ensure_loaded('severity_predictor')
         if not self.severity_predictor:
             return {'error': 'Severity predictor not loaded'}
         
         try:
-            features = [
-                alert_data.get('connection_rate', 10),
-                alert_data.get('failed_attempts', 5),
-                alert_data.get('data_volume_mb', 10),
-                alert_data.get('unique_sources', 5),
-                alert_data.get('unique_destinations', 5),
-                alert_data.get('unusual_ports', 2),
-                alert_data.get('time_window_minutes', 10),
-                alert_data.get('is_encrypted', 0),
-                alert_data.get('matches_known_signature', 0),
-                alert_data.get('geographic_anomaly', 0),
-                alert_data.get('affected_systems', 1),
-                alert_data.get('business_hours', 1)
-            ]
+            X = np.empty((1, len(SEVERITY_FEATURES)), dtype=np.float64)
+            for j, (name, default) in enumerate(SEVERITY_FEATURES):
+                X[0, j] = alert_data.get(name, default)
             
-            X = np.array(features).reshape(1, -1)
-            X_scaled = self.severity_scaler.transform(X)
-            
-            prediction = self.severity_predictor.predict(X_scaled)[0]
-            probabilities = self.severity_predictor.predict_proba(X_scaled)[0]
-            
-            severity = self.severity_encoder.inverse_transform([prediction])[0]
-            confidence = float(max(probabilities) * 100)
-            
-            return {
-                'severity': severity,
-                'confidence': confidence
-            }
+            return self._predict_severity_batch(X)[0]
         except Exception as e:
             return {'error': str(e)}
     
     def forecast_traffic(self, current_data):
         """Forecast next interval's traffic"""
+        self._ensure_loaded('traffic_forecaster')
         if not self.traffic_forecaster:
             return {'error': 'Traffic forecaster not loaded'}
         
         try:
             now = datetime.now()
-            features = [
-                now.hour,
-                now.weekday(),
-                now.day,
-                int(now.weekday() >= 5),
-                int(8 <= now.hour <= 18),
-                current_data.get('traffic_mbps', 100),
-                current_data.get('connections_count', 500),
-                current_data.get('packets_per_sec', 5000),
-                current_data.get('avg_packet_size', 600),
-                current_data.get('tcp_ratio', 0.7),
-                current_data.get('udp_ratio', 0.2),
-                current_data.get('http_ratio', 0.4),
-                current_data.get('traffic_lag_1', 100),
-                current_data.get('traffic_lag_2', 100),
-                current_data.get('traffic_lag_3', 100)
-            ]
+            X = np.empty((1, len(FORECAST_TIME_FEATURES) + len(FORECAST_TRAFFIC_FEATURES)), dtype=np.float64)
+            X[0, :len(FORECAST_TIME_FEATURES)] = FeatureContext.time_features(now)
+            for j, (name, default) in enumerate(FORECAST_TRAFFIC_FEATURES):
+                X[0, len(FORECAST_TIME_FEATURES) + j] = current_data.get(name, default)
             
-            X = np.array(features).reshape(1, -1)
-            X_scaled = self.traffic_scaler.transform(X)
-            
-            prediction = self.traffic_forecaster.predict(X_scaled)[0]
-            
-            return {
-                'predicted_traffic_mbps': float(prediction),
-                'current_traffic_mbps': current_data.get('traffic_mbps', 100),
-                'change_percent': float((prediction - current_data.get('traffic_mbps', 100)) / current_data.get('traffic_mbps', 100) * 100)
-            }
+            return self._forecast_traffic_batch(X)[0]
         except Exception as e:
             return {'error': str(e)}
     
+    def _detect_anomaly_batch(self, X):
+        """Score a traffic feature matrix with the anomaly detector"""
+        X_scaled = self._scale(self.anomaly_scaler, X)
+        
+        if self.anomaly_fast_scorer is not None:
+            scores = self.anomaly_fast_scorer.score_samples(X_scaled)
+        else:
+            scores = self.anomaly_detector.score_samples(X_scaled)
+        
+        # Same rule as IsolationForest.predict, without a second pass
+        is_anomaly = scores - self.anomaly_detector.offset_ < 0
+        confidence = np.clip(np.abs(scores) * 100, 0, 100)
+        
+        return [{
+            'is_anomaly': bool(is_anomaly[i]),
+            'confidence': float(confidence[i]),
+            'anomaly_score': float(scores[i])
+        } for i in range(len(scores))]
+    
+    def _classify_attack_batch(self, X):
+        """Classify attack types for a traffic feature matrix"""
+        X_scaled = self._scale(self.attack_scaler, X)
+        
+        # predict() is the argmax of predict_proba, so one call gives both
+        probabilities = self.attack_classifier.predict_proba(X_scaled)
+        type_names = self.attack_encoder.inverse_transform(self.attack_classifier.classes_)
+        best = probabilities.argmax(axis=1)
+        
+        return [{
+            'attack_type': type_names[best[i]],
+            'confidence': float(probabilities[i, best[i]] * 100),
+            'probabilities': {name: float(prob * 100) for name, prob in zip(type_names, probabilities[i])}
+        } for i in range(len(probabilities))]
+    
+    def _predict_severity_batch(self, X):
+        """Predict severity levels for a severity feature matrix"""
+        X_scaled = self._scale(self.severity_scaler, X)
+        
+        probabilities = self.severity_predictor.predict_proba(X_scaled)
+        severity_names = self.severity_encoder.inverse_transform(self.severity_predictor.classes_)
+        best = probabilities.argmax(axis=1)
+        
+        return [{
+            'severity': severity_names[best[i]],
+            'confidence': float(probabilities[i, best[i]] * 100)
+        } for i in range(len(probabilities))]
+    
+    def _forecast_traffic_batch(self, X):
+        """Forecast next interval's traffic for a forecast feature matrix"""
+        X_scaled = self._scale(self.traffic_scaler, X)
+        
+        predictions = self.traffic_forecaster.predict(X_scaled)
+        current = X[:, len(FORECAST_TIME_FEATURES)]
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = np.where(current != 0, (predictions - current) / current * 100, 0.0)
+        
+        return [{
+            'predicted_traffic_mbps': float(predictions[i]),
+            'current_traffic_mbps': float(current[i]),
+            'change_percent': float(change[i])
+        } for i in range(len(predictions))]
+    
     def analyze_complete(self, traffic_data):
         """Complete analysis using all models"""
-        results = {
-            'timestamp': datetime.now().isoformat(),
-            'analysis': {}
-        }
+        return self.analyze_many([traffic_data])[0]
+    
+    def analyze_many(self, records, timings=None):
+        """Complete analysis of many flows with one matrix per model
+        
+        If a dict is passed as `timings`, per-stage wall time in milliseconds
+        is recorded into it.
+        """
+        if timings is None:
+            timings = {}
+        
+        started = time.perf_counter()
+        context = FeatureContext(records)
+        timestamp = context.now.isoformat()
+        timings['features'] = _elapsed_ms(started)
+        analyses = self._analyze_context(context, timings)
+        
+        # Records that could not be read as features get an error entry in their place
+        analyses = context.in_input_order(analyses, lambda reason: {'error': reason})
+        return [{'timestamp': timestamp, 'analysis': analysis} for analysis in analyses]
+    
+    def _analyze_context(self, context, timings):
+        """Run the cascade over a context's valid rows, returning one analysis per row"""
+        n = len(context.records)
+        analyses = [{} for _ in range(n)]
+        
+        if not n:
+            timings.update(dict.fromkeys(('anomaly_detection', 'attack_classification', 'severity_prediction', 'traffic_forecast'), 0.0))
+            return analyses
         
         # 1. Detect anomaly
-        anomaly_result = self.detect_anomaly(traffic_data)
-        results['analysis']['anomaly_detection'] = anomaly_result
+        started = time.perf_counter()
+        self._ensure_loaded('anomaly_detector')
+        anomaly_results = self._run_stage(
+            self.anomaly_detector, 'Anomaly detector not loaded',
+            self._detect_anomaly_batch, context.traffic_features, n)
+        anomalous = [i for i, result in enumerate(anomaly_results) if result.get('is_anomaly')]
+        for i, result in enumerate(anomaly_results):
+            analyses[i]['anomaly_detection'] = result
+        timings['anomaly_detection'] = _elapsed_ms(started)
         
         # 2. If anomaly, classify attack type
-        if anomaly_result.get('is_anomaly'):
-            attack_result = self.classify_attack(traffic_data)
-            results['analysis']['attack_classification'] = attack_result
+        timings['attack_classification'] = 0.0
+        timings['severity_prediction'] = 0.0
+        if anomalous:
+            started = time.perf_counter()
+            self._ensure_loaded('attack_classifier')
+            attack_results = self._run_stage(
+                self.attack_classifier, 'Attack classifier not loaded',
+                self._classify_attack_batch, context.traffic_features[anomalous], len(anomalous))
+            for i, result in zip(anomalous, attack_results):
+                analyses[i]['attack_classification'] = result
+            timings['attack_classification'] = _elapsed_ms(started)
             
             # 3. Predict severity
-            severity_data = {
-                'connection_rate': traffic_data.get('connection_rate', 10),
-                'failed_attempts': traffic_data.get('failed_attempts', 5),
-                'data_volume_mb': traffic_data.get('bytes', 25000) / 1024 / 1024,
-                'unique_sources': traffic_data.get('unique_sources', 1),
-                'unique_destinations': traffic_data.get('unique_destinations', 1),
-                'unusual_ports': traffic_data.get('unusual_ports', 0),
-                'time_window_minutes': traffic_data.get('duration', 1.0) / 60,
-                'is_encrypted': traffic_data.get('is_encrypted', 0),
-                'matches_known_signature': 1 if attack_result.get('confidence', 0) > 80 else 0,
-                'geographic_anomaly': traffic_data.get('geographic_anomaly', 0),
-                'affected_systems': traffic_data.get('affected_systems', 1),
-                'business_hours': int(8 <= datetime.now().hour <= 18)
-            }
-            
-            severity_result = self.predict_severity(severity_data)
-            results['analysis']['severity_prediction'] = severity_result
+            started = time.perf_counter()
+            self._ensure_loaded('severity_predictor')
+            attack_confidence = np.array([result.get('confidence', 0) for result in attack_results])
+            severity_results = self._run_stage(
+                self.severity_predictor, 'Severity predictor not loaded',
+                self._predict_severity_batch,
+                context.severity_features(anomalous, attack_confidence), len(anomalous))
+            for i, result in zip(anomalous, severity_results):
+                analyses[i]['severity_prediction'] = result
+            timings['severity_prediction'] = _elapsed_ms(started)
         
         # 4. Forecast traffic
-        forecast_data = {
-            'traffic_mbps': traffic_data.get('bytes', 25000) / 1024 / 1024 / traffic_data.get('duration', 1.0) * 8,
-            'connections_count': 500,
-            'packets_per_sec': traffic_data.get('packets', 50) / traffic_data.get('duration', 1.0),
-            'avg_packet_size': traffic_data.get('packet_size', 500),
-            'tcp_ratio': 0.7,
-            'udp_ratio': 0.2,
-            'http_ratio': 0.4,
-            'traffic_lag_1': 100,
-            'traffic_lag_2': 100,
-            'traffic_lag_3': 100
-        }
-        
-        forecast_result = self.forecast_traffic(forecast_data)
-        results['analysis']['traffic_forecast'] = forecast_result
+        started = time.perf_counter()
+        self._ensure_loaded('traffic_forecaster')
+        forecast_results = self._run_stage(
+            self.traffic_forecaster, 'Traffic forecaster not loaded',
+            self._forecast_traffic_batch, context.forecast_features(), n)
+        for i, result in enumerate(forecast_results):
+            analyses[i]['traffic_forecast'] = result
+        timings['traffic_forecast'] = _elapsed_ms(started)
         
-        return results
+        return analyses
+    
+    @staticmethod
+    def _run_stage(model, missing_message, stage, X, n):
+        """Run one batched model stage, returning per-row results or errors"""
+        if not model:
+            return [{'error': missing_message} for _ in range(n)]
+        try:
+            return stage(X)
+        except Exception as e:
+            return [{'error': str(e)} for _ in range(n)]
     
     def get_models_status(self):
         """Get status of all models"""
@@ -319,7 +542,7 @@ def test_service():
     print("🧪 Testing Multi-Model ML Service")
     print("=" * 70)
     
-    service = MultiModelService()
+    service = MultiModelService(lazy=False)
     
     print("\n📊 Models Status:")
     status = service.get_models_status()
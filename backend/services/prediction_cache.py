@@ -0,0 +1,115 @@
+"""
+Bounded LRU/TTL cache of prediction results
+Keyed by a hash of the (optionally quantized) feature vector and the model version
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from config import Config
+
+class PredictionCache:
+    """LRU cache of per-row scores with a time-to-live"""
+
+    def __init__(self, max_size=None, ttl=None, quantize_bits=None):
+        self.max_size = max_size or Config.PREDICTION_CACHE_SIZE
+        self.ttl = ttl if ttl is not None else Config.PREDICTION_CACHE_TTL
+        self.quantize_bits = quantize_bits if quantize_bits is not None else Config.PREDICTION_CACHE_QUANTIZE_BITS
+
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Counters for observability
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def quantize(self, features):
+        """Row-wise bytes to hash; drops low float32 mantissa bits when quantizing"""
+        features = np.asarray(features)
+        if self.quantize_bits <= 0:
+            return np.ascontiguousarray(features, dtype=np.float64)
+
+        # Rows that differ only past the kept mantissa bits share a key
+        mask = np.uint32((0xFFFFFFFF << min(self.quantize_bits, 23)) & 0xFFFFFFFF)
+        return np.ascontiguousarray(features, dtype=np.float32).view(np.uint32) & mask
+
+    def keys(self, features, version):
+        """Cache key of every row of a feature matrix"""
+        prefix = f'{version}:'.encode()
+        return [
+            hashlib.blake2b(prefix + row.tobytes(), digest_size=16).digest()
+            for row in self.quantize(features)
+        ]
+
+    def _lookup(self, key, now):
+        """Look up one key (caller holds the lock)"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires = entry
+        if expires is not None and expires < now:
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def get(self, key):
+        """Cached value for a key, or None on a miss"""
+        with self.lock:
+            return self._lookup(key, time.monotonic())
+
+    def get_many(self, keys):
+        """Cached values for many keys (None for misses) under one lock"""
+        now = time.monotonic()
+        with self.lock:
+            return [self._lookup(key, now) for key in keys]
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries when full"""
+        self.put_many([(key, value)])
+
+    def put_many(self, items):
+        """Store many (key, value) pairs, evicting the least recently used entries when full"""
+        expires = time.monotonic() + self.ttl if self.ttl else None
+
+        with self.lock:
+            for key, value in items:
+                self.entries[key] = (value, expires)
+                self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (e.g. after the model was retrained or swapped)"""
+        with self.lock:
+            self.entries.clear()
+            self.invalidations += 1
+
+    def get_stats(self):
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': True,
+            'size': len(self.entries),
+            'maxSize': self.max_size,
+            'ttlSeconds': self.ttl,
+            'quantizeBits': self.quantize_bits,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': round(self.hits / lookups, 4) if lookups else 0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations
+        }
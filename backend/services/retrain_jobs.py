@@ -0,0 +1,437 @@
+"""
+Background retraining jobs
+Retraining runs outside the HTTP request: training data is built in a job
+thread, the model is fitted in a separate process and the new artifacts are
+swapped in atomically. One job runs at a time per node (file lock in MODEL_PATH)
+and job records are JSON files next to the lock, so any worker can report on
+or cancel a job started by another
+"""
+import os
+import re
+import json
+import signal
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+import joblib
+import numpy as np
+from sklearn.base import clone
+from config import Config
+from services import model_store
+from services.file_lock import FileLock
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Minimum anomalies needed to retrain (same as MLService.retrain)
+MIN_TRAINING_ROWS = 100
+
+# Job records live in this directory under MODEL_PATH
+JOBS_DIR = '.retrain-jobs'
+
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+# Progress reported at the start of each stage
+STAGES = OrderedDict([
+    ('queued', 0.0),
+    ('extracting', 0.05),
+    ('fitting', 0.3),
+    ('installing', 0.9),
+    ('recording', 0.95)
+])
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation was requested"""
+
+def _fit_entry(job_dir):
+    """Entry point of the fit process: fit the scaler and model saved in job_dir"""
+    X_train = np.load(os.path.join(job_dir, 'X.npy'))
+    scaler = joblib.load(os.path.join(job_dir, 'scaler.pkl'))
+    model = joblib.load(os.path.join(job_dir, 'model.pkl'))
+
+    model.fit(scaler.fit_transform(X_train))
+
+    joblib.dump(scaler, os.path.join(job_dir, 'scaler_fitted.pkl'))
+    joblib.dump(model, os.path.join(job_dir, 'model_fitted.pkl'))
+
+def _parse_time(value):
+    """Datetime from an isoformat string (None stays None)"""
+    return datetime.fromisoformat(value) if value else None
+
+def _pid_alive(pid):
+    """Whether a process with this pid exists on this node"""
+    if os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class RetrainJob:
+    """State of one retraining job"""
+
+    def __init__(self, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.progress = 0.0
+        self.message = None
+        self.error = None
+        self.result = None
+        self.dataset_size = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = threading.Event()
+        # Worker running the job and its fit process, for cancellation from other workers
+        self.pid = os.getpid()
+        self.fit_pid = None
+        self.process = None
+
+    @classmethod
+    def from_dict(cls, record):
+        """Rebuild a job from its persisted record"""
+        job = cls(record['jobId'])
+        job.status = record['status']
+        job.stage = record['stage']
+        job.progress = record['progress']
+        job.message = record['message']
+        job.error = record['error']
+        job.result = record['result']
+        job.dataset_size = record['datasetSize']
+        job.created_at = _parse_time(record['createdAt'])
+        job.started_at = _parse_time(record['startedAt'])
+        job.finished_at = _parse_time(record['finishedAt'])
+        job.pid = record['workerPid']
+        job.fit_pid = record['fitPid']
+        if record['cancelRequested']:
+            job.cancel_requested.set()
+        return job
+
+    @property
+    def finished(self):
+        """Whether the job has stopped (successfully or not)"""
+        return self.status in ('succeeded', 'failed', 'cancelled')
+
+    def set_stage(self, stage, message=None):
+        """Move to a stage, failing fast if the job was cancelled"""
+        if self.cancel_requested.is_set():
+            raise JobCancelled()
+        self.stage = stage
+        self.progress = STAGES[stage]
+        self.message = message
+
+    def extraction_progress(self, seen, total):
+        """Progress callback for the streaming extractor"""
+        if self.cancel_requested.is_set():
+            raise JobCancelled()
+
+        start, end = STAGES['extracting'], STAGES['fitting']
+        self.progress = start + (end - start) * (seen / total if total else 1.0)
+        self.message = f'Read {seen} of {total} anomalies'
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        duration = None
+        if self.started_at:
+            duration = round(((self.finished_at or datetime.utcnow()) - self.started_at).total_seconds(), 2)
+
+        return {
+            'jobId': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': round(self.progress, 2),
+            'message': self.message,
+            'error': self.error,
+            'result': self.result,
+            'datasetSize': self.dataset_size,
+            'cancelRequested': self.cancel_requested.is_set(),
+            'workerPid': self.pid,
+            'fitPid': self.fit_pid,
+            'createdAt': self.created_at.isoformat(),
+            'startedAt': self.started_at.isoformat() if self.started_at else None,
+            'finishedAt': self.finished_at.isoformat() if self.finished_at else None,
+            'durationSeconds': duration
+        }
+
+class JobStore:
+    """Job records as JSON files, shared by every worker on the node"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id, suffix='.json'):
+        """Path of a job's record (or its cancellation marker)"""
+        return os.path.join(self.directory, f'{job_id}{suffix}')
+
+    def save(self, job):
+        """Write a job's record atomically so readers never see a partial file"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(job.to_dict(), f)
+            os.replace(tmp_path, self._path(job.id))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def load(self, job_id):
+        """Job rebuilt from its record, or None if unknown"""
+        if not JOB_ID_PATTERN.fullmatch(job_id or ''):
+            return None
+
+        try:
+            with open(self._path(job_id), 'r') as f:
+                job = RetrainJob.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+        if self.cancel_requested(job_id):
+            job.cancel_requested.set()
+        return job
+
+    def list(self):
+        """Every recorded job, newest first"""
+        jobs = [self.load(name[:-len('.json')]) for name in os.listdir(self.directory) if name.endswith('.json')]
+        return sorted((job for job in jobs if job is not None), key=lambda job: job.created_at, reverse=True)
+
+    def request_cancel(self, job_id):
+        """Leave a cancellation marker for the worker running the job"""
+        # A separate file, so the running worker's own record writes cannot clear it
+        open(self._path(job_id, '.cancel'), 'a').close()
+
+    def cancel_requested(self, job_id):
+        """Whether cancellation of a job was requested by any worker"""
+        return os.path.exists(self._path(job_id, '.cancel'))
+
+    def prune(self, keep):
+        """Delete the records of finished jobs beyond the newest keep"""
+        for job in [job for job in self.list() if job.finished][keep:]:
+            for suffix in ('.json', '.cancel'):
+                try:
+                    os.remove(self._path(job.id, suffix))
+                except OSError:
+                    pass
+
+class JobManager:
+    """Runs retraining jobs one at a time per node and keeps a short history"""
+
+    # Finished jobs kept for status polling
+    HISTORY_SIZE = 20
+
+    # Seconds between cancellation checks while the fit process runs
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, model_dir=None):
+        self.model_dir = model_dir or Config.MODEL_PATH
+        # Jobs running in this worker; every worker reads the others' from the store
+        self.jobs = {}
+        self.store = JobStore(os.path.join(self.model_dir, JOBS_DIR))
+        self.lock = FileLock(os.path.join(self.model_dir, '.retrain.lock'))
+
+    def _reap(self, job):
+        """Mark a job whose worker exited before it finished as failed"""
+        if not job.finished and job.id not in self.jobs and not _pid_alive(job.pid):
+            job.status = 'failed'
+            job.error = 'Worker exited before the job finished'
+            job.finished_at = datetime.utcnow()
+            self.store.save(job)
+        return job
+
+    def get(self, job_id):
+        """Get a job by id, whichever worker on the node runs it (None if unknown)"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+
+        job = self.store.load(job_id)
+        return self._reap(job) if job is not None else None
+
+    def list(self):
+        """Recent jobs of every worker on the node, newest first"""
+        return [self.jobs.get(job.id) or self._reap(job) for job in self.store.list()]
+
+    def active_job(self):
+        """The unfinished job on this node, if any"""
+        for job in self.list():
+            if not job.finished:
+                return job
+        return None
+
+    def submit(self, app, registry):
+        """Start a retraining job of the registry's active version; returns None if one is already running on this node"""
+        if not self.lock.acquire():
+            return None
+
+        job = RetrainJob()
+        self.jobs[job.id] = job
+        try:
+            self.store.save(job)
+            self.store.prune(self.HISTORY_SIZE)
+        except Exception:
+            del self.jobs[job.id]
+            self.lock.release()
+            raise
+
+        threading.Thread(
+            target=self._run,
+            args=(job, app, registry),
+            name=f'retrain-{job.id[:8]}',
+            daemon=True
+        ).start()
+        return job
+
+    def cancel(self, job_id):
+        """Request cancellation from any worker; returns the job, or None if it is unknown"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+
+        if not job.finished:
+            self.store.request_cancel(job.id)
+            job.cancel_requested.set()
+
+            # Stop the fit right away, whichever worker started it
+            if job.process is not None:
+                if job.process.poll() is None:
+                    job.process.kill()
+            elif job.fit_pid:
+                try:
+                    os.kill(job.fit_pid, getattr(signal, 'SIGKILL', signal.SIGTERM))
+                except OSError:
+                    pass
+        return job
+
+    def _check_cancel(self, job):
+        """Pick up a cancellation requested by another worker"""
+        if self.store.cancel_requested(job.id):
+            job.cancel_requested.set()
+
+    def _set_stage(self, job, stage, message=None):
+        """Move a job to a stage and record it"""
+        self._check_cancel(job)
+        job.set_stage(stage, message)
+        self.store.save(job)
+
+    def _run(self, job, app, registry):
+        """Job thread: extract data, fit in a subprocess, install artifacts"""
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        ml_service = registry.ml_service
+        job_dir = None
+
+        def progress(seen, total):
+            self._check_cancel(job)
+            job.extraction_progress(seen, total)
+            self.store.save(job)
+
+        try:
+            with app.app_context():
+                self._set_stage(job, 'extracting', 'Building training data')
+                ml_service.ensure_loaded()
+                X_train, dataset_size = ml_service.load_training_data(progress=progress)
+                job.dataset_size = dataset_size
+
+                if dataset_size < MIN_TRAINING_ROWS:
+                    job.status = 'failed'
+                    job.result = {'status': 'insufficient_data', 'message': 'Not enough data for retraining'}
+                    job.error = job.result['message']
+                    return
+
+                self._set_stage(job, 'fitting', f'Fitting on {dataset_size} samples')
+                job_dir = tempfile.mkdtemp(dir=self.model_dir, prefix='.retrain-')
+                self._fit(job, job_dir, X_train, ml_service)
+
+                self._set_stage(job, 'installing', 'Installing new model')
+                self._install(job_dir, ml_service, registry)
+
+                self._set_stage(job, 'recording', 'Recording training metrics')
+                duration = (datetime.utcnow() - job.started_at).total_seconds()
+                ml_service.record_training(dataset_size, duration)
+
+            job.status = 'succeeded'
+            job.stage = 'completed'
+            job.progress = 1.0
+            job.message = 'Model retrained'
+            job.result = {'status': 'success', 'version': ml_service.model_version}
+            print(f"✅ Retrain job {job.id} completed ({dataset_size} samples)")
+        except JobCancelled:
+            job.status = 'cancelled'
+            job.message = 'Cancelled'
+            print(f"⚠️  Retrain job {job.id} cancelled")
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            print(f"❌ Retrain job {job.id} failed: {e}")
+        finally:
+            job.finished_at = datetime.utcnow()
+            job.process = None
+            job.fit_pid = None
+            if job_dir:
+                shutil.rmtree(job_dir, ignore_errors=True)
+            try:
+                self.store.save(job)
+            except Exception as e:
+                print(f"❌ Retrain job {job.id} record not saved: {e}")
+            self.jobs.pop(job.id, None)
+            self.lock.release()
+
+    def _fit(self, job, job_dir, X_train, ml_service):
+        """Fit fresh copies of the model and scaler in a separate process"""
+        np.save(os.path.join(job_dir, 'X.npy'), X_train)
+        joblib.dump(clone(ml_service.scaler), os.path.join(job_dir, 'scaler.pkl'))
+        joblib.dump(clone(ml_service.model), os.path.join(job_dir, 'model.pkl'))
+
+        job.process = subprocess.Popen(
+            [sys.executable, '-c', 'import sys; from services.retrain_jobs import _fit_entry; _fit_entry(sys.argv[1])', job_dir],
+            cwd=BACKEND_DIR
+        )
+        job.fit_pid = job.process.pid
+        self.store.save(job)
+
+        # Poll so cancellation (which kills the process) is noticed promptly
+        while True:
+            try:
+                returncode = job.process.wait(timeout=self.POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                self._check_cancel(job)
+                if job.cancel_requested.is_set():
+                    job.process.kill()
+                    job.process.wait()
+                    raise JobCancelled()
+
+        # Another worker may have killed the process
+        self._check_cancel(job)
+        if job.cancel_requested.is_set():
+            raise JobCancelled()
+        if returncode != 0:
+            raise RuntimeError(f'Fit process exited with code {returncode}')
+
+    def _install(self, job_dir, ml_service, registry):
+        """Move the fitted artifacts into place and reload this worker's models"""
+        version = ml_service.model_version
+        model_dir = ml_service.model_path
+
+        # Scaler first: model_store reloads both when the model file changes
+        os.replace(
+            os.path.join(job_dir, 'scaler_fitted.pkl'),
+            model_store.artifact_path(model_dir, 'scaler', version)
+        )
+        os.replace(
+            os.path.join(job_dir, 'model_fitted.pkl'),
+            model_store.artifact_path(model_dir, 'anomaly_detector', version)
+        )
+
+        # Rebuild the whole bundle (detector and cascade); other workers
+        # notice the new mtime through the model registry watcher
+        registry.check_retrained()
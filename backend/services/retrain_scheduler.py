@@ -0,0 +1,242 @@
+"""
+Scheduled retraining of all models
+Every RETRAIN_INTERVAL seconds (during off-peak hours) the full training
+pipeline runs on freshly generated data in a low-priority process, writing
+into a staging directory; the new version is promoted and rolled out only if
+no evaluation metric regresses
+"""
+import os
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from config import Config
+from services import model_store
+from services.file_lock import FileLock
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Metric compared per model (higher is better for all of them)
+PRIMARY_METRICS = {
+    'anomaly_detector': 'f1_score',
+    'attack_classifier': 'accuracy',
+    'severity_predictor': 'accuracy',
+    'traffic_forecaster': 'r2_score'
+}
+
+STATE_FILE = 'retrain_schedule.json'
+LOG_FILE = 'retrain_schedule.log'
+# Datasets of a run, inside its staging directory
+DATA_SUBDIR = 'data'
+
+def parse_hours(spec):
+    """Hours of the day from a spec like '1-5' or '22-2,13' (end exclusive, wraps midnight)"""
+    hours = set()
+    for part in filter(None, (part.strip() for part in spec.split(','))):
+        if '-' in part:
+            start, end = (int(value) % 24 for value in part.split('-', 1))
+            hour = start
+            while hour != end:
+                hours.add(hour)
+                hour = (hour + 1) % 24
+        else:
+            hours.add(int(part) % 24)
+    return hours or set(range(24))
+
+def compare_metrics(candidate, baseline, tolerance=None):
+    """List the metric regressions of a candidate manifest against the active one"""
+    tolerance = Config.RETRAIN_MAX_REGRESSION if tolerance is None else tolerance
+    regressions = []
+
+    for name, metric in PRIMARY_METRICS.items():
+        new = candidate['models'].get(name, {})
+        if new.get('status') != 'success':
+            regressions.append(f'{name} failed to train')
+            continue
+
+        old = (baseline or {}).get('models', {}).get(name, {})
+        if old.get('status') == 'success' and metric in old and new.get(metric, float('-inf')) < old[metric] - tolerance:
+            regressions.append(f'{name} {metric} {new.get(metric):.4f} < {old[metric]:.4f}')
+
+    return regressions
+
+class RetrainScheduler:
+    """Runs the training pipeline on RETRAIN_INTERVAL; one scheduler per node"""
+
+    # Seconds between checks whether a run is due
+    CHECK_INTERVAL = 60
+
+    def __init__(self, registry, model_dir=None):
+        self.registry = registry
+        self.model_dir = model_dir or Config.MODEL_PATH
+        self.interval = Config.RETRAIN_INTERVAL
+        self.off_peak_hours = parse_hours(Config.RETRAIN_OFF_PEAK_HOURS)
+
+        # Only the worker holding this lock schedules runs
+        self.scheduler_lock = FileLock(os.path.join(self.model_dir, '.scheduler.lock'))
+        # Shared with retrain jobs so two trainings never overlap
+        self.training_lock = FileLock(os.path.join(self.model_dir, '.retrain.lock'))
+
+        self.thread = None
+        self.process = None
+
+    @property
+    def state_path(self):
+        """File holding the schedule state, shared by all workers"""
+        return os.path.join(self.model_dir, STATE_FILE)
+
+    def read_state(self):
+        """Persisted schedule state (last run and its outcome)"""
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_state(self, state):
+        """Persist the schedule state (atomically, so readers never see a truncated file)"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.model_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, self.state_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def is_due(self, now=None):
+        """Whether a run should start now"""
+        now = now or datetime.utcnow()
+        if now.hour not in self.off_peak_hours:
+            return False
+
+        last_run = self.read_state().get('lastRunAt')
+        if not last_run:
+            return True
+        return (now - datetime.fromisoformat(last_run)).total_seconds() >= self.interval
+
+    def run_once(self):
+        """Train a candidate version, evaluate it and promote it if nothing regressed"""
+        if not self.training_lock.acquire():
+            print("ℹ️  Scheduled retrain skipped: training already in progress")
+            return None
+
+        started_at = datetime.utcnow()
+        version = started_at.strftime('%Y.%m.%d.%H%M')
+        staging_dir = os.path.join(self.model_dir, f'.staging-{version}')
+        started = time.time()
+
+        # lastRunAt moves only once the run finishes, so a crashed run is retried on the next check
+        state = {
+            'lastRunAt': self.read_state().get('lastRunAt'),
+            'startedAt': started_at.isoformat(),
+            'candidateVersion': version,
+            'seed': int(started),
+            'result': 'running'
+        }
+
+        try:
+            self.write_state(state)
+            os.makedirs(staging_dir, exist_ok=True)
+            print(f"🔄 Scheduled retrain of all models (candidate {version})...")
+
+            self._train(version, staging_dir, state['seed'])
+
+            candidate = model_store.read_training_manifest(staging_dir, version)
+            if candidate is None:
+                raise RuntimeError('Training finished without a manifest')
+
+            baseline = model_store.read_training_manifest(self.model_dir, self.registry.version)
+            regressions = compare_metrics(candidate, baseline)
+
+            if regressions:
+                state.update(result='rejected', reasons=regressions)
+                print(f"⚠️  Candidate {version} not promoted: {'; '.join(regressions)}")
+            else:
+                self._promote(staging_dir)
+                state['rollout'] = self.registry.rollout(version)
+                state['result'] = 'promoted'
+                print(f"✅ Candidate {version} promoted")
+        except Exception as e:
+            state.update(result='failed', error=str(e))
+            print(f"❌ Scheduled retrain failed: {e}")
+        finally:
+            state['durationSeconds'] = round(time.time() - started, 2)
+            state['lastRunAt'] = state['startedAt']
+            self.write_state(state)
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            self.process = None
+            self.training_lock.release()
+
+        return state
+
+    def _train(self, version, staging_dir, seed):
+        """Run train_all_models.py at low CPU priority on regenerated datasets"""
+        niceness = Config.RETRAIN_NICE
+
+        def lower_priority():
+            os.nice(niceness)
+
+        # Fresh datasets in a directory of this run's own, so the shared ./data/datasets
+        # (and whatever reads it meanwhile) is left alone; removed with the staging area
+        data_dir = os.path.join(staging_dir, DATA_SUBDIR)
+        
+        with open(os.path.join(self.model_dir, LOG_FILE), 'w') as log:
+            # staging_dir is the only staging area
+            self.process = subprocess.Popen(
+                [sys.executable, 'train_all_models.py', '--version', version, '--model-dir', os.path.abspath(staging_dir),
+                 '--regenerate-data', '--seed', str(seed), '--data-dir', os.path.abspath(data_dir), '--no-staging'],
+                cwd=BACKEND_DIR,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                preexec_fn=lower_priority if niceness and hasattr(os, 'nice') else None
+            )
+            returncode = self.process.wait()
+
+        # The pipeline exits non-zero when any model failed; the manifest says which
+        if returncode not in (0, 1):
+            raise RuntimeError(f'Training process exited with code {returncode}')
+
+    def _promote(self, staging_dir):
+        """Move the staged artifacts into MODEL_PATH (each file replaced atomically)"""
+        for filename in os.listdir(staging_dir):
+            path = os.path.join(staging_dir, filename)
+            # The run's datasets stay behind and are removed with the staging area
+            if os.path.isfile(path):
+                os.replace(path, os.path.join(self.model_dir, filename))
+
+    def _run(self):
+        """Scheduler loop: take over scheduling if no other worker holds it, run when due"""
+        while True:
+            try:
+                if self.scheduler_lock.locked() or self.scheduler_lock.acquire():
+                    if self.is_due():
+                        self.run_once()
+            except Exception as e:
+                print(f"❌ Retrain scheduler error: {e}")
+            time.sleep(self.CHECK_INTERVAL)
+
+    def start(self):
+        """Start the scheduler thread (no-op when disabled); called at server startup, not on import"""
+        if not Config.RETRAIN_SCHEDULE_ENABLED or self.interval <= 0:
+            return
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name='retrain-scheduler', daemon=True)
+            self.thread.start()
+
+    def get_status(self):
+        """Describe the schedule and the last run"""
+        state = self.read_state()
+        return {
+            'enabled': Config.RETRAIN_SCHEDULE_ENABLED and self.interval > 0,
+            'intervalSeconds': self.interval,
+            'offPeakHours': sorted(self.off_peak_hours),
+            'scheduler': self.scheduler_lock.locked(),
+            'running': self.process is not None,
+            'lastRun': state or None
+        }
@@ -0,0 +1,128 @@
+"""
+Fold a fitted StandardScaler into the split thresholds of tree ensembles
+(sklearn tree ensembles and histogram gradient boosting). After folding, the
+model scores raw feature vectors directly
+"""
+import copy
+import numpy as np
+
+# Set on models whose thresholds have already been rewritten (holds the residual scaler)
+FOLDED_MARKER = '_scaler_folded_'
+
+# Largest magnitude up to which float32 represents every whole number
+FLOAT32_EXACT_LIMIT = 2 ** 24
+
+def _iter_trees(model):
+    """Yield (tree_, input column per tree feature) for supported ensembles"""
+    n_features = model.n_features_in_
+    estimators = np.ravel(model.estimators_)
+
+    # Bagged ensembles (IsolationForest) train each tree on a feature subset
+    estimators_features = getattr(model, 'estimators_features_', None)
+    if estimators_features is None:
+        estimators_features = [np.arange(n_features)] * len(estimators)
+
+    for estimator, features in zip(estimators, estimators_features):
+        yield estimator.tree_, np.asarray(features)
+
+def _iter_predictors(model):
+    """Yield the TreePredictors of a fitted HistGradientBoosting model"""
+    for iteration in model._predictors:
+        for predictor in iteration:
+            yield predictor
+
+def _is_hist_gradient_boosting(model):
+    """Check whether the model is a fitted HistGradientBoosting model without categorical splits"""
+    if not hasattr(model, '_predictors') or not hasattr(model, 'n_features_in_'):
+        return False
+    # Categorical splits test bitsets, not thresholds
+    return getattr(model, 'is_categorical_', None) is None or not np.any(model.is_categorical_)
+
+def is_foldable(model):
+    """Check whether the model is a fitted ensemble of sklearn trees"""
+    if _is_hist_gradient_boosting(model):
+        return True
+    estimators = getattr(model, 'estimators_', None)
+    if estimators is None or not hasattr(model, 'n_features_in_'):
+        return False
+    return all(hasattr(estimator, 'tree_') for estimator in np.ravel(estimators))
+
+def _residual_scaler(scaler, folded_columns):
+    """Copy of the scaler that leaves the folded columns unchanged"""
+    residual = copy.copy(scaler)
+    if scaler.with_mean:
+        residual.mean_ = np.where(folded_columns, 0.0, scaler.mean_)
+    if scaler.with_std:
+        residual.scale_ = np.where(folded_columns, 1.0, scaler.scale_)
+    return residual
+
+def fold_scaler(model, scaler):
+    """
+    Rewrite the model's split thresholds in place so it accepts unscaled input.
+
+    A split `(x - mean) / scale <= t` is equivalent to `x <= t * scale + mean`
+    because StandardScaler scales are always positive. Returns the scaler
+    still to apply before scoring: None when every column was folded, a
+    residual scaler covering the columns left unfolded, or the original
+    scaler when the model cannot be folded.
+
+    sklearn trees compare float32 inputs, so a folded tree sees float32(x)
+    where the unfolded one saw float32((x - mean) / scale). The two agree
+    except for inputs within one float32 rounding step of a split threshold
+    (relative 2**-24). Above FLOAT32_EXACT_LIMIT float32 no longer holds
+    whole numbers exactly and that step grows to whole units, so columns
+    with folded thresholds that large (e.g. byte counts) stay scaled.
+    """
+    if hasattr(model, FOLDED_MARKER):
+        return getattr(model, FOLDED_MARKER)
+    if scaler is None or not is_foldable(model):
+        return scaler
+    # Only StandardScaler-style affine transforms can be folded
+    if not hasattr(scaler, 'with_mean') or not hasattr(scaler, 'with_std'):
+        return scaler
+
+    n_features = model.n_features_in_
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+
+    if len(mean) != n_features or len(scale) != n_features:
+        return scaler
+
+    if _is_hist_gradient_boosting(model):
+        # Histogram boosting predicts on float64 input, so every column folds
+        for predictor in _iter_predictors(model):
+            nodes = predictor.nodes
+            if not nodes.flags.writeable:
+                # Memory-mapped artifact: fold into a private copy
+                nodes = predictor.nodes = np.array(nodes)
+            split_nodes = ~nodes['is_leaf'].astype(bool)
+            columns = nodes['feature_idx'][split_nodes]
+            nodes['num_threshold'][split_nodes] = nodes['num_threshold'][split_nodes] * scale[columns] + mean[columns]
+
+        setattr(model, FOLDED_MARKER, None)
+        return None
+
+    # Largest folded threshold per input column decides which columns fold
+    largest = np.zeros(n_features)
+    for tree, features in _iter_trees(model):
+        split_nodes = tree.children_left != -1
+        columns = features[tree.feature[split_nodes]]
+        folded = np.abs(tree.threshold[split_nodes] * scale[columns] + mean[columns])
+        np.maximum.at(largest, columns, folded)
+    foldable = largest < FLOAT32_EXACT_LIMIT
+
+    if not foldable.any():
+        return scaler
+
+    for tree, features in _iter_trees(model):
+        split_nodes = np.nonzero(tree.children_left != -1)[0]
+        columns = features[tree.feature[split_nodes]]
+        split_nodes, columns = split_nodes[foldable[columns]], columns[foldable[columns]]
+
+        # tree_.threshold is a writable view over the node array
+        thresholds = tree.threshold
+        thresholds[split_nodes] = thresholds[split_nodes] * scale[columns] + mean[columns]
+
+    residual = None if foldable.all() else _residual_scaler(scaler, foldable)
+    setattr(model, FOLDED_MARKER, residual)
+    return residual
@@ -0,0 +1,244 @@
+"""
+Time-bucketed network traffic
+Rows of a time range are grouped into fixed buckets in SQL (avg, max and sum
+of every metric per bucket), so a response carries at most TRAFFIC_MAX_POINTS
+points whatever the range. Buckets that line up with a rollup tier are read
+from services.traffic_rollups instead of raw rows
+"""
+import math
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import select, func, cast, literal_column, union_all, Integer
+from config import Config
+
+BUCKETS = {'1m': 60, '5m': 300, '1h': 3600}
+
+TIME_RANGES = {
+    '1h': timedelta(hours=1),
+    '24h': timedelta(days=1),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30)
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+def metric_columns():
+    """(point key, column) of every aggregated NetworkTraffic metric"""
+    from models.network_traffic import NetworkTraffic
+
+    return [
+        ('incoming', NetworkTraffic.incoming_mbps),
+        ('outgoing', NetworkTraffic.outgoing_mbps),
+        ('total', NetworkTraffic.total_mbps),
+        ('tcp', NetworkTraffic.tcp_traffic),
+        ('udp', NetworkTraffic.udp_traffic),
+        ('http', NetworkTraffic.http_traffic),
+        ('https', NetworkTraffic.https_traffic),
+        ('ssh', NetworkTraffic.ssh_traffic),
+        ('ftp', NetworkTraffic.ftp_traffic),
+        ('other', NetworkTraffic.other_traffic),
+        ('activeConnections', NetworkTraffic.active_connections),
+        ('anomalyCount', NetworkTraffic.anomaly_count),
+        ('blockedThreats', NetworkTraffic.blocked_threats),
+        ('avgResponseTime', NetworkTraffic.avg_response_time)
+    ]
+
+def parse_range(time_range=None, start=None, end=None, now=None):
+    """(start, end) from ISO from/to strings, or a timeRange like '24h' ending now"""
+    now = now or datetime.utcnow()
+    end = datetime.fromisoformat(end) if end else now
+    if start:
+        start = datetime.fromisoformat(start)
+    else:
+        start = end - TIME_RANGES.get(time_range, TIME_RANGES['1h'])
+
+    # Aware timestamps are compared with the naive UTC ones stored
+    if start.tzinfo:
+        start = (start - start.utcoffset()).replace(tzinfo=None)
+    if end.tzinfo:
+        end = (end - end.utcoffset()).replace(tzinfo=None)
+    if start >= end:
+        raise ValueError('from must be earlier than to')
+    return start, end
+
+def bucket_seconds(bucket, start, end, max_points=None):
+    """
+    Bucket width for a range: the requested one ('auto' = the finest that
+    fits), coarsened when it would give more than max_points points.
+    """
+    max_points = max_points or Config.TRAFFIC_MAX_POINTS
+    span = (end - start).total_seconds()
+
+    if bucket != 'auto' and bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}' (expected one of: {', '.join(list(BUCKETS) + ['auto'])})")
+
+    widths = sorted(BUCKETS.values())
+    if bucket != 'auto':
+        widths = [width for width in widths if width >= BUCKETS[bucket]]
+
+    # Buckets are aligned to the epoch, so a range can touch one more than span / width
+    for width in widths:
+        if math.floor(span / width) + 1 <= max_points:
+            return width
+    # Longer than max_points hours: whole hours per point
+    return math.ceil(span / max(max_points - 1, 1) / 3600) * 3600
+
+def floor_time(timestamp, seconds):
+    """Start of the bucket of the given width a timestamp falls in"""
+    elapsed = int((timestamp - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=elapsed - elapsed % seconds)
+
+def bucket_label(seconds):
+    """Label of a bucket width ('5m', '1h', '6h')"""
+    for label, width in BUCKETS.items():
+        if width == seconds:
+            return label
+    return f'{seconds // 3600}h' if seconds % 3600 == 0 else f'{seconds}s'
+
+def bucket_key(timestamp_column, seconds, dialect):
+    """SQL expression numbering the bucket (since the epoch) a row's timestamp falls in"""
+    if dialect == 'sqlite':
+        epoch = cast(func.strftime('%s', timestamp_column), Integer)
+    else:
+        epoch = func.extract('epoch', timestamp_column)
+    # Inlined so the GROUP BY expression is identical to the selected one
+    return func.floor(epoch / literal_column(str(int(seconds))))
+
+def _number(value):
+    """JSON-friendly aggregate (PostgreSQL returns numeric averages as Decimal)"""
+    return float(value) if isinstance(value, Decimal) else value
+
+def aggregate_points(rows, metric_keys, seconds):
+    """Chart points (NetworkTraffic.to_dict shape plus per-metric avg/max/sum) from aggregate rows"""
+    points = []
+    for row in rows:
+        values = iter(_number(value) for value in row[2:])
+        aggregates = {key: {'avg': next(values), 'max': next(values), 'sum': next(values)} for key in metric_keys}
+        average = {key: aggregates[key]['avg'] for key in metric_keys}
+
+        points.append({
+            'timestamp': (EPOCH + timedelta(seconds=int(row[0]) * seconds)).isoformat(),
+            'incoming': average['incoming'],
+            'outgoing': average['outgoing'],
+            'total': average['total'],
+            'protocols': {key: average[key] for key in ('tcp', 'udp', 'http', 'https', 'ssh', 'ftp', 'other')},
+            'activeConnections': average['activeConnections'],
+            # Event counters add up over a bucket
+            'anomalyCount': aggregates['anomalyCount']['sum'],
+            'blockedThreats': aggregates['blockedThreats']['sum'],
+            'avgResponseTime': average['avgResponseTime'],
+            'samples': row[1],
+            'aggregates': aggregates
+        })
+    return points
+
+def bucketed_traffic(session, start, end, seconds):
+    """Traffic points of [start, end) aggregated into buckets of the given width, oldest first"""
+    from models.network_traffic import NetworkTraffic
+    from services import traffic_rollups
+
+    # The first point covers its whole bucket, not just the part after start
+    start = floor_time(start, seconds)
+
+    # Whole rollup buckets are read instead of raw rows when a tier lines up
+    tier = traffic_rollups.select_tier(session, start, end, seconds)
+    if tier is not None:
+        return traffic_rollups.bucketed_rollups(session, tier, start, end, seconds)
+
+    metrics = metric_columns()
+    key = bucket_key(NetworkTraffic.timestamp, seconds, session.get_bind().dialect.name).label('bucket')
+
+    columns = [key, func.count()]
+    for _, column in metrics:
+        columns += [func.avg(column), func.max(column), func.sum(column)]
+
+    rows = session.execute(
+        select(*columns)
+        .where(NetworkTraffic.timestamp >= start, NetworkTraffic.timestamp < end)
+        .group_by(key)
+        .order_by(key)
+    ).all()
+
+    return aggregate_points(rows, [name for name, _ in metrics], seconds)
+
+# Default /api/traffic/stats window (the endpoint has always summarized the last hour)
+STATS_WINDOW = '1h'
+
+def window_seconds(window=None):
+    """Stats window in seconds from a count of seconds or a timeRange label ('1h'), default one hour"""
+    if window is None or window == '':
+        window = STATS_WINDOW
+    if window in TIME_RANGES:
+        return int(TIME_RANGES[window].total_seconds())
+    try:
+        seconds = int(window)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid window '{window}' (expected seconds or one of: {', '.join(TIME_RANGES)})")
+    if seconds <= 0:
+        raise ValueError('window must be positive')
+    return seconds
+
+def summary_select(start, end):
+    """Window totals of the raw rows in [start, end) (sums and non-null counts, averaged by the caller)"""
+    from models.network_traffic import NetworkTraffic
+
+    return select(
+        func.count().label('samples'),
+        func.sum(NetworkTraffic.total_mbps).label('traffic_sum'),
+        func.count(NetworkTraffic.total_mbps).label('traffic_count'),
+        func.sum(NetworkTraffic.anomaly_count).label('anomalies'),
+        func.sum(NetworkTraffic.blocked_threats).label('blocked'),
+        func.sum(NetworkTraffic.avg_response_time).label('response_sum'),
+        func.count(NetworkTraffic.avg_response_time).label('response_count')
+    ).where(NetworkTraffic.timestamp >= start, NetworkTraffic.timestamp < end)
+
+def traffic_summary(session, start, end):
+    """
+    Traffic totals of [start, end) and the latest active connection count,
+    in one query.
+
+    Whole rollup buckets inside the window are read from the coarsest tier
+    with at least SUMMARY_MIN_BUCKETS of them, and only the ragged edges
+    from raw rows, so the cost follows the bucket count, not the row count.
+    """
+    from models.network_traffic import NetworkTraffic
+    from services import traffic_rollups
+
+    parts = [summary_select(start, end)]
+    tier = traffic_rollups.summary_tier(session, start, end)
+    if tier is not None:
+        first = floor_time(start - timedelta(microseconds=1), tier.bucket_seconds) + timedelta(seconds=tier.bucket_seconds)
+        last = floor_time(end, tier.bucket_seconds)
+        parts = [
+            summary_select(start, first),
+            traffic_rollups.summary_select(tier, first, last),
+            summary_select(last, end)
+        ]
+
+    totals = union_all(*parts).subquery() if len(parts) > 1 else parts[0].subquery()
+    latest = (
+        select(NetworkTraffic.active_connections)
+        .order_by(NetworkTraffic.timestamp.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+    row = session.execute(select(
+        func.sum(totals.c.samples),
+        func.sum(totals.c.traffic_sum) / func.nullif(func.sum(totals.c.traffic_count), 0),
+        func.sum(totals.c.anomalies),
+        func.sum(totals.c.blocked),
+        func.sum(totals.c.response_sum) / func.nullif(func.sum(totals.c.response_count), 0),
+        latest
+    )).one()
+
+    samples, avg_traffic, anomalies, blocked, avg_response, active = (_number(value) for value in row)
+    return {
+        'samples': int(samples or 0),
+        'avgTraffic': avg_traffic or 0,
+        'anomalyCount': int(anomalies or 0),
+        'blockedThreats': int(blocked or 0),
+        'avgResponseTime': avg_response or 0,
+        'activeConnections': active or 0,
+        'tier': tier.__tablename__ if tier is not None else 'raw'
+    }
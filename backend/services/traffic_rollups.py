@@ -0,0 +1,336 @@
+"""
+Continuous rollups of network traffic
+Every ingested NetworkTraffic row is upserted into 1-minute, 1-hour and
+1-day aggregate tables (sum, max and count per metric), and history can be
+backfilled from the raw table. Reads use the coarsest tier that still
+resolves the requested buckets, falling back to raw rows when any day of the
+range is not fully rolled up (e.g. ingested while rollups were disabled).
+Whether a day that has ended is fully rolled up is stored once in
+traffic_rollup_coverage; only the current day is compared with raw rows
+"""
+import time
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, func, insert, text
+from sqlalchemy.dialects import postgresql, sqlite
+from config import Config
+from models.traffic_rollup import ROLLUP_METRICS, TrafficRollup1m, TrafficRollup1h, TrafficRollup1d, TrafficRollupCoverage
+from services.traffic_aggregation import EPOCH, floor_time, bucket_key, aggregate_points, metric_columns
+
+# Coarsest first
+TIERS = [TrafficRollup1d, TrafficRollup1h, TrafficRollup1m]
+
+# A summary reads a tier only if the window spans at least this many of its buckets
+SUMMARY_MIN_BUCKETS = 60
+
+# Seconds per-day coverage lookups are reused for (the current day is recounted after that)
+COVERAGE_TTL = 60
+
+DAY = timedelta(days=1)
+
+# Day -> whether the rollups hold every raw row of it
+_coverage = {'checked': 0, 'days': {}}
+_coverage_lock = threading.Lock()
+
+def _rollup_values(tier, traffic):
+    """Rollup row for a single NetworkTraffic row"""
+    values = {'bucket': floor_time(traffic.timestamp, tier.bucket_seconds), 'samples': 1}
+    for metric in ROLLUP_METRICS:
+        value = getattr(traffic, metric)
+        values[f'{metric}_sum'] = value or 0
+        values[f'{metric}_max'] = value
+        values[f'{metric}_count'] = int(value is not None)
+    return values
+
+def _merge_statement(tier, dialect):
+    """Upsert statement adding rollup rows into their existing buckets"""
+    table = tier.__table__
+    statement = (postgresql.insert if dialect == 'postgresql' else sqlite.insert)(table)
+    excluded = statement.excluded
+    # Two-argument max() is scalar on SQLite; NULL (no value yet) must not win
+    greatest = func.greatest if dialect == 'postgresql' else func.max
+
+    updates = {'samples': table.c.samples + excluded.samples}
+    for metric in ROLLUP_METRICS:
+        column_max, new_max = table.c[f'{metric}_max'], excluded[f'{metric}_max']
+        updates[f'{metric}_sum'] = table.c[f'{metric}_sum'] + excluded[f'{metric}_sum']
+        updates[f'{metric}_count'] = table.c[f'{metric}_count'] + excluded[f'{metric}_count']
+        updates[f'{metric}_max'] = greatest(func.coalesce(column_max, new_max), func.coalesce(new_max, column_max))
+
+    return statement.on_conflict_do_update(index_elements=['bucket'], set_=updates)
+
+def _coverage_statement(dialect, overwrite):
+    """Upsert of coverage rows; without overwrite, days already recorded are left as they are"""
+    table = TrafficRollupCoverage.__table__
+    statement = (postgresql.insert if dialect == 'postgresql' else sqlite.insert)(table)
+    if overwrite:
+        return statement.on_conflict_do_update(index_elements=['day'], set_={'complete': statement.excluded.complete})
+    return statement.on_conflict_do_nothing(index_elements=['day'])
+
+def _store_coverage(session, days, overwrite=True):
+    """Record whether each of the given days is fully rolled up (in the caller's transaction)"""
+    dialect = session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        session.execute(_coverage_statement(dialect, overwrite), [{'day': day, 'complete': complete} for day, complete in days.items()])
+        return
+
+    for day, complete in days.items():
+        row = session.get(TrafficRollupCoverage, day)
+        if row is None:
+            session.add(TrafficRollupCoverage(day=day, complete=complete))
+        elif overwrite:
+            row.complete = complete
+
+def _today():
+    """Start of the current (still open) day"""
+    return floor_time(datetime.utcnow(), 86400)
+
+def record(session, traffic):
+    """Add an ingested NetworkTraffic row to every tier (in the caller's transaction)"""
+    if not Config.TRAFFIC_ROLLUPS_ENABLED:
+        # A late row for a day that has ended leaves that day short of rows until it is backfilled
+        day = floor_time(traffic.timestamp, 86400)
+        if day < _today():
+            _store_coverage(session, {day: False})
+        return
+
+    # Column defaults (e.g. other_traffic=0) are only filled in when the row is flushed
+    session.flush()
+
+    dialect = session.get_bind().dialect.name
+    for tier in TIERS:
+        values = _rollup_values(tier, traffic)
+
+        if dialect in ('postgresql', 'sqlite'):
+            session.execute(_merge_statement(tier, dialect), values)
+            continue
+
+        # Other databases: read-modify-write
+        row = session.get(tier, values['bucket'])
+        if row is None:
+            session.add(tier(**values))
+            continue
+        row.samples += 1
+        for metric in ROLLUP_METRICS:
+            setattr(row, f'{metric}_sum', getattr(row, f'{metric}_sum') + values[f'{metric}_sum'])
+            setattr(row, f'{metric}_count', getattr(row, f'{metric}_count') + values[f'{metric}_count'])
+            current, new = getattr(row, f'{metric}_max'), values[f'{metric}_max']
+            if new is not None and (current is None or new > current):
+                setattr(row, f'{metric}_max', new)
+
+def backfill(session, start=None, end=None, progress=None):
+    """
+    Rebuild the rollups of [start, end) from raw rows (default: all history).
+
+    Works a day at a time, replacing each day's buckets in every tier in one
+    transaction, and records each day that has ended as fully rolled up.
+    Ingest into the rollups waits while a day is rebuilt (PostgreSQL: the
+    tiers are locked against writes; SQLite: the DELETE takes the database
+    write lock before the raw rows are read), so rows committed meanwhile
+    are counted exactly once and reruns are safe.
+    Returns the number of days processed.
+    """
+    from models.network_traffic import NetworkTraffic
+
+    first, last = session.execute(select(func.min(NetworkTraffic.timestamp), func.max(NetworkTraffic.timestamp))).one()
+    if first is None:
+        return 0
+
+    day = floor_time(max(start, first) if start else first, 86400)
+    end = min(end, last + timedelta(seconds=1)) if end else last + timedelta(seconds=1)
+    dialect = session.get_bind().dialect.name
+    metrics = [column for _, column in metric_columns()]
+    today = _today()
+    days = 0
+
+    while day < end:
+        next_day = day + DAY
+
+        if dialect == 'postgresql':
+            # Conflicts with the ROW EXCLUSIVE lock of ingest upserts (and with other backfills) until commit
+            tables = ', '.join(table.__tablename__ for table in TIERS + [TrafficRollupCoverage])
+            session.execute(text(f'LOCK TABLE {tables} IN SHARE ROW EXCLUSIVE MODE'))
+
+        for tier in TIERS:
+            session.execute(delete(tier).where(tier.bucket >= day, tier.bucket < next_day))
+
+        for tier in TIERS:
+            key = bucket_key(NetworkTraffic.timestamp, tier.bucket_seconds, dialect).label('bucket')
+            columns = [key, func.count()]
+            for column in metrics:
+                columns += [func.coalesce(func.sum(column), 0), func.max(column), func.count(column)]
+
+            rows = session.execute(
+                select(*columns)
+                .where(NetworkTraffic.timestamp >= day, NetworkTraffic.timestamp < next_day)
+                .group_by(key)
+            ).all()
+
+            if rows:
+                # Upserted like ingest, so a bucket that exists anyway is merged instead of failing
+                statement = _merge_statement(tier, dialect) if dialect in ('postgresql', 'sqlite') else insert(tier)
+                session.execute(statement, [_backfill_values(tier, row) for row in rows])
+
+        if day < today:
+            _store_coverage(session, {day: True})
+        session.commit()
+        days += 1
+        if progress:
+            progress(day, end)
+        day = next_day
+
+    invalidate_coverage()
+    return days
+
+def _backfill_values(tier, row):
+    """Rollup row from one (bucket key, count, sum/max/count per metric) aggregate row"""
+    values = {'bucket': EPOCH + timedelta(seconds=int(row[0]) * tier.bucket_seconds), 'samples': row[1]}
+    aggregates = iter(row[2:])
+    for metric in ROLLUP_METRICS:
+        values[f'{metric}_sum'] = float(next(aggregates))
+        values[f'{metric}_max'] = next(aggregates)
+        values[f'{metric}_count'] = next(aggregates)
+    return values
+
+def invalidate_coverage():
+    """Forget the coverage cached in this process (after a backfill)"""
+    with _coverage_lock:
+        _coverage.update(checked=0, days={})
+
+def _day_coverage(session, first, end):
+    """Whether the rollups hold every raw row of each day from first up to end, counted from the raw table"""
+    from models.network_traffic import NetworkTraffic
+
+    dialect = session.get_bind().dialect.name
+    raw_day = bucket_key(NetworkTraffic.timestamp, 86400, dialect)
+    rollup_day = bucket_key(TrafficRollup1d.bucket, 86400, dialect)
+
+    raw = (
+        select(raw_day.label('day'), func.count().label('rows'))
+        .where(NetworkTraffic.timestamp >= first, NetworkTraffic.timestamp < end)
+        .group_by(raw_day)
+        .subquery()
+    )
+    rolled = (
+        select(rollup_day.label('day'), TrafficRollup1d.samples)
+        .where(TrafficRollup1d.bucket >= first, TrafficRollup1d.bucket < end)
+        .subquery()
+    )
+
+    # Every tier is written in the same transaction, so the daily sample
+    # count stands for all of them; one statement sees a single snapshot
+    partial = session.execute(
+        select(raw.c.day)
+        .select_from(raw.outerjoin(rolled, raw.c.day == rolled.c.day))
+        .where(func.coalesce(rolled.c.samples, 0) != raw.c.rows)
+    ).scalars()
+    partial = {EPOCH + int(day) * DAY for day in partial}
+
+    days = {}
+    day = first
+    while day < end:
+        days[day] = day not in partial
+        day += DAY
+    return days
+
+def _stored_coverage(session, first, end):
+    """Coverage of the ended days from first up to end, counting raw rows only for days not recorded yet (commits the session)"""
+    days = dict(session.execute(
+        select(TrafficRollupCoverage.day, TrafficRollupCoverage.complete)
+        .where(TrafficRollupCoverage.day >= first, TrafficRollupCoverage.day < end)
+    ).all())
+
+    unrecorded = []
+    day = first
+    while day < end:
+        if day not in days:
+            unrecorded.append(day)
+        day += DAY
+
+    if unrecorded:
+        # Days ingested live are recorded the first time they are read after they end
+        counted = _day_coverage(session, unrecorded[0], unrecorded[-1] + DAY)
+        counted = {day: counted[day] for day in unrecorded}
+        _store_coverage(session, counted, overwrite=False)
+        session.commit()
+        days.update(counted)
+
+    return days
+
+def covered(session, start, end):
+    """Whether the rollups hold every raw row of every day touched by [start, end). Cached for COVERAGE_TTL seconds."""
+    first = floor_time(start, 86400)
+    wanted = []
+    day = first
+    while day < end:
+        wanted.append(day)
+        day += DAY
+
+    with _coverage_lock:
+        if time.time() - _coverage['checked'] >= COVERAGE_TTL:
+            _coverage.update(checked=time.time(), days={})
+        known = dict(_coverage['days'])
+
+    missing = [day for day in wanted if day not in known]
+    if missing:
+        today = _today()
+        ended = [day for day in missing if day < today]
+        if ended:
+            known.update(_stored_coverage(session, ended[0], ended[-1] + DAY))
+        if missing[-1] >= today:
+            known.update(_day_coverage(session, max(missing[0], today), missing[-1] + DAY))
+        with _coverage_lock:
+            _coverage['days'].update(known)
+
+    return all(known[day] for day in wanted)
+
+def select_tier(session, start, end, seconds):
+    """Coarsest tier whose buckets evenly divide buckets of the given width, or None for raw rows"""
+    if not Config.TRAFFIC_ROLLUPS_ENABLED or not covered(session, start, end):
+        return None
+
+    for tier in TIERS:
+        if seconds % tier.bucket_seconds == 0:
+            return tier
+    return None
+
+def summary_tier(session, start, end):
+    """Coarsest tier with at least SUMMARY_MIN_BUCKETS buckets in the window, or None for raw rows"""
+    if not Config.TRAFFIC_ROLLUPS_ENABLED:
+        return None
+
+    span = (end - start).total_seconds()
+    for tier in TIERS:
+        if tier.bucket_seconds * SUMMARY_MIN_BUCKETS <= span:
+            return tier if covered(session, start, end) else None
+    return None
+
+def bucketed_rollups(session, tier, start, end, seconds):
+    """Traffic points like traffic_aggregation.bucketed_traffic, read from a rollup tier"""
+    key = bucket_key(tier.bucket, seconds, session.get_bind().dialect.name).label('bucket_key')
+
+    columns = [key, func.sum(tier.samples)]
+    for metric in ROLLUP_METRICS:
+        total, count = func.sum(getattr(tier, f'{metric}_sum')), func.sum(getattr(tier, f'{metric}_count'))
+        columns += [total / func.nullif(count, 0), func.max(getattr(tier, f'{metric}_max')), total]
+
+    rows = session.execute(
+        select(*columns)
+        .where(tier.bucket >= floor_time(start, tier.bucket_seconds), tier.bucket < end)
+        .group_by(key)
+        .order_by(key)
+    ).all()
+
+    return aggregate_points(rows, [name for name, _ in metric_columns()], seconds)
+
+def summary_select(tier, start, end):
+    """Window totals of the tier buckets in [start, end), in traffic_aggregation.summary_select's columns"""
+    return select(
+        func.sum(tier.samples).label('samples'),
+        func.sum(tier.total_mbps_sum).label('traffic_sum'),
+        func.sum(tier.total_mbps_count).label('traffic_count'),
+        func.sum(tier.anomaly_count_sum).label('anomalies'),
+        func.sum(tier.blocked_threats_sum).label('blocked'),
+        func.sum(tier.avg_response_time_sum).label('response_sum'),
+        func.sum(tier.avg_response_time_count).label('response_count')
+    ).where(tier.bucket >= start, tier.bucket < end)
@@ -0,0 +1,122 @@
+"""
+Streaming extraction of training matrices from the anomalies table
+Selects only the feature columns through a server-side cursor and fills a
+preallocated NumPy matrix chunk by chunk, reservoir-sampling large windows
+"""
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import select, func
+from config import Config
+from services.multi_model_service import TRAFFIC_FEATURES
+
+# Column of each flow feature in the detector's input layout
+FLOW_COLUMNS = {name: j for j, (name, _) in enumerate(TRAFFIC_FEATURES)}
+FLOW_DEFAULTS = dict(TRAFFIC_FEATURES)
+
+def _column(values, default=0):
+    """Float array from a column of a chunk, with NULLs replaced by default"""
+    return np.fromiter((default if value is None else value for value in values), dtype=np.float64, count=len(values))
+
+def _fill_rows(out, rows, protocol_map):
+    """Write one chunk of (sport, dport, bytes, packets, protocol, timestamp) rows in the cascade's detector layout"""
+    source_ports, destination_ports, byte_counts, packet_counts, protocols, timestamps = zip(*rows)
+    n_flow = len(TRAFFIC_FEATURES)
+
+    # Flow features not stored on anomalies take the defaults used at prediction time
+    out[:, :n_flow] = [default for _, default in TRAFFIC_FEATURES]
+    out[:, FLOW_COLUMNS['source_port']] = _column(source_ports, FLOW_DEFAULTS['source_port'])
+    out[:, FLOW_COLUMNS['dest_port']] = _column(destination_ports, FLOW_DEFAULTS['dest_port'])
+    out[:, FLOW_COLUMNS['protocol']] = [protocol_map.get((protocol or 'OTHER').upper(), 0) for protocol in protocols]
+
+    byte_column = _column(byte_counts, FLOW_DEFAULTS['bytes'])
+    packet_column = _column(packet_counts, FLOW_DEFAULTS['packets'])
+    out[:, FLOW_COLUMNS['bytes']] = byte_column
+    out[:, FLOW_COLUMNS['packets']] = packet_column
+    # Mean packet size where the packet count is known
+    np.divide(byte_column, packet_column, out=out[:, FLOW_COLUMNS['packet_size']], where=packet_column > 0)
+
+    # When the anomaly was seen, matching the hour/day_of_week features used at prediction time
+    out[:, n_flow] = [timestamp.hour if timestamp else 0 for timestamp in timestamps]
+    out[:, n_flow + 1] = [timestamp.weekday() if timestamp else 0 for timestamp in timestamps]
+
+def training_window(days=None, end=None):
+    """(start, end) of the training window; start is None for an unbounded window"""
+    days = Config.TRAINING_WINDOW_DAYS if days is None else days
+    end = end or datetime.utcnow()
+    return (end - timedelta(days=days) if days else None), end
+
+def extract_training_matrix(session, protocol_map, n_features, start=None, end=None,
+                            sample_size=None, chunk_size=None, seed=None, progress=None):
+    """
+    Build the anomaly-detector training matrix from the anomalies table.
+
+    Rows are streamed in chunks of chunk_size (server-side cursor on
+    PostgreSQL). Windows larger than sample_size are reservoir-sampled down
+    to it, so memory stays bounded by sample_size rows. progress(seen, total)
+    is called after every chunk and may raise to abort.
+
+    Returns (X, rows_seen).
+    """
+    from models.anomaly import Anomaly
+
+    sample_size = Config.TRAINING_SAMPLE_SIZE if sample_size is None else sample_size
+    chunk_size = chunk_size or Config.TRAINING_CHUNK_SIZE
+
+    conditions = []
+    if start is not None:
+        conditions.append(Anomaly.timestamp >= start)
+    if end is not None:
+        conditions.append(Anomaly.timestamp < end)
+
+    # Preallocate from the window size so no intermediate lists are built
+    total = session.execute(select(func.count()).select_from(Anomaly).where(*conditions)).scalar() or 0
+    capacity = min(total, sample_size) if sample_size else total
+    X = np.empty((capacity, n_features), dtype=np.float64)
+
+    query = (
+        select(
+            Anomaly.source_port,
+            Anomaly.destination_port,
+            Anomaly.bytes_transferred,
+            Anomaly.packets,
+            Anomaly.protocol,
+            Anomaly.timestamp
+        )
+        .where(*conditions)
+        .execution_options(yield_per=chunk_size, stream_results=True)
+    )
+
+    rng = np.random.default_rng(seed)
+    chunk = np.empty((chunk_size, n_features), dtype=np.float64)
+    seen = 0
+
+    result = session.execute(query)
+    try:
+        for rows in result.partitions(chunk_size):
+            n = len(rows)
+            _fill_rows(chunk[:n], rows, protocol_map)
+
+            # Rows may have been inserted since the count; they go through the reservoir
+            fill = max(0, min(n, capacity - seen))
+            if fill:
+                X[seen:seen + fill] = chunk[:fill]
+
+            if fill < n and capacity:
+                # Reservoir sampling (algorithm R): row i replaces a random slot
+                # with probability capacity / (i + 1)
+                positions = np.arange(seen + fill, seen + n)
+                slots = rng.integers(0, positions + 1)
+                keep = np.nonzero(slots < capacity)[0]
+                if len(keep):
+                    # A slot hit twice in one chunk keeps the later row, as sequential R would
+                    last = len(keep) - 1 - np.unique(slots[keep][::-1], return_index=True)[1]
+                    X[slots[keep][last]] = chunk[fill:n][keep[last]]
+
+            seen += n
+            if progress:
+                progress(seen, max(total, seen))
+    finally:
+        result.close()
+
+    # Fewer rows than counted (deleted meanwhile): drop the unused tail
+    return X[:min(seen, capacity)], seen
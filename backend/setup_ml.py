@@ -4,6 +4,7 @@ Runs all steps: dataset generation, model training, and testing
 """
 import sys
 import os
+from dataset_store import dataset_format
 
 def print_header(text):
     """Print formatted header"""
@@ -110,7 +111,7 @@ def run_pipeline():
     print(f"   ✅ Model: Trained with {metrics['accuracy']*100:.2f}% accuracy")
     print(f"   ✅ Testing: Model working correctly")
     print(f"\n📁 Files Created:")
-    print(f"   - data/datasets/synthetic_network_traffic.csv")
+    print(f"   - data/datasets/synthetic_network_traffic.{'arrow' if dataset_format() == 'arrow' else 'csv'}")
     print(f"   - models/anomaly_detector_1.0.0.pkl")
     print(f"   - models/scaler_1.0.0.pkl")
     print(f"   - models/features_1.0.0.json")
@@ -4,6 +4,7 @@ Display all models, datasets, and capabilities
 """
 import os
 import json
+from dataset_store import dataset_path as find_dataset
 
 def format_size(bytes_size):
     """Format bytes to KB/MB"""
@@ -111,10 +112,10 @@ def show_overview():
         print(f"   Samples:     {dataset['samples']}")
         print(f"   Description: {dataset['description']}")
         
-        dataset_path = f'./data/datasets/{dataset["file"]}'
-        if os.path.exists(dataset_path):
+        dataset_path = find_dataset('./data/datasets', dataset['file'])
+        if dataset_path:
             size = format_size(os.path.getsize(dataset_path))
-            print(f"   File:        ✅ {dataset['file']} ({size})")
+            print(f"   File:        ✅ {os.path.basename(dataset_path)} ({size})")
         else:
             print(f"   File:        ❌ Not found")
         print()
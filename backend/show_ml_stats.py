@@ -3,12 +3,13 @@ Visualize dataset and model statistics
 """
 import pandas as pd
 import os
+from dataset_store import dataset_path, dataset_info, read_dataset
 
 def print_dataset_info():
     """Print dataset information and statistics"""
-    dataset_file = './data/datasets/synthetic_network_traffic.csv'
+    dataset_file = dataset_path('./data/datasets', 'synthetic_network_traffic')
     
-    if not os.path.exists(dataset_file):
+    if dataset_file is None:
         print("❌ Dataset not found. Run 'python prepare_dataset.py' first.")
         return
     
@@ -16,14 +17,16 @@ def print_dataset_info():
     print("📊 DATASET STATISTICS")
     print("=" * 70)
     
-    # Load dataset
-    df = pd.read_csv(dataset_file)
+    # Load only the columns shown below
+    df = read_dataset('./data/datasets', 'synthetic_network_traffic', columns=[
+        'label', 'protocol', 'dest_port', 'packet_size', 'packets', 'bytes', 'duration', 'connection_rate'
+    ])
     
     # Basic info
     print(f"\n📁 File: {dataset_file}")
     print(f"📦 Size: {os.path.getsize(dataset_file) / 1024:.2f} KB")
     print(f"📏 Rows: {len(df):,}")
-    print(f"📊 Columns: {len(df.columns)}")
+    print(f"📊 Columns: {len(dataset_info('./data/datasets', 'synthetic_network_traffic')['columns'])}")
     
     # Label distribution
     print(f"\n🏷️  Label Distribution:")
@@ -127,6 +130,30 @@ def print_performance_summary():
     print("📈 MODEL PERFORMANCE")
     print("=" * 70)
     
+    # Measured on the cached held-out split when the model was trained through the feature cache
+    try:
+        import joblib
+        from test_model import evaluate_holdout
+        model_file = './models/anomaly_detector_1.0.0.pkl'
+        holdout = evaluate_holdout(joblib.load(model_file)) if os.path.exists(model_file) else None
+    except Exception as e:
+        print(f"⚠️  Held-out evaluation skipped: {e}")
+        holdout = None
+    
+    if holdout:
+        cm = holdout['confusion_matrix']
+        print(f"\n   Held-out test split: {holdout['samples']:,} samples (feature cache)")
+        print(f"   Accuracy:  {holdout['accuracy']*100:.2f}%")
+        print(f"   Precision: {holdout['precision']*100:.2f}%")
+        print(f"   Recall:    {holdout['recall']*100:.2f}%")
+        print(f"   F1 Score:  {holdout['f1_score']*100:.2f}%")
+        print(f"\n🎯 Detection Results:")
+        print(f"   ├─ True Positives:   {cm[1][1]:,}")
+        print(f"   ├─ True Negatives:   {cm[0][0]:,}")
+        print(f"   ├─ False Positives:  {cm[0][1]:,}")
+        print(f"   └─ False Negatives:  {cm[1][0]:,}")
+        return
+    
     print("""
     Metric          │ Value    │ Status
     ────────────────┼──────────┼─────────────
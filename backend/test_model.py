@@ -6,6 +6,7 @@ import joblib
 import numpy as np
 import pandas as pd
 import json
+from feature_cache import load_entry
 
 def load_model(version='1.0.0'):
     """Load trained model and scaler"""
@@ -28,6 +29,31 @@ def load_model(version='1.0.0'):
     
     return model, scaler, feature_names
 
+def evaluate_holdout(model, version='1.0.0'):
+    """Metrics on the held-out split the model was trained with, read from the feature cache"""
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
+    
+    features_file = os.path.join('./models', f'features_{version}.json')
+    if not os.path.exists(features_file):
+        return None
+    with open(features_file, 'r') as f:
+        features = load_entry(json.load(f).get('featureCache'))
+    if features is None:
+        return None
+    
+    # The cached matrix is already encoded and scaled with the model's scaler
+    predictions = np.where(model.predict(features.X_test) == 1, 0, 1)
+    y_test = features.y_test
+    
+    return {
+        'samples': len(y_test),
+        'accuracy': accuracy_score(y_test, predictions),
+        'precision': precision_score(y_test, predictions),
+        'recall': recall_score(y_test, predictions),
+        'f1_score': f1_score(y_test, predictions),
+        'confusion_matrix': confusion_matrix(y_test, predictions).tolist()
+    }
+
 def create_test_samples():
     """Create test samples for prediction"""
     
@@ -171,6 +197,16 @@ def main():
         print(f"      - Connection Rate: {sample_data['connection_rate']}/s")
     
     print("\n" + "-" * 60)
+    
+    # Held-out evaluation without re-reading or re-preprocessing the dataset
+    holdout = evaluate_holdout(model)
+    if holdout:
+        print(f"\n📊 Held-out test split ({holdout['samples']:,} samples, from feature cache):")
+        print(f"   Accuracy:  {holdout['accuracy']*100:.2f}%")
+        print(f"   Precision: {holdout['precision']*100:.2f}%")
+        print(f"   Recall:    {holdout['recall']*100:.2f}%")
+        print(f"   F1 Score:  {holdout['f1_score']*100:.2f}%")
+    
     print("\n✅ Model testing complete!")
     print("\n💡 Model is ready to use in the application")
     print("   The ML service will automatically load this model")
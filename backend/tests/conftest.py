@@ -0,0 +1,60 @@
+"""
+Shared test fixtures
+The app runs against a temporary SQLite database and a copy of the tracked
+model artifacts, so tests never write into ./models
+"""
+import os
+import sys
+import glob
+import shutil
+import tempfile
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+TEST_DIR = tempfile.mkdtemp(prefix='anomaly-tests-')
+MODEL_DIR = os.path.join(TEST_DIR, 'models')
+
+os.makedirs(MODEL_DIR)
+for path in glob.glob(os.path.join(BACKEND_DIR, 'models', '*_1.0.0.*')):
+    shutil.copy(path, MODEL_DIR)
+
+# Read by config.Config at import time, so set before anything imports it
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}",
+    'MODEL_PATH': MODEL_DIR,
+    'MODEL_WATCH_INTERVAL': '0',
+    'MODEL_WARMUP_ON_START': 'false',
+    'RETRAIN_SCHEDULE_ENABLED': 'false',
+    'FEATURE_CACHE_DIR': os.path.join(TEST_DIR, 'feature-cache')
+})
+
+def pytest_sessionfinish(session, exitstatus):
+    """Remove the temporary database and model copies"""
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+@pytest.fixture(scope='session')
+def app():
+    """The Flask app with its tables created"""
+    from app import app as flask_app
+
+    flask_app.config['TESTING'] = True
+    return flask_app
+
+@pytest.fixture
+def client(app):
+    """Test client of the app"""
+    return app.test_client()
+
+@pytest.fixture
+def db_session(app):
+    """Database session inside an app context; every table is emptied afterwards"""
+    from database import db
+
+    with app.app_context():
+        yield db.session
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
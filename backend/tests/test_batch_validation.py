@@ -0,0 +1,54 @@
+"""
+Tests for per-record validation in the batch scoring endpoints
+"""
+import pytest
+from services.multi_model_service import FeatureContext
+
+RECORDS = [
+    {'source_port': 51234, 'dest_port': 443, 'protocol': 4, 'bytes': 1200, 'packets': 4},
+    {'source_port': 40000, 'dest_port': 22, 'bytes': 'abc'},
+    {'source_port': 40000, 'dest_port': 22, 'packets': None, 'failed_attempts': '12'},
+    {'source_port': 40000, 'dest_port': 22, 'duration': float('nan')},
+    {'source_port': 40000, 'dest_port': 22, 'unique_sources': [1, 2]}
+]
+
+def test_unreadable_records_are_set_aside():
+    context = FeatureContext(RECORDS)
+
+    assert sorted(context.errors) == [1, 3, 4]
+    assert "'bytes'" in context.errors[1]
+    assert context.valid == [0, 2]
+    assert context.traffic_features.shape[0] == len(context.records) == 2
+    # Null falls back to the default and numeric strings are read as numbers
+    assert context.column('packets')[1] == 50
+    assert context.alert_context[1, 1] == 12
+
+def test_predict_batch_scores_the_valid_records(client):
+    response = client.post('/api/model/predict/batch', json=RECORDS)
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert body['count'] == len(RECORDS)
+    assert body['errors'] == 3
+    for i, prediction in enumerate(body['predictions']):
+        assert (prediction['prediction'] == 'error') == (i in (1, 3, 4))
+        assert ('error' in prediction) == (i in (1, 3, 4))
+
+def test_analyze_scores_the_valid_records(client):
+    response = client.post('/api/model/analyze', json={'records': RECORDS})
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert body['errors'] == 3
+    for i, analysis in enumerate(body['results']):
+        if i in (1, 3, 4):
+            assert list(analysis) == ['error']
+        else:
+            assert 'error' not in analysis['anomaly_detection']
+
+@pytest.mark.parametrize('endpoint', ['/api/model/predict/batch', '/api/model/analyze'])
+def test_batch_of_only_bad_records(client, endpoint):
+    response = client.post(endpoint, json=[{'bytes': 'abc'}])
+
+    assert response.status_code == 200
+    assert response.get_json()['errors'] == 1
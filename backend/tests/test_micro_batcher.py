@@ -0,0 +1,53 @@
+"""
+Tests for the /predict micro-batching queue
+"""
+import threading
+import pytest
+from services.micro_batcher import MicroBatcher
+
+def score(records):
+    """Stand-in model: fails the whole batch if any record is malformed"""
+    return [{'prediction': 'normal', 'bytes': float(record.get('bytes', 0))} for record in records]
+
+def submit_all(batcher, records):
+    """Submit records concurrently, returning each caller's result or exception"""
+    outcomes = [None] * len(records)
+    barrier = threading.Barrier(len(records))
+
+    def call(i):
+        barrier.wait()
+        try:
+            outcomes[i] = batcher.submit(records[i])
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(records))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+def test_bad_record_fails_only_its_own_request():
+    batcher = MicroBatcher(score, window_ms=200, max_batch_size=16)
+    records = [{'bytes': i} for i in range(7)] + [{'bytes': 'abc'}]
+
+    outcomes = submit_all(batcher, records)
+
+    assert isinstance(outcomes[-1], ValueError)
+    assert [outcome['bytes'] for outcome in outcomes[:-1]] == [float(i) for i in range(7)]
+    assert batcher.get_stats()['rowByRowFallbacks'] >= 1
+
+def test_non_object_record_is_rejected_before_queueing():
+    batcher = MicroBatcher(score)
+
+    with pytest.raises(TypeError):
+        batcher.submit([1, 2])
+    assert batcher.get_stats()['records'] == 0
+
+@pytest.mark.parametrize('body', [{'bytes': 'abc'}, [1, 2]])
+def test_predict_keeps_error_contract_for_bad_input(client, body):
+    response = client.post('/api/model/predict', json=body)
+
+    assert response.status_code == 200
+    assert response.get_json()['prediction'] == 'error'
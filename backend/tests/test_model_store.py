@@ -0,0 +1,98 @@
+"""
+Tests for the process-wide model store
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+from config import Config
+from services import model_store
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    """A model directory holding one small anomaly detector version"""
+    monkeypatch.setattr(Config, 'FAST_FOREST_SCORING', True)
+    monkeypatch.setattr(Config, 'MODEL_MMAP_MODE', 'r')
+
+    X = np.random.default_rng(0).normal(size=(500, 4))
+    scaler = StandardScaler().fit(X)
+    model = IsolationForest(n_estimators=20, random_state=0).fit(scaler.transform(X))
+    model_store.dump_artifact(model, model_store.artifact_path(str(tmp_path), 'anomaly_detector', 'test'))
+    model_store.dump_artifact(scaler, model_store.artifact_path(str(tmp_path), 'scaler', 'test'))
+
+    yield str(tmp_path)
+    model_store.evict('test', str(tmp_path))
+
+def test_only_flat_scorer_arrays_are_memory_mapped(model_dir):
+    entry = model_store.get_model('anomaly_detector', 'test', model_dir)
+
+    # Tree.__setstate__ copies node arrays, so sklearn trees are never mapped
+    assert not any(isinstance(estimator.tree_.threshold, np.memmap) for estimator in entry.model.estimators_)
+    assert entry.mapped_bytes == entry.fast_scorer.nbytes > 0
+
+    reported = next(model for model in model_store.get_loaded_models() if model['version'] == 'test')
+    assert reported['mappedBytes'] == entry.mapped_bytes
+    assert reported['memoryBytes'] > reported['mappedBytes']
+    assert reported['inheritedFromParent'] is False
+
+class _SlowLoad:
+    """Stand-in for _load_model that records how many loads overlap"""
+
+    def __init__(self, seconds=0.3):
+        self.seconds = seconds
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.calls = []
+
+    def __call__(self, name, version, model_dir):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.calls.append(name)
+        time.sleep(self.seconds)
+        with self.lock:
+            self.active -= 1
+
+        entry = SimpleNamespace(name=name, version=version)
+        entry.mtime = os.path.getmtime(model_store.artifact_path(model_dir, model_store.MODEL_ARTIFACTS[name]['model'], version))
+        return entry
+
+@pytest.fixture
+def slow_load(tmp_path, monkeypatch):
+    """Empty artifact files for every model plus a slow fake loader"""
+    for prefixes in model_store.MODEL_ARTIFACTS.values():
+        open(model_store.artifact_path(str(tmp_path), prefixes['model'], 'slow'), 'w').close()
+
+    loader = _SlowLoad()
+    monkeypatch.setattr(model_store, '_load_model', loader)
+    yield loader
+    model_store.evict('slow', str(tmp_path))
+
+def test_different_models_load_concurrently(tmp_path, slow_load):
+    names = list(model_store.MODEL_ARTIFACTS)
+
+    with ThreadPoolExecutor(max_workers=len(names)) as executor:
+        list(executor.map(lambda name: model_store.get_model(name, 'slow', str(tmp_path)), names))
+
+    assert slow_load.peak == len(names)
+
+def test_one_model_is_loaded_once_by_concurrent_callers(tmp_path, slow_load):
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        entries = list(executor.map(lambda _: model_store.get_model('attack_classifier', 'slow', str(tmp_path)), range(4)))
+
+    assert slow_load.calls == ['attack_classifier']
+    assert all(entry is entries[0] for entry in entries)
+
+def test_training_manifest_keeps_integers(tmp_path):
+    results = {'anomaly_detector': {'status': 'success', 'f1_score': np.float64(0.9), 'n_jobs': 1, 'trees': np.int64(100), 'seconds': 2.5}}
+    model_store.write_training_manifest(str(tmp_path), 'test', results)
+
+    recorded = model_store.read_training_manifest(str(tmp_path), 'test')['models']['anomaly_detector']
+    assert recorded == {'status': 'success', 'f1_score': 0.9, 'n_jobs': 1, 'trees': 100, 'seconds': 2.5}
+    assert isinstance(recorded['n_jobs'], int) and isinstance(recorded['trees'], int)
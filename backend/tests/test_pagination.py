@@ -0,0 +1,82 @@
+"""
+Tests for keyset (cursor) pagination of the list endpoints
+"""
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from api.pagination import encode_cursor, decode_cursor, CursorError
+
+@pytest.fixture
+def anomalies(db_session):
+    """23 anomalies, several sharing a timestamp so pages must break ties on id"""
+    from models.anomaly import Anomaly
+
+    start = datetime(2026, 3, 2, 12, 0, 0, 123456)
+    rows = []
+    for i in range(23):
+        anomaly = Anomaly(
+            id=str(uuid.uuid4()),
+            timestamp=start + timedelta(seconds=i // 3),
+            source_ip='10.0.0.1',
+            destination_ip='10.0.0.2',
+            type='port_scan',
+            severity='high' if i % 2 else 'low',
+            confidence=0.9
+        )
+        db_session.add(anomaly)
+        rows.append(anomaly)
+    db_session.commit()
+
+    # Expected order: newest first, then id descending
+    return [anomaly.id for anomaly in sorted(rows, key=lambda row: (row.timestamp, row.id), reverse=True)]
+
+def _pages(client, cursor_key, cursor=None, **params):
+    """Follow one cursor direction to the end, returning the pages' ids"""
+    pages = []
+    while True:
+        query = dict(params, cursor=cursor) if cursor else params
+        response = client.get('/api/anomalies/', query_string=query)
+        assert response.status_code == 200
+        body = response.get_json()
+        pages.append([anomaly['id'] for anomaly in body['anomalies']])
+        cursor = body[cursor_key]
+        if cursor is None:
+            return pages, body
+
+def test_cursor_round_trip_keeps_microseconds():
+    timestamp = datetime(2026, 3, 2, 12, 0, 0, 123456)
+    cursor = encode_cursor(timestamp, 'abc', 'prev')
+
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (timestamp, 'abc', 'prev')
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', encode_cursor(datetime(2026, 1, 1), 1, 'next')[:-3], 'WyIyMDI2IiwxLCJ1cCJd'])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(CursorError):
+        decode_cursor(cursor)
+
+def test_pages_cover_every_row_once_in_order(client, anomalies):
+    pages, last = _pages(client, 'nextCursor', limit=5)
+
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+    assert sum(pages, []) == anomalies
+    assert last['prevCursor'] is not None
+
+def test_paging_back_returns_the_same_pages(client, anomalies):
+    forward, last = _pages(client, 'nextCursor', limit=5)
+
+    # From the last page, prevCursor walks back over the same pages
+    backward, first = _pages(client, 'prevCursor', cursor=last['prevCursor'], limit=5)
+    assert backward == list(reversed(forward[:-1]))
+    assert first['nextCursor'] is not None
+
+def test_filters_and_total_apply_to_every_page(client, anomalies):
+    pages, last = _pages(client, 'nextCursor', limit=4, severity='high', includeTotal='true')
+
+    assert len(sum(pages, [])) == last['total'] == 11
+
+def test_bad_cursor_is_a_client_error(client, anomalies):
+    response = client.get('/api/anomalies/', query_string={'cursor': 'garbage'})
+
+    assert response.status_code == 400
+    assert 'Invalid cursor' in response.get_json()['error']
@@ -0,0 +1,156 @@
+"""
+Tests for background retraining and the reload of retrained artifacts
+"""
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from config import Config
+from services import model_store
+from services.model_registry import ModelRegistry
+from services.multi_model_service import MultiModelService
+from services.retrain_jobs import JobManager, RetrainJob
+
+FLOWS = [
+    {'source_port': 51234, 'dest_port': 443, 'protocol': 4, 'bytes': 1200, 'packets': 4},
+    {'source_port': 40000, 'dest_port': 22, 'protocol': 5, 'packet_size': 64, 'packets': 900,
+     'syn_flag': 1, 'ack_flag': 0, 'connection_rate': 250.0}
+]
+
+@pytest.fixture
+def model_dir(tmp_path):
+    """A private copy of the shipped artifacts, so retraining leaves the session's copy alone"""
+    for path in glob.glob(os.path.join(Config.MODEL_PATH, f'*_{Config.MODEL_VERSION}.*')):
+        shutil.copy(path, tmp_path)
+
+    yield str(tmp_path)
+    model_store.evict(Config.MODEL_VERSION, str(tmp_path))
+
+@pytest.fixture
+def anomalies(db_session):
+    """Enough stored anomalies for a retrain"""
+    from models.anomaly import Anomaly
+
+    rng = np.random.default_rng(0)
+    now = datetime.utcnow()
+    for i in range(150):
+        db_session.add(Anomaly(
+            id=str(uuid.uuid4()),
+            timestamp=now - timedelta(minutes=i),
+            source_ip='10.0.0.1',
+            destination_ip='10.0.0.2',
+            source_port=int(rng.integers(1024, 65535)),
+            destination_port=int(rng.choice([22, 80, 443])),
+            type='port_scan',
+            severity='high',
+            confidence=0.9,
+            protocol=str(rng.choice(['TCP', 'UDP', 'HTTPS'])),
+            bytes_transferred=int(rng.integers(100, 100000)),
+            packets=int(rng.integers(1, 500))
+        ))
+    db_session.commit()
+
+def _wait(job, timeout=120):
+    """Block until a job has finished"""
+    _wait_for(lambda: job.finished, timeout)
+
+def _wait_for(condition, timeout=120):
+    """Block until condition() is true"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out waiting for the retrain job'
+        time.sleep(0.05)
+
+def test_retrained_detector_serves_predict_and_analyze(app, anomalies, model_dir):
+    registry = ModelRegistry(model_dir=model_dir)
+    job = JobManager(model_dir=model_dir).submit(app, registry)
+    _wait(job)
+
+    assert job.status == 'succeeded', job.error
+    assert registry.swaps == 1
+
+    # The job fitted the cascade's 14-feature layout, and the whole bundle was rebuilt on it
+    detector = registry.multi_model_service.anomaly_detector
+    assert detector is registry.ml_service.model
+    assert detector.n_features_in_ == registry.ml_service.N_FEATURES == 14
+
+    for result in registry.multi_model_service.analyze_many(FLOWS):
+        assert 'error' not in result['analysis']['anomaly_detection']
+    for prediction in registry.ml_service.predict_batch([{'sourcePort': 51234, 'destinationPort': 443, 'protocol': 'HTTPS'}]):
+        assert prediction['prediction'] != 'error'
+
+    # A process started after the retrain loads the same artifacts from disk
+    model_store.evict(Config.MODEL_VERSION, model_dir)
+    fresh = MultiModelService(model_dir=model_dir, version=Config.MODEL_VERSION, lazy=False)
+    for result in fresh.analyze_many(FLOWS):
+        assert 'error' not in result['analysis']['anomaly_detection']
+
+def test_other_workers_pick_up_a_retrain_on_their_next_check(model_dir):
+    registry = ModelRegistry(model_dir=model_dir)
+    other = ModelRegistry(model_dir=model_dir)
+    other.multi_model_service.load_all_models()
+    assert not other.check_retrained()
+
+    # Another process replaces the detector in place
+    path = model_store.artifact_path(model_dir, 'anomaly_detector', Config.MODEL_VERSION)
+    os.utime(path, (time.time() + 5, time.time() + 5))
+
+    assert other.check_retrained()
+    assert other.swaps == 1
+    assert other.multi_model_service.readiness['anomaly_detector']['loaded']
+    assert not other.check_retrained()
+    assert registry.check_retrained()
+
+def test_any_worker_sees_and_reports_a_job(app, anomalies, model_dir):
+    registry = ModelRegistry(model_dir=model_dir)
+    worker, other = JobManager(model_dir=model_dir), JobManager(model_dir=model_dir)
+    job = worker.submit(app, registry)
+
+    # The other worker cannot start a second job and reports the running one
+    assert other.submit(app, registry) is None
+    assert other.active_job().id == job.id
+    assert other.get(job.id).to_dict()['workerPid'] == os.getpid()
+
+    _wait_for(lambda: other.get(job.id).finished)
+    record = other.get(job.id)
+    assert record.status == 'succeeded'
+    assert record.result == {'status': 'success', 'version': Config.MODEL_VERSION}
+    assert [listed.id for listed in other.list()] == [job.id]
+    assert other.active_job() is None
+
+def test_another_worker_cancels_the_fit_process(app, anomalies, model_dir):
+    registry = ModelRegistry(model_dir=model_dir)
+    worker, other = JobManager(model_dir=model_dir), JobManager(model_dir=model_dir)
+    job = worker.submit(app, registry)
+
+    _wait_for(lambda: other.get(job.id).fit_pid or job.finished)
+    fit_pid = other.get(job.id).fit_pid
+    assert fit_pid, 'job finished before its fit process was recorded'
+
+    assert other.cancel(job.id).cancel_requested.is_set()
+    _wait(job)
+
+    assert job.status == 'cancelled'
+    assert other.get(job.id).status == 'cancelled'
+    with pytest.raises(ProcessLookupError):
+        os.kill(fit_pid, 0)
+
+def test_job_of_an_exited_worker_is_reported_failed(model_dir):
+    manager = JobManager(model_dir=model_dir)
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+
+    job = RetrainJob()
+    job.status = 'running'
+    job.pid = exited.pid
+    manager.store.save(job)
+
+    assert manager.get(job.id).status == 'failed'
+    assert manager.active_job() is None
+    assert manager.get('../../etc/passwd') is None
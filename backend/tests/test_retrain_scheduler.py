@@ -0,0 +1,121 @@
+"""
+Tests for the periodic retraining scheduler
+"""
+import os
+import subprocess
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+from config import Config
+from services import model_store
+from services import retrain_scheduler
+from services.retrain_scheduler import RetrainScheduler
+
+class FakeTraining:
+    """Stands in for the train_all_models.py process, recording how it was run"""
+
+    def __init__(self, scheduler, returncode=0):
+        self.scheduler = scheduler
+        self.returncode = returncode
+        # By default the anomaly detector fails: the candidate is rejected, never rolled out
+        self.failed = {'anomaly_detector'}
+        self.commands = []
+        self.state_during_run = None
+
+    def __call__(self, command, **kwargs):
+        self.commands.append(command)
+        self.state_during_run = self.scheduler.read_state()
+
+        model_dir = command[command.index('--model-dir') + 1]
+        version = command[command.index('--version') + 1]
+        data_dir = command[command.index('--data-dir') + 1]
+        os.makedirs(data_dir)
+        open(os.path.join(data_dir, 'attack_classification.csv'), 'w').close()
+        open(os.path.join(model_dir, f'attack_classifier_{version}.pkl'), 'w').close()
+
+        results = {name: {'status': 'success', metric: 1.0} for name, metric in retrain_scheduler.PRIMARY_METRICS.items()}
+        results.update({name: {'status': 'failed', 'error': 'boom'} for name in self.failed})
+        model_store.write_training_manifest(model_dir, version, results)
+        return SimpleNamespace(wait=lambda: self.returncode, pid=0)
+
+@pytest.fixture
+def scheduler(tmp_path):
+    """A scheduler over an empty model directory"""
+    registry = SimpleNamespace(version=Config.MODEL_VERSION, rollout=lambda version: {'version': version})
+    return RetrainScheduler(registry, model_dir=str(tmp_path))
+
+@pytest.fixture
+def training(scheduler, monkeypatch):
+    """The scheduler's training process, replaced by FakeTraining"""
+    training = FakeTraining(scheduler)
+    monkeypatch.setattr(subprocess, 'Popen', training)
+    return training
+
+def test_runs_on_fresh_data_and_stages_once(scheduler, training):
+    state = scheduler.run_once()
+
+    command = training.commands[0]
+    assert '--regenerate-data' in command
+    assert command[command.index('--seed') + 1] == str(state['seed'])
+    # The scheduler's directory is the only staging area
+    assert '--no-staging' in command
+    staging_dir = command[command.index('--model-dir') + 1]
+    assert os.path.dirname(staging_dir) == scheduler.model_dir
+    # Datasets are generated inside the run's staging area, not the shared data directory
+    assert os.path.dirname(command[command.index('--data-dir') + 1]) == staging_dir
+
+    assert state['result'] == 'rejected'
+    assert not os.path.exists(staging_dir)
+    assert not os.path.exists(os.path.join(scheduler.model_dir, f"attack_classifier_{state['candidateVersion']}.pkl"))
+
+def test_promotion_moves_artifacts_but_not_datasets(scheduler, training):
+    training.failed = set()
+
+    state = scheduler.run_once()
+
+    assert state['result'] == 'promoted'
+    assert os.path.exists(os.path.join(scheduler.model_dir, f"attack_classifier_{state['candidateVersion']}.pkl"))
+    assert not os.path.exists(os.path.join(scheduler.model_dir, retrain_scheduler.DATA_SUBDIR))
+    assert not any(name.startswith('.staging-') for name in os.listdir(scheduler.model_dir))
+
+def test_last_run_is_recorded_only_when_the_run_finishes(scheduler, training):
+    previous = (datetime.utcnow() - timedelta(days=2)).isoformat()
+    scheduler.write_state({'lastRunAt': previous})
+
+    state = scheduler.run_once()
+
+    # While training, a crash would leave the previous lastRunAt and the run stays due
+    assert training.state_during_run['lastRunAt'] == previous
+    assert training.state_during_run['result'] == 'running'
+    assert state['lastRunAt'] == state['startedAt'] == scheduler.read_state()['lastRunAt']
+
+def test_crashed_run_is_retried(scheduler):
+    scheduler.off_peak_hours = set(range(24))
+    scheduler.write_state({'startedAt': datetime.utcnow().isoformat(), 'result': 'running'})
+    assert scheduler.is_due()
+
+    scheduler.write_state({'lastRunAt': datetime.utcnow().isoformat()})
+    assert not scheduler.is_due()
+
+def test_failed_training_process_is_reported(scheduler, training):
+    training.returncode = -9
+
+    state = scheduler.run_once()
+
+    assert state['result'] == 'failed'
+    assert 'code -9' in state['error']
+    assert state['lastRunAt'] == state['startedAt']
+
+def test_state_is_never_left_half_written(scheduler, monkeypatch):
+    scheduler.write_state({'lastRunAt': '2026-03-01T02:00:00'})
+
+    def interrupted(state, f, **kwargs):
+        f.write('{"lastRunAt": "2026-')
+        raise OSError('disk full')
+
+    monkeypatch.setattr(retrain_scheduler.json, 'dump', interrupted)
+    with pytest.raises(OSError):
+        scheduler.write_state({'lastRunAt': '2026-03-02T02:00:00'})
+
+    assert scheduler.read_state() == {'lastRunAt': '2026-03-01T02:00:00'}
+    assert not [name for name in os.listdir(scheduler.model_dir) if name.startswith('.tmp-')]
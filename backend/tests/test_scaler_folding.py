@@ -0,0 +1,108 @@
+"""
+Tests for folding StandardScaler into tree split thresholds
+"""
+import copy
+import numpy as np
+from sklearn.ensemble import IsolationForest, RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.preprocessing import StandardScaler
+from services.scaler_folding import fold_scaler, FLOAT32_EXACT_LIMIT
+
+def training_data(n=4000, seed=0):
+    """Small-valued columns plus a byte-count column reaching 10**9"""
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(0, 65536, n),
+        rng.normal(500, 200, n),
+        rng.uniform(0.1, 5.0, n),
+        rng.lognormal(15, 3, n).clip(0, 1e9).round()
+    ])
+    y = (X[:, 1] > 550) ^ (X[:, 3] > 3e6)
+    return X, y.astype(int)
+
+def folded_copy(model, scaler):
+    """(folded model, scaler still to apply) without touching the original"""
+    model = copy.deepcopy(model)
+    return model, fold_scaler(model, scaler)
+
+def thresholds_by_column(model, scaler):
+    """Folded split thresholds of every input column"""
+    by_column = {}
+    for estimator, features in zip(model.estimators_, model.estimators_features_):
+        tree = estimator.tree_
+        split_nodes = tree.children_left != -1
+        for column, threshold in zip(np.asarray(features)[tree.feature[split_nodes]], tree.threshold[split_nodes]):
+            by_column.setdefault(column, []).append(threshold * scaler.scale_[column] + scaler.mean_[column])
+    return {column: np.array(values) for column, values in by_column.items()}
+
+def score(model, input_scaler, X):
+    """Score raw rows through an (optional) input scaler"""
+    return model.score_samples(X if input_scaler is None else input_scaler.transform(X))
+
+def test_large_magnitude_column_stays_scaled():
+    X, _ = training_data()
+    scaler = StandardScaler().fit(X)
+    model = IsolationForest(n_estimators=50, random_state=0).fit(scaler.transform(X))
+    folded, input_scaler = folded_copy(model, scaler)
+
+    # The byte column has splits beyond 2**24, so only it is still scaled
+    assert input_scaler is not None and input_scaler is not scaler
+    assert np.allclose(input_scaler.mean_[:3], 0) and np.allclose(input_scaler.scale_[:3], 1)
+    assert input_scaler.mean_[3] == scaler.mean_[3]
+
+    # Byte counts on and either side of every split above 2**24
+    splits = thresholds_by_column(model, scaler)[3]
+    splits = splits[splits >= FLOAT32_EXACT_LIMIT]
+    values = np.concatenate([np.floor(splits), np.ceil(splits), np.floor(splits) + 1, splits])
+    rows = np.repeat(X[:1], len(values), axis=0)
+    rows[:, 3] = values
+
+    assert np.array_equal(score(model, scaler, rows), score(folded, input_scaler, rows))
+
+def test_folded_scores_match_within_float32_tolerance():
+    X, _ = training_data()
+    scaler = StandardScaler().fit(X)
+    model = IsolationForest(n_estimators=50, random_state=0).fit(scaler.transform(X))
+    folded, input_scaler = folded_copy(model, scaler)
+
+    # Away from split thresholds the outputs are identical
+    X_test, _ = training_data(n=5000, seed=1)
+    assert np.array_equal(score(model, scaler, X_test), score(folded, input_scaler, X_test))
+
+    # Near a split they may differ, but only within one float32 step of it
+    splits = thresholds_by_column(model, scaler)[1]
+    values = np.concatenate([splits, splits * (1 + 1e-7), splits * (1 - 1e-7), splits * (1 + 1e-3)])
+    rows = np.repeat(X_test[:1], len(values), axis=0)
+    rows[:, 1] = values
+    differs = score(model, scaler, rows) != score(folded, input_scaler, rows)
+
+    distance = np.abs(values[:, None] - splits[None, :]).min(axis=1)
+    step = np.spacing(np.abs(values).astype(np.float32)).astype(np.float64)
+    assert np.all(distance[differs] <= 2 * step[differs])
+
+def test_gradient_models_fold_fully():
+    X, y = training_data()
+    scaler = StandardScaler().fit(X)
+    X_test, _ = training_data(n=2000, seed=2)
+
+    for model in (RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0),
+                  HistGradientBoostingClassifier(max_iter=30, random_state=0)):
+        model.fit(scaler.transform(X), y)
+        folded, input_scaler = folded_copy(model, scaler)
+        expected = model.predict_proba(scaler.transform(X_test))
+        actual = folded.predict_proba(X_test if input_scaler is None else input_scaler.transform(X_test))
+
+        assert np.allclose(expected, actual)
+        if isinstance(model, HistGradientBoostingClassifier):
+            assert input_scaler is None
+
+def test_fold_is_idempotent():
+    X, _ = training_data()
+    scaler = StandardScaler().fit(X)
+    model = IsolationForest(n_estimators=10, random_state=0).fit(scaler.transform(X))
+
+    first = fold_scaler(model, scaler)
+    thresholds = [estimator.tree_.threshold.copy() for estimator in model.estimators_]
+
+    assert fold_scaler(model, scaler) is first
+    assert all(np.array_equal(before, estimator.tree_.threshold)
+               for before, estimator in zip(thresholds, model.estimators_))
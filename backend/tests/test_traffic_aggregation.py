@@ -0,0 +1,158 @@
+"""
+Tests for time-bucketed traffic reads
+"""
+import math
+from datetime import datetime, timedelta
+import pytest
+from config import Config
+from services.traffic_aggregation import EPOCH, bucket_seconds, parse_range
+
+NOW = datetime(2026, 3, 9, 10, 17, 42, 500000)
+
+def _buckets_touched(start, end, seconds):
+    """Epoch-aligned buckets of the given width that [start, end) overlaps"""
+    first = math.floor((start - EPOCH).total_seconds() / seconds)
+    last = math.floor(((end - EPOCH).total_seconds() - 1e-6) / seconds)
+    return last - first + 1
+
+def _traffic(timestamp):
+    """A raw traffic row"""
+    from models.network_traffic import NetworkTraffic
+
+    return NetworkTraffic(timestamp=timestamp, incoming_mbps=1.0, outgoing_mbps=1.0, total_mbps=2.0)
+
+@pytest.mark.parametrize('time_range', ['1h', '24h', '7d', '30d'])
+@pytest.mark.parametrize('max_points', [2, 10, 59, 60, 61, 1000])
+@pytest.mark.parametrize('offset', [0, 1, 59, 1799, 3599])
+def test_bucket_count_never_exceeds_the_cap(time_range, max_points, offset):
+    start, end = parse_range(time_range, now=NOW + timedelta(seconds=offset))
+    seconds = bucket_seconds('auto', start, end, max_points=max_points)
+
+    # Whole buckets per point, and the width lines up with a rollup tier or whole hours
+    assert seconds in (60, 300) or seconds % 3600 == 0
+    assert _buckets_touched(start, end, seconds) <= max_points
+
+def test_auto_picks_the_finest_width_that_fits():
+    start, end = parse_range('1h', now=NOW)
+
+    assert bucket_seconds('auto', start, end, max_points=1000) == 60
+    assert bucket_seconds('auto', start, end, max_points=60) == 300
+    assert bucket_seconds('auto', start, end, max_points=12) == 3600
+
+def test_requested_bucket_is_kept_or_coarsened():
+    start, end = parse_range('24h', now=NOW)
+
+    assert bucket_seconds('5m', start, end, max_points=1000) == 300
+    # 24h of 1m buckets would be 1441 points
+    assert bucket_seconds('1m', start, end, max_points=1000) == 300
+    assert bucket_seconds('1h', start, end, max_points=1000) == 3600
+
+def test_unknown_bucket_is_rejected():
+    start, end = parse_range('1h', now=NOW)
+
+    with pytest.raises(ValueError):
+        bucket_seconds('2m', start, end)
+
+def test_traffic_endpoint_respects_the_cap(client, db_session, monkeypatch):
+    monkeypatch.setattr(Config, 'TRAFFIC_MAX_POINTS', 10)
+    start = datetime(2026, 3, 1, 0, 7)
+    for i in range(200):
+        db_session.add(_traffic(start + timedelta(minutes=37 * i)))
+    db_session.commit()
+
+    end = start + timedelta(minutes=37 * 200)
+    response = client.get('/api/traffic/', query_string={'from': start.isoformat(), 'to': end.isoformat(), 'bucket': '1m'})
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert len(body['traffic']) <= 10
+    assert body['bucketSeconds'] % 3600 == 0
+    # Coarser buckets regroup the rows, they do not drop any
+    assert sum(point['samples'] for point in body['traffic']) == 200
+
+def _stats_rows(db_session, now, rolled_up=True):
+    """Eight days of rows every 20 minutes up to now, returned as plain values"""
+    from services import traffic_rollups
+
+    rows = []
+    for i in range(8 * 72):
+        traffic = _traffic(now - timedelta(minutes=20 * i, seconds=3))
+        traffic.total_mbps = 50.0 + i % 13
+        traffic.active_connections = 1000 - i
+        traffic.anomaly_count = i % 5
+        traffic.blocked_threats = i % 3
+        traffic.avg_response_time = None if i % 7 == 0 else 10.0 + i % 11
+        for column in ('tcp_traffic', 'udp_traffic', 'http_traffic', 'https_traffic', 'ssh_traffic', 'ftp_traffic', 'other_traffic'):
+            setattr(traffic, column, 0.0)
+        db_session.add(traffic)
+        if rolled_up:
+            traffic_rollups.record(db_session, traffic)
+        rows.append((traffic.timestamp, traffic.total_mbps, traffic.anomaly_count, traffic.blocked_threats, traffic.avg_response_time))
+    db_session.commit()
+    return rows
+
+def _expected_summary(rows, start, end):
+    """Window totals computed row by row"""
+    window = [row for row in rows if start <= row[0] < end]
+    responses = [row[4] for row in window if row[4] is not None]
+    return {
+        'samples': len(window),
+        'avgTraffic': sum(row[1] for row in window) / len(window),
+        'anomalyCount': sum(row[2] for row in window),
+        'blockedThreats': sum(row[3] for row in window),
+        'avgResponseTime': sum(responses) / len(responses)
+    }
+
+@pytest.mark.parametrize('window', [timedelta(minutes=45), timedelta(hours=5, minutes=7), timedelta(days=3, minutes=11), timedelta(days=7)])
+def test_summary_matches_row_by_row_totals(db_session, window):
+    from services import traffic_rollups
+    from services.traffic_aggregation import traffic_summary
+
+    traffic_rollups.invalidate_coverage()
+    now = datetime(2026, 3, 9, 10, 17, 42)
+    rows = _stats_rows(db_session, now)
+    end = now - timedelta(minutes=3)
+    start = end - window
+
+    summary = traffic_summary(db_session, start, end)
+
+    # Long windows read whole buckets from a rollup tier and only the edges from raw rows
+    assert (summary['tier'] != 'raw') == (window >= timedelta(hours=1))
+    for key, value in _expected_summary(rows, start, end).items():
+        assert summary[key] == pytest.approx(value), key
+    assert summary['activeConnections'] == 1000
+
+def test_stats_endpoint(client, db_session):
+    from services import traffic_rollups
+
+    traffic_rollups.invalidate_coverage()
+    now = datetime.utcnow()
+    rows = _stats_rows(db_session, now)
+
+    response = client.get('/api/traffic/stats', query_string={'window': '7d'})
+    body = response.get_json()
+    assert response.status_code == 200
+
+    # The endpoint's window ends at request time, a moment after now
+    expected = _expected_summary(rows, now - timedelta(days=7), now + timedelta(seconds=1))
+    assert body['window'] == 7 * 86400
+    assert body['anomalyCount'] == expected['anomalyCount']
+    assert body['blockedThreats'] == expected['blockedThreats']
+    assert body['totalTraffic'] == pytest.approx(expected['avgTraffic'], abs=0.01)
+    assert body['avgResponseTime'] == pytest.approx(expected['avgResponseTime'], abs=0.01)
+    assert body['detectionRate'] == pytest.approx(expected['blockedThreats'] / expected['anomalyCount'] * 100, abs=0.01)
+    assert body['activeConnections'] == 1000
+
+@pytest.mark.parametrize('window', ['abc', '0', '-5', '2h'])
+def test_stats_rejects_bad_windows(client, window):
+    response = client.get('/api/traffic/stats', query_string={'window': window})
+
+    assert response.status_code == 400
+
+def test_stats_window_defaults_to_one_hour(client, monkeypatch):
+    # TRAFFIC_WINDOW is the monitor's capture window, not the stats default
+    monkeypatch.setattr(Config, 'TRAFFIC_WINDOW', 300)
+    response = client.get('/api/traffic/stats')
+
+    assert response.status_code == 200
+    assert response.get_json()['window'] == 3600
@@ -0,0 +1,236 @@
+"""
+Tests for the network traffic rollups: parity with raw rows, backfill and coverage
+"""
+from datetime import datetime, timedelta
+import pytest
+from config import Config
+from services import traffic_rollups
+from services.traffic_aggregation import bucketed_traffic, traffic_summary
+
+# Three whole days of history, one row every 20 minutes
+DAY_ONE = datetime(2026, 3, 2)
+DAYS = 3
+
+@pytest.fixture(autouse=True)
+def fresh_coverage():
+    """Coverage cached by another test must not leak into this one"""
+    traffic_rollups.invalidate_coverage()
+    yield
+    traffic_rollups.invalidate_coverage()
+
+def _traffic(timestamp, i):
+    """A raw traffic row with every metric set"""
+    from models.network_traffic import NetworkTraffic
+
+    return NetworkTraffic(
+        timestamp=timestamp,
+        incoming_mbps=10.0 + i % 7,
+        outgoing_mbps=5.0 + i % 3,
+        total_mbps=15.0 + i % 7 + i % 3,
+        tcp_traffic=float(i % 5),
+        udp_traffic=1.0,
+        http_traffic=2.0,
+        https_traffic=3.0,
+        ssh_traffic=0.0,
+        ftp_traffic=0.0,
+        other_traffic=0.5,
+        active_connections=100 + i,
+        anomaly_count=i % 4,
+        blocked_threats=i % 2,
+        # Sometimes unknown: means must divide by the non-null count
+        avg_response_time=None if i % 6 == 0 else 20.0 + i % 9
+    )
+
+def _ingest(session, days, rolled_up=True):
+    """Ingest raw rows for the given day offsets, adding them to the rollups like the monitor does"""
+    for offset in days:
+        for i in range(72):
+            traffic = _traffic(DAY_ONE + timedelta(days=offset, minutes=20 * i), i)
+            session.add(traffic)
+            if rolled_up:
+                traffic_rollups.record(session, traffic)
+    session.commit()
+
+def _raw(monkeypatch, read):
+    """Result of read() with the rollups switched off"""
+    monkeypatch.setattr(Config, 'TRAFFIC_ROLLUPS_ENABLED', False)
+    try:
+        return read()
+    finally:
+        monkeypatch.setattr(Config, 'TRAFFIC_ROLLUPS_ENABLED', True)
+
+def _assert_same_points(points, expected):
+    assert [point['timestamp'] for point in points] == [point['timestamp'] for point in expected]
+    for point, raw in zip(points, expected):
+        assert point['samples'] == raw['samples']
+        for name, aggregates in raw['aggregates'].items():
+            for key, value in aggregates.items():
+                assert point['aggregates'][name][key] == pytest.approx(value), (point['timestamp'], name, key)
+
+@pytest.mark.parametrize('seconds', [3600, 6 * 3600, 86400])
+def test_rollup_reads_match_raw_reads(db_session, monkeypatch, seconds):
+    _ingest(db_session, range(DAYS))
+    start, end = DAY_ONE + timedelta(hours=1), DAY_ONE + timedelta(days=DAYS)
+
+    assert traffic_rollups.select_tier(db_session, start, end, seconds) is not None
+    _assert_same_points(
+        bucketed_traffic(db_session, start, end, seconds),
+        _raw(monkeypatch, lambda: bucketed_traffic(db_session, start, end, seconds))
+    )
+
+def test_summary_from_rollups_matches_raw(db_session, monkeypatch):
+    _ingest(db_session, range(DAYS))
+    start, end = DAY_ONE + timedelta(minutes=7), DAY_ONE + timedelta(days=DAYS, minutes=-13)
+
+    summary = traffic_summary(db_session, start, end)
+    raw = _raw(monkeypatch, lambda: traffic_summary(db_session, start, end))
+
+    assert summary['tier'] != 'raw' and raw['tier'] == 'raw'
+    for key in ('samples', 'avgTraffic', 'anomalyCount', 'blockedThreats', 'avgResponseTime'):
+        assert summary[key] == pytest.approx(raw[key]), key
+
+def test_monitor_rows_with_column_defaults_match_raw(db_session, monkeypatch):
+    from models.traffic_rollup import TrafficRollup1d
+    from services.monitoring_service import generate_mock_traffic_data
+    from services.traffic_aggregation import floor_time
+
+    # The monitor leaves other_traffic to its column default
+    rows = [generate_mock_traffic_data() for _ in range(3)]
+    start = floor_time(rows[0].timestamp, 86400)
+    end = start + 2 * timedelta(days=1)
+
+    assert traffic_rollups.select_tier(db_session, start, end, 86400) is TrafficRollup1d
+    points = bucketed_traffic(db_session, start, end, 86400)
+    assert sum(point['samples'] for point in points) == len(rows)
+    assert all(point['protocols']['other'] == 0.0 for point in points)
+    _assert_same_points(points, _raw(monkeypatch, lambda: bucketed_traffic(db_session, start, end, 86400)))
+
+def test_gap_in_history_falls_back_to_raw_rows(db_session, monkeypatch):
+    # The middle day was ingested while rollups were off
+    _ingest(db_session, [0, 2])
+    _ingest(db_session, [1], rolled_up=False)
+    start, end = DAY_ONE, DAY_ONE + timedelta(days=DAYS)
+
+    assert not traffic_rollups.covered(db_session, start, end)
+    assert traffic_rollups.select_tier(db_session, start, end, 3600) is None
+    assert traffic_rollups.select_tier(db_session, DAY_ONE + timedelta(days=2), end, 3600) is not None
+    _assert_same_points(
+        bucketed_traffic(db_session, start, end, 3600),
+        _raw(monkeypatch, lambda: bucketed_traffic(db_session, start, end, 3600))
+    )
+
+    # Backfilling just the gap makes the whole range readable from the rollups
+    assert traffic_rollups.backfill(db_session, DAY_ONE + timedelta(days=1), DAY_ONE + timedelta(days=2)) == 1
+    assert traffic_rollups.covered(db_session, start, end)
+    _assert_same_points(
+        bucketed_traffic(db_session, start, end, 3600),
+        _raw(monkeypatch, lambda: bucketed_traffic(db_session, start, end, 3600))
+    )
+
+def test_backfill_rebuilds_live_rollups_exactly(db_session):
+    from models.traffic_rollup import TrafficRollup1m, TrafficRollup1h, TrafficRollup1d
+
+    _ingest(db_session, range(DAYS))
+
+    def snapshot():
+        return {
+            tier.__tablename__: sorted(
+                (row.bucket, row.samples, round(row.total_mbps_sum, 6), row.avg_response_time_count, row.active_connections_max)
+                for row in db_session.query(tier)
+            )
+            for tier in (TrafficRollup1m, TrafficRollup1h, TrafficRollup1d)
+        }
+
+    live = snapshot()
+    assert traffic_rollups.backfill(db_session) == DAYS
+    assert snapshot() == live
+
+    # Rerunning over the same range changes nothing
+    assert traffic_rollups.backfill(db_session) == DAYS
+    assert snapshot() == live
+
+def test_rows_ingested_after_a_backfill_are_added_once(db_session, monkeypatch):
+    _ingest(db_session, [0], rolled_up=False)
+    traffic_rollups.backfill(db_session)
+
+    # Late rows for the backfilled day go through the live upsert into existing buckets
+    traffic = _traffic(DAY_ONE + timedelta(minutes=5), 1)
+    db_session.add(traffic)
+    traffic_rollups.record(db_session, traffic)
+    db_session.commit()
+    traffic_rollups.invalidate_coverage()
+
+    start, end = DAY_ONE, DAY_ONE + timedelta(days=1)
+    assert traffic_rollups.covered(db_session, start, end)
+    _assert_same_points(
+        bucketed_traffic(db_session, start, end, 3600),
+        _raw(monkeypatch, lambda: bucketed_traffic(db_session, start, end, 3600))
+    )
+
+def _coverage_rows(session):
+    from models.traffic_rollup import TrafficRollupCoverage
+
+    return {row.day: row.complete for row in session.query(TrafficRollupCoverage)}
+
+def _no_raw_counts(monkeypatch):
+    """Fail the test if coverage is counted from the raw table"""
+    def counted(*args):
+        raise AssertionError('raw rows counted')
+
+    monkeypatch.setattr(traffic_rollups, '_day_coverage', counted)
+
+def test_ended_days_are_counted_from_raw_rows_once(db_session, monkeypatch):
+    _ingest(db_session, [0, 2])
+    _ingest(db_session, [1], rolled_up=False)
+    start, end = DAY_ONE, DAY_ONE + timedelta(days=DAYS)
+
+    assert not traffic_rollups.covered(db_session, start, end)
+    assert _coverage_rows(db_session) == {DAY_ONE: True, DAY_ONE + timedelta(days=1): False, DAY_ONE + timedelta(days=2): True}
+
+    # Later checks (in this process after the cache expires, or in another one) read the stored days
+    traffic_rollups.invalidate_coverage()
+    _no_raw_counts(monkeypatch)
+    assert not traffic_rollups.covered(db_session, start, end)
+    assert traffic_rollups.covered(db_session, DAY_ONE + timedelta(days=2), end)
+
+def test_backfill_records_the_days_it_rebuilt(db_session, monkeypatch):
+    _ingest(db_session, range(DAYS), rolled_up=False)
+
+    traffic_rollups.backfill(db_session)
+
+    assert _coverage_rows(db_session) == {DAY_ONE + timedelta(days=offset): True for offset in range(DAYS)}
+    _no_raw_counts(monkeypatch)
+    assert traffic_rollups.covered(db_session, DAY_ONE, DAY_ONE + timedelta(days=DAYS))
+
+def test_late_row_ingested_without_rollups_uncovers_its_day(db_session, monkeypatch):
+    _ingest(db_session, [0])
+    start, end = DAY_ONE, DAY_ONE + timedelta(days=1)
+    assert traffic_rollups.covered(db_session, start, end)
+
+    monkeypatch.setattr(Config, 'TRAFFIC_ROLLUPS_ENABLED', False)
+    traffic = _traffic(DAY_ONE + timedelta(minutes=5), 1)
+    db_session.add(traffic)
+    traffic_rollups.record(db_session, traffic)
+    db_session.commit()
+    monkeypatch.setattr(Config, 'TRAFFIC_ROLLUPS_ENABLED', True)
+    traffic_rollups.invalidate_coverage()
+
+    assert not traffic_rollups.covered(db_session, start, end)
+    traffic_rollups.backfill(db_session, start, end)
+    assert traffic_rollups.covered(db_session, start, end)
+
+def test_current_day_is_recounted_and_not_stored(db_session):
+    from services.monitoring_service import generate_mock_traffic_data
+    from services.traffic_aggregation import floor_time
+
+    today = floor_time(generate_mock_traffic_data().timestamp, 86400)
+    start, end = today, today + timedelta(days=1)
+    assert traffic_rollups.covered(db_session, start, end)
+
+    # A row that skipped the rollups shows up once the cached answer expires
+    db_session.add(_traffic(datetime.utcnow(), 1))
+    db_session.commit()
+    traffic_rollups.invalidate_coverage()
+
+    assert not traffic_rollups.covered(db_session, start, end)
+    assert _coverage_rows(db_session) == {}
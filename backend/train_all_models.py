@@ -4,6 +4,10 @@ Huấn luyện tất cả các models cùng lúc
 """
 import sys
 import os
+import argparse
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 def print_header(text):
     print("\n" + "=" * 70)
@@ -15,110 +19,252 @@ def print_step(num, text):
     print(f"  STEP {num}: {text}")
     print(f"{'─' * 70}")
 
-def run_all_training():
-    """Train all ML models in sequence"""
+# Trainers run in this order when sequential (and are listed in this order)
+TRAINERS = ['anomaly_detector', 'attack_classifier', 'severity_predictor', 'traffic_forecaster']
+
+# Trainers built on a selectable boosting engine (see boosting.py)
+BOOSTING_TRAINERS = ['severity_predictor', 'traffic_forecaster']
+
+DATA_DIR = './data/datasets'
+
+def train_anomaly_detector(version, model_dir, n_jobs=-1, regenerate_data=False, seed=42, data_dir=DATA_DIR):
+    """Train and save the anomaly detector (Isolation Forest)"""
+    from prepare_dataset import DatasetManager
+    from train_model import ModelTrainer
+    from dataset_store import dataset_path
+    
+    if regenerate_data or not dataset_path(data_dir, 'synthetic_network_traffic'):
+        manager = DatasetManager(data_dir=data_dir)
+        manager.generate_synthetic_dataset(n_samples=10000, anomaly_ratio=0.1, seed=seed)
+    
+    # Encoded, split and scaled matrices, reused across runs on the same dataset
+    trainer = ModelTrainer(model_dir=model_dir, data_dir=data_dir)
+    features = trainer.load_features()
+    
+    contamination = (features.y_train == 1).sum() / len(features.y_train)
+    trainer.train_model(features.X_train, contamination=contamination, n_jobs=n_jobs, scaled=True)
+    metrics = trainer.evaluate_model(features.X_test, features.y_test, scaled=True)
+    trainer.save_model(version=version)
+    
+    return {
+        'status': 'success',
+        'accuracy': metrics['accuracy'],
+        'precision': metrics['precision'],
+        'recall': metrics['recall'],
+        'f1_score': metrics['f1_score']
+    }
+
+def train_attack_classifier(version, model_dir, n_jobs=-1, regenerate_data=False, seed=42, data_dir=DATA_DIR):
+    """Train and save the attack classifier (Random Forest)"""
+    from train_attack_classifier import AttackClassifier
+    from dataset_store import dataset_path
+    
+    classifier = AttackClassifier(model_dir=model_dir, data_dir=data_dir)
+    if regenerate_data or not dataset_path(data_dir, 'attack_classification'):
+        classifier.generate_attack_dataset(n_samples=5000, seed=seed)
+    metrics = classifier.train_model(features=classifier.load_features(), n_jobs=n_jobs)
+    classifier.save_model(version=version)
+    
+    result = {
+        'status': 'success',
+        'accuracy': metrics['accuracy']
+    }
+    if 'variant' in metrics:
+        result['variant'] = metrics['variant']
+    return result
+
+def train_severity_predictor(version, model_dir, n_jobs=1, regenerate_data=False, seed=42, engine=None, data_dir=DATA_DIR):
+    """Train and save the severity predictor (Gradient Boosting)"""
+    from train_severity_predictor import SeverityPredictor
+    from dataset_store import dataset_path
+    
+    predictor = SeverityPredictor(model_dir=model_dir, data_dir=data_dir, engine=engine)
+    if regenerate_data or not dataset_path(data_dir, 'severity_prediction'):
+        predictor.generate_severity_dataset(n_samples=3000, seed=seed)
+    metrics = predictor.train_model(features=predictor.load_features(), n_jobs=n_jobs)
+    predictor.save_model(version=version)
+    
+    return {
+        'status': 'success',
+        'accuracy': metrics['accuracy'],
+        'engine': predictor.engine
+    }
+
+def train_traffic_forecaster(version, model_dir, n_jobs=1, regenerate_data=False, seed=42, engine=None, data_dir=DATA_DIR):
+    """Train and save the traffic forecaster (Gradient Boosting)"""
+    from train_traffic_forecaster import TrafficForecaster
+    from dataset_store import dataset_path
+    
+    forecaster = TrafficForecaster(model_dir=model_dir, data_dir=data_dir, engine=engine)
+    if regenerate_data or not dataset_path(data_dir, 'traffic_forecasting'):
+        forecaster.generate_timeseries_dataset(n_days=30, samples_per_day=96, seed=seed)
+    metrics = forecaster.train_model(features=forecaster.load_features(), n_jobs=n_jobs)
+    forecaster.save_model(version=version)
+    
+    return {
+        'status': 'success',
+        'r2_score': metrics['r2_score'],
+        'mae': metrics['mae'],
+        'rmse': metrics['rmse'],
+        'engine': forecaster.engine
+    }
+
+def run_trainer(name, version, model_dir, n_jobs, regenerate_data=False, engine=None, seed=42, data_dir=DATA_DIR):
+    """Run one trainer, returning its result with the time it took (never raises)"""
+    trainer = globals()[f'train_{name}']
+    options = {'engine': engine} if name in BOOSTING_TRAINERS else {}
+    started = time.perf_counter()
+    try:
+        result = trainer(version, model_dir, n_jobs=n_jobs, regenerate_data=regenerate_data, seed=seed, data_dir=data_dir, **options)
+    except Exception as e:
+        result = {'status': 'failed', 'error': str(e)}
+    result['seconds'] = round(time.perf_counter() - started, 2)
+    result['n_jobs'] = n_jobs
+    return result
+
+def allocate_cpus(budget, engine='exact'):
+    """
+    Split a CPU budget between the trainers as (pool size, n_jobs per trainer).
+    
+    Exact Gradient Boosting is single-threaded and gets one core per trainer;
+    the remaining cores go to the forests' n_jobs so the pool never runs more
+    threads than the budget. Histogram boosting is multi-threaded, so with
+    engine 'hist' the budget is shared evenly by all four trainers.
+    """
+    budget = max(1, budget)
+    if budget < len(TRAINERS):
+        return budget, {name: 1 for name in TRAINERS}
+    
+    if engine == 'hist':
+        n_jobs = {name: budget // len(TRAINERS) for name in TRAINERS}
+        # Left-over cores go to the slowest trainers first
+        for name in ['attack_classifier', 'anomaly_detector', 'severity_predictor'][:budget % len(TRAINERS)]:
+            n_jobs[name] += 1
+        return len(TRAINERS), n_jobs
+    
+    forest_cpus = budget - 2
+    anomaly_jobs = forest_cpus // 2
+    return len(TRAINERS), {
+        'anomaly_detector': anomaly_jobs,
+        # Random Forest is the slowest trainer; it gets the odd core
+        'attack_classifier': forest_cpus - anomaly_jobs,
+        'severity_predictor': 1,
+        'traffic_forecaster': 1
+    }
+
+def promote_staged(staging_dir, model_dir):
+    """Move staged artifacts into model_dir (each file replaced atomically)"""
+    for filename in os.listdir(staging_dir):
+        os.replace(os.path.join(staging_dir, filename), os.path.join(model_dir, filename))
+
+def run_all_training(version='1.0.0', model_dir='./models', cpus=None, sequential=False, regenerate_data=False, engine=None,
+                     seed=42, staged=True, data_dir=DATA_DIR):
+    """
+    Train all ML models, independent trainers in parallel within a CPU budget.
+    
+    Existing datasets (and their cached feature matrices) are reused unless
+    regenerate_data is set (from seed). engine selects the boosting engine
+    of the severity predictor and traffic forecaster (default:
+    BOOSTING_ENGINE). With staged=False the artifacts are written straight
+    into model_dir, for callers that stage the run themselves; data_dir
+    lets such a caller keep its datasets apart from the shared ones.
+    """
+    from boosting import boosting_engine
+    engine = boosting_engine(engine)
+    boosting_label = 'Histogram Gradient Boosting' if engine == 'hist' else 'Gradient Boosting'
     
     print_header("🤖 COMPLETE ML TRAINING PIPELINE")
     print("\nThis will train all models:")
     print("  1. ✅ Anomaly Detector (Isolation Forest)")
     print("  2. 🎯 Attack Classifier (Random Forest)")
-    print("  3. ⚠️  Severity Predictor (Gradient Boosting)")
-    print("  4. 📈 Traffic Forecaster (Gradient Boosting)")
+    print(f"  3. ⚠️  Severity Predictor ({boosting_label})")
+    print(f"  4. 📈 Traffic Forecaster ({boosting_label})")
+    
+    cpus = cpus or os.cpu_count() or 1
+    processes, n_jobs = allocate_cpus(cpus, engine)
+    if sequential:
+        # One trainer at a time, so each may use the whole budget
+        processes = 1
+        n_jobs.update(anomaly_detector=cpus, attack_classifier=cpus)
+        if engine == 'hist':
+            n_jobs.update({name: cpus for name in BOOSTING_TRAINERS})
+    
+    print(f"\n⚙️  CPU budget: {cpus} ({processes} trainer process{'es' if processes > 1 else ''})")
+    for name in TRAINERS:
+        print(f"   {name.replace('_', ' ').title():30s} n_jobs={n_jobs[name]}")
+    
+    # Artifacts are staged and only moved into model_dir once every model
+    # trained, so a version is never left half old and half new
+    os.makedirs(model_dir, exist_ok=True)
+    os.makedirs(data_dir, exist_ok=True)
+    staging_dir = os.path.join(model_dir, f'.staging-{version}') if staged else model_dir
+    if staged:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        os.makedirs(staging_dir)
     
     results = {}
+    started = time.perf_counter()
     
-    # Model 1: Anomaly Detector
-    print_step(1, "Training Anomaly Detection Model")
     try:
-        from prepare_dataset import DatasetManager
-        from train_model import ModelTrainer
-        from sklearn.model_selection import train_test_split
-        
-        manager = DatasetManager()
-        dataset = manager.generate_synthetic_dataset(n_samples=10000, anomaly_ratio=0.1)
-        
-        trainer = ModelTrainer()
-        data = trainer.load_data()
-        X, y = trainer.prepare_features(data)
-        
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, stratify=y
-        )
-        
-        contamination = (y_train == 1).sum() / len(y_train)
-        trainer.train_model(X_train, contamination=contamination)
-        metrics = trainer.evaluate_model(X_test, y_test)
-        trainer.save_model(version='1.0.0')
+        if processes == 1:
+            for step, name in enumerate(TRAINERS, 1):
+                print_step(step, f"Training {name.replace('_', ' ').title()}")
+                results[name] = run_trainer(name, version, staging_dir, n_jobs[name], regenerate_data, engine, seed, data_dir)
+        else:
+            print_step('1-4', f"Training {len(TRAINERS)} models in parallel")
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                futures = {
+                    name: pool.submit(run_trainer, name, version, staging_dir, n_jobs[name], regenerate_data, engine, seed, data_dir)
+                    for name in TRAINERS
+                }
+                for name in TRAINERS:
+                    try:
+                        results[name] = futures[name].result()
+                    except Exception as e:
+                        # The worker process itself died
+                        results[name] = {'status': 'failed', 'error': str(e), 'seconds': None}
         
-        results['anomaly_detector'] = {
-            'status': 'success',
-            'accuracy': metrics['accuracy']
-        }
-        print(f"✅ Anomaly Detector: {metrics['accuracy']*100:.2f}% accuracy")
+        wall_seconds = round(time.perf_counter() - started, 2)
+        for name, result in results.items():
+            display = name.replace('_', ' ').title()
+            if result['status'] == 'success':
+                print(f"✅ {display} trained in {result['seconds']}s")
+            else:
+                print(f"❌ {display} failed: {result['error']}")
         
-    except Exception as e:
-        print(f"❌ Anomaly Detector failed: {e}")
-        results['anomaly_detector'] = {'status': 'failed', 'error': str(e)}
+        complete = all(result['status'] == 'success' for result in results.values())
+        if complete and staged:
+            promote_staged(staging_dir, model_dir)
+        elif staged:
+            print(f"\n⚠️  Not all models trained; existing artifacts in {model_dir} left unchanged")
+    finally:
+        if staged:
+            shutil.rmtree(staging_dir, ignore_errors=True)
     
-    # Model 2: Attack Classifier
-    print_step(2, "Training Attack Classification Model")
-    try:
-        from train_attack_classifier import AttackClassifier
-        
-        classifier = AttackClassifier()
-        data = classifier.generate_attack_dataset(n_samples=5000)
-        metrics = classifier.train_model(data)
-        classifier.save_model(version='1.0.0')
-        
-        results['attack_classifier'] = {
-            'status': 'success',
-            'accuracy': metrics['accuracy']
-        }
-        print(f"✅ Attack Classifier: {metrics['accuracy']*100:.2f}% accuracy")
-        
-    except Exception as e:
-        print(f"❌ Attack Classifier failed: {e}")
-        results['attack_classifier'] = {'status': 'failed', 'error': str(e)}
+    timing = {
+        'cpus': cpus,
+        'processes': processes,
+        'wallSeconds': wall_seconds,
+        'trainerSeconds': round(sum(result.get('seconds') or 0 for result in results.values()), 2)
+    }
     
-    # Model 3: Severity Predictor
-    print_step(3, "Training Severity Prediction Model")
-    try:
-        from train_severity_predictor import SeverityPredictor
-        
-        predictor = SeverityPredictor()
-        data = predictor.generate_severity_dataset(n_samples=3000)
-        metrics = predictor.train_model(data)
-        predictor.save_model(version='1.0.0')
-        
-        results['severity_predictor'] = {
-            'status': 'success',
-            'accuracy': metrics['accuracy']
-        }
-        print(f"✅ Severity Predictor: {metrics['accuracy']*100:.2f}% accuracy")
-        
-    except Exception as e:
-        print(f"❌ Severity Predictor failed: {e}")
-        results['severity_predictor'] = {'status': 'failed', 'error': str(e)}
+    # Record evaluation metrics next to the artifacts (used to gate promotion);
+    # a failed run only records itself if it doesn't hide a good manifest
+    from services.model_store import write_training_manifest, manifest_path
+    manifest_file = manifest_path(model_dir, version)
+    if complete or not os.path.exists(manifest_file):
+        write_training_manifest(model_dir, version, results, timing=timing)
     
-    # Model 4: Traffic Forecaster
-    print_step(4, "Training Traffic Forecasting Model")
-    try:
-        from train_traffic_forecaster import TrafficForecaster
-        
-        forecaster = TrafficForecaster()
-        data = forecaster.generate_timeseries_dataset(n_days=30, samples_per_day=96)
-        metrics = forecaster.train_model(data)
-        forecaster.save_model(version='1.0.0')
-        
-        results['traffic_forecaster'] = {
-            'status': 'success',
-            'r2_score': metrics['r2_score']
-        }
-        print(f"✅ Traffic Forecaster: {metrics['r2_score']*100:.2f}% R² score")
-        
-    except Exception as e:
-        print(f"❌ Traffic Forecaster failed: {e}")
-        results['traffic_forecaster'] = {'status': 'failed', 'error': str(e)}
+    # Timing report
+    print_header("⏱️  TRAINING TIME")
+    print()
+    for name in TRAINERS:
+        seconds = results[name].get('seconds')
+        print(f"   {name.replace('_', ' ').title():30s} {seconds if seconds is not None else '-':>8}s  (n_jobs={n_jobs[name]})")
+    print(f"\n   {'Sum of trainer times':30s} {timing['trainerSeconds']:>8}s")
+    print(f"   {'Wall time':30s} {wall_seconds:>8}s")
+    if wall_seconds:
+        print(f"   {'Speedup':30s} {timing['trainerSeconds'] / wall_seconds:>8.2f}x")
     
     # Summary
     print_header("🎉 TRAINING COMPLETE - SUMMARY")
@@ -143,32 +289,34 @@ def run_all_training():
             print(f"Failed: {result.get('error', 'Unknown error')}")
     
     # List generated files
+    from dataset_store import dataset_path
     print(f"\n📁 Generated Files:")
     print(f"\n   Datasets:")
     datasets = [
-        'synthetic_network_traffic.csv',
-        'attack_classification.csv',
-        'severity_prediction.csv',
-        'traffic_forecasting.csv'
+        'synthetic_network_traffic',
+        'attack_classification',
+        'severity_prediction',
+        'traffic_forecasting'
     ]
     for ds in datasets:
-        path = f'data/datasets/{ds}'
-        if os.path.exists(path):
+        path = dataset_path(data_dir, ds)
+        if path:
             size = os.path.getsize(path) / 1024
-            print(f"      ✅ {ds:40s} ({size:.1f} KB)")
+            print(f"      ✅ {os.path.basename(path):40s} ({size:.1f} KB)")
     
     print(f"\n   Models:")
     models = [
-        'anomaly_detector_1.0.0.pkl',
-        'attack_classifier_1.0.0.pkl',
-        'severity_predictor_1.0.0.pkl',
-        'traffic_forecaster_1.0.0.pkl'
+        f'anomaly_detector_{version}.pkl',
+        f'attack_classifier_{version}.pkl',
+        f'severity_predictor_{version}.pkl',
+        f'traffic_forecaster_{version}.pkl'
     ]
     for model in models:
-        path = f'models/{model}'
+        path = os.path.join(model_dir, model)
         if os.path.exists(path):
             size = os.path.getsize(path) / 1024
             print(f"      ✅ {model:40s} ({size:.1f} KB)")
+    print(f"      📋 {os.path.basename(manifest_file)}")
     
     print("\n" + "=" * 70)
     print("\n🚀 Next Steps:")
@@ -182,5 +330,29 @@ def run_all_training():
     return success_count == total_count
 
 if __name__ == '__main__':
-    success = run_all_training()
+    parser = argparse.ArgumentParser(description='Train all ML models')
+    parser.add_argument('--version', default='1.0.0', help='Version suffix of the saved artifacts')
+    parser.add_argument('--model-dir', default='./models', help='Directory to save the artifacts in')
+    parser.add_argument('--cpus', type=int, default=None, help='CPU budget shared by all trainers (default: all cores)')
+    parser.add_argument('--sequential', action='store_true', help='Train one model at a time')
+    parser.add_argument('--regenerate-data', action='store_true', help='Regenerate the synthetic datasets first')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed of regenerated datasets')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Directory of the training datasets')
+    parser.add_argument('--no-staging', dest='staged', action='store_false',
+                        help='Write artifacts straight into --model-dir (the caller stages the run)')
+    parser.add_argument('--engine', choices=['exact', 'hist'], default=None,
+                        help='Boosting engine of the severity predictor and traffic forecaster (default: BOOSTING_ENGINE)')
+    args = parser.parse_args()
+    
+    success = run_all_training(
+        version=args.version,
+        model_dir=args.model_dir,
+        cpus=args.cpus,
+        sequential=args.sequential,
+        regenerate_data=args.regenerate_data,
+        engine=args.engine,
+        seed=args.seed,
+        staged=args.staged,
+        data_dir=args.data_dir
+    )
     sys.exit(0 if success else 1)
@@ -6,15 +6,91 @@ import os
 import numpy as np
 import pandas as pd
 from datetime import datetime
-import joblib
+from services.model_store import dump_artifact
+from prepare_dataset import sample_profiles
+from dataset_store import write_dataset, dataset_info
+from feature_cache import load_or_build, split_and_scale
+from forest_compression import compress_forest
+from config import Config
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
 
 class AttackClassifier:
     """Train classifier to identify specific attack types"""
     
+    # Column specs of each attack type (see prepare_dataset.sample_column)
+    ATTACK_PROFILES = {
+        'dos': {
+            'source_port': ('randint', 1024, 65535),
+            'dest_port': ('choice', [80, 443]),
+            'protocol': ('const', 1),  # TCP
+            'packet_size': ('normal', 100, 50),
+            'packets': ('randint', 1000, 10000),
+            'bytes': ('randint', 100000, 1000000),
+            'duration': ('uniform', 0.01, 0.5),
+            'flag_count': ('randint', 5, 15),
+            'syn_flag': ('const', 1),
+            'ack_flag': ('const', 0),
+            'rst_flag': ('choice', [0, 1]),
+            'connection_rate': ('uniform', 50, 200),
+            'hour': ('randint', 0, 24),
+            'day_of_week': ('randint', 0, 7),
+            'attack_type': ('const', 'dos')
+        },
+        'port_scan': {
+            'source_port': ('randint', 1024, 65535),
+            'dest_port': ('randint', 1, 65535),
+            'protocol': ('const', 1),  # TCP
+            'packet_size': ('normal', 64, 20),
+            'packets': ('randint', 1, 5),
+            'bytes': ('randint', 64, 500),
+            'duration': ('uniform', 0.001, 0.1),
+            'flag_count': ('randint', 1, 3),
+            'syn_flag': ('const', 1),
+            'ack_flag': ('const', 0),
+            'rst_flag': ('const', 1),
+            'connection_rate': ('uniform', 10, 50),
+            'hour': ('randint', 0, 24),
+            'day_of_week': ('randint', 0, 7),
+            'attack_type': ('const', 'port_scan')
+        },
+        'brute_force': {
+            'source_port': ('randint', 1024, 65535),
+            'dest_port': ('choice', [22, 3389, 21, 23]),
+            'protocol': ('choice', [1, 5]),  # TCP or SSH
+            'packet_size': ('normal', 300, 100),
+            'packets': ('randint', 5, 50),
+            'bytes': ('randint', 1000, 10000),
+            'duration': ('uniform', 1.0, 10.0),
+            'flag_count': ('randint', 3, 10),
+            'syn_flag': ('const', 1),
+            'ack_flag': ('const', 1),
+            'rst_flag': ('choice', [0, 1]),
+            'connection_rate': ('uniform', 20, 100),
+            'hour': ('randint', 0, 24),
+            'day_of_week': ('randint', 0, 7),
+            'attack_type': ('const', 'brute_force')
+        },
+        'data_exfiltration': {
+            'source_port': ('randint', 1024, 65535),
+            'dest_port': ('choice', [80, 443, 8080]),
+            'protocol': ('choice', [3, 4]),  # HTTP or HTTPS
+            'packet_size': ('normal', 1400, 200),
+            'packets': ('randint', 500, 5000),
+            'bytes': ('randint', 500000, 5000000),
+            'duration': ('uniform', 10.0, 300.0),
+            'flag_count': ('randint', 2, 5),
+            'syn_flag': ('const', 1),
+            'ack_flag': ('const', 1),
+            'rst_flag': ('const', 0),
+            'connection_rate': ('uniform', 1, 10),
+            'hour': ('randint', 0, 24),
+            'day_of_week': ('randint', 0, 7),
+            'attack_type': ('const', 'data_exfiltration')
+        }
+    }
+    
     def __init__(self, model_dir='./models', data_dir='./data/datasets'):
         self.model_dir = model_dir
         self.data_dir = data_dir
@@ -24,98 +100,23 @@ class AttackClassifier:
         self.scaler = StandardScaler()
         self.label_encoder = LabelEncoder()
         self.feature_names = []
+        self.feature_cache_key = None
+        self.compression = None
         
-    def generate_attack_dataset(self, n_samples=5000):
-        """Generate dataset with labeled attack types"""
+    def generate_attack_dataset(self, n_samples=5000, seed=42):
+        """Generate dataset with labeled attack types (reproducible for a seed)"""
         print(f"\n🔄 Generating attack classification dataset...")
         
-        data = []
-        attack_types = ['dos', 'port_scan', 'brute_force', 'data_exfiltration']
+        rng = np.random.default_rng(seed)
+        attack_types = list(self.ATTACK_PROFILES)
         samples_per_type = n_samples // len(attack_types)
         
-        for attack_type in attack_types:
-            for _ in range(samples_per_type):
-                if attack_type == 'dos':
-                    record = {
-                        'source_port': np.random.randint(1024, 65535),
-                        'dest_port': np.random.choice([80, 443]),
-                        'protocol': 1,  # TCP
-                        'packet_size': np.random.normal(100, 50),
-                        'packets': np.random.randint(1000, 10000),
-                        'bytes': np.random.randint(100000, 1000000),
-                        'duration': np.random.uniform(0.01, 0.5),
-                        'flag_count': np.random.randint(5, 15),
-                        'syn_flag': 1,
-                        'ack_flag': 0,
-                        'rst_flag': np.random.choice([0, 1]),
-                        'connection_rate': np.random.uniform(50, 200),
-                        'hour': np.random.randint(0, 24),
-                        'day_of_week': np.random.randint(0, 7),
-                        'attack_type': 'dos'
-                    }
-                elif attack_type == 'port_scan':
-                    record = {
-                        'source_port': np.random.randint(1024, 65535),
-                        'dest_port': np.random.randint(1, 65535),
-                        'protocol': 1,  # TCP
-                        'packet_size': np.random.normal(64, 20),
-                        'packets': np.random.randint(1, 5),
-                        'bytes': np.random.randint(64, 500),
-                        'duration': np.random.uniform(0.001, 0.1),
-                        'flag_count': np.random.randint(1, 3),
-                        'syn_flag': 1,
-                        'ack_flag': 0,
-                        'rst_flag': 1,
-                        'connection_rate': np.random.uniform(10, 50),
-                        'hour': np.random.randint(0, 24),
-                        'day_of_week': np.random.randint(0, 7),
-                        'attack_type': 'port_scan'
-                    }
-                elif attack_type == 'brute_force':
-                    record = {
-                        'source_port': np.random.randint(1024, 65535),
-                        'dest_port': np.random.choice([22, 3389, 21, 23]),
-                        'protocol': np.random.choice([1, 5]),  # TCP or SSH
-                        'packet_size': np.random.normal(300, 100),
-                        'packets': np.random.randint(5, 50),
-                        'bytes': np.random.randint(1000, 10000),
-                        'duration': np.random.uniform(1.0, 10.0),
-                        'flag_count': np.random.randint(3, 10),
-                        'syn_flag': 1,
-                        'ack_flag': 1,
-                        'rst_flag': np.random.choice([0, 1]),
-                        'connection_rate': np.random.uniform(20, 100),
-                        'hour': np.random.randint(0, 24),
-                        'day_of_week': np.random.randint(0, 7),
-                        'attack_type': 'brute_force'
-                    }
-                else:  # data_exfiltration
-                    record = {
-                        'source_port': np.random.randint(1024, 65535),
-                        'dest_port': np.random.choice([80, 443, 8080]),
-                        'protocol': np.random.choice([3, 4]),  # HTTP or HTTPS
-                        'packet_size': np.random.normal(1400, 200),
-                        'packets': np.random.randint(500, 5000),
-                        'bytes': np.random.randint(500000, 5000000),
-                        'duration': np.random.uniform(10.0, 300.0),
-                        'flag_count': np.random.randint(2, 5),
-                        'syn_flag': 1,
-                        'ack_flag': 1,
-                        'rst_flag': 0,
-                        'connection_rate': np.random.uniform(1, 10),
-                        'hour': np.random.randint(0, 24),
-                        'day_of_week': np.random.randint(0, 7),
-                        'attack_type': 'data_exfiltration'
-                    }
-                
-                data.append(record)
-        
-        df = pd.DataFrame(data)
-        df = df.sample(frac=1, random_state=42).reset_index(drop=True)
+        # Equal rows per attack type, in shuffled order
+        assignment = rng.permutation(np.repeat(np.arange(len(attack_types)), samples_per_type))
+        df = sample_profiles(rng, list(self.ATTACK_PROFILES.values()), assignment)
         
         # Save dataset
-        filepath = os.path.join(self.data_dir, 'attack_classification.csv')
-        df.to_csv(filepath, index=False)
+        filepath = write_dataset(df, self.data_dir, 'attack_classification')
         
         print(f"✅ Attack classification dataset generated: {filepath}")
         print(f"   Total samples: {len(df)}")
@@ -125,30 +126,50 @@ class AttackClassifier:
         
         return df
     
-    def train_model(self, data):
-        """Train Random Forest classifier"""
-        print(f"\n🤖 Training Attack Type Classifier...")
-        
+    def prepare_features(self, data):
+        """Encode labels, split and scale the dataset"""
         # Prepare features and labels
         X = data.drop('attack_type', axis=1)
         y = data['attack_type']
         
-        self.feature_names = X.columns.tolist()
-        
         # Encode labels
         y_encoded = self.label_encoder.fit_transform(y)
         
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded
-        )
+        # Split data and scale features
+        features = split_and_scale(X, y_encoded, self.scaler, test_size=0.2, random_state=42, stratify=True)
+        features.label_encoder = self.label_encoder
+        return features
+    
+    def load_features(self, filename='attack_classification'):
+        """Prepared matrices from the feature cache (built on a miss)"""
+        info = dataset_info(self.data_dir, filename)
+        if info is None:
+            raise FileNotFoundError(f"Dataset not found: {os.path.join(self.data_dir, filename)}")
+        
+        schema = {
+            'trainer': 'attack_classifier',
+            'columns': info['columns'],
+            'target': 'attack_type',
+            'test_size': 0.2,
+            'random_state': 42
+        }
+        return load_or_build(self.data_dir, filename, schema, self.prepare_features)
+    
+    def train_model(self, data=None, n_jobs=-1, features=None, compress=None):
+        """Train Random Forest classifier (on data, or on already prepared features)"""
+        print(f"\n🤖 Training Attack Type Classifier...")
         
-        print(f"   Training samples: {len(X_train)}")
-        print(f"   Test samples: {len(X_test)}")
+        features = features or self.prepare_features(data)
+        self.scaler = features.scaler
+        self.label_encoder = features.label_encoder
+        self.feature_names = features.feature_names
+        self.feature_cache_key = features.key
         
-        # Scale features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
+        X_train_scaled, X_test_scaled = features.X_train, features.X_test
+        y_train, y_test = features.y_train, features.y_test
+        
+        print(f"   Training samples: {len(X_train_scaled)}")
+        print(f"   Test samples: {len(X_test_scaled)}")
         
         # Train Random Forest
         self.model = RandomForestClassifier(
@@ -157,7 +178,7 @@ class AttackClassifier:
             min_samples_split=5,
             min_samples_leaf=2,
             random_state=42,
-            n_jobs=-1,
+            n_jobs=n_jobs,
             verbose=1
         )
         
@@ -166,7 +187,45 @@ class AttackClassifier:
         print("✅ Model training complete!")
         
         # Evaluate
-        return self.evaluate_model(X_test_scaled, y_test)
+        metrics = self.evaluate_model(X_test_scaled, y_test)
+        
+        compress = Config.ATTACK_COMPRESSION_ENABLED if compress is None else compress
+        if compress:
+            metrics.update(self.compress_model(features, n_jobs=n_jobs))
+        return metrics
+    
+    def compress_model(self, features, latency_budget_ms=None, accuracy_tolerance=None, n_jobs=-1):
+        """Replace the full forest with the best smaller variant within the latency budget"""
+        latency_budget_ms = Config.ATTACK_LATENCY_BUDGET_MS if latency_budget_ms is None else latency_budget_ms
+        accuracy_tolerance = Config.ATTACK_ACCURACY_TOLERANCE if accuracy_tolerance is None else accuracy_tolerance
+        
+        print(f"\n🗜️  Compressing forest (budget {latency_budget_ms} ms/row, tolerance {accuracy_tolerance:.2%})...")
+        self.model, self.compression = compress_forest(
+            self.model, features.X_train, features.y_train, features.X_test, features.y_test,
+            latency_budget_ms=latency_budget_ms,
+            accuracy_tolerance=accuracy_tolerance,
+            n_jobs=n_jobs
+        )
+        
+        print(f"   {'Variant':16s} {'Trees':>6s} {'Nodes':>8s} {'Accuracy':>9s} {'Latency':>10s}")
+        for candidate in self.compression['candidates']:
+            marker = '👉' if candidate['name'] == self.compression['selected'] else '  '
+            print(f" {marker}{candidate['name']:16s} {candidate['trees']:>6d} {candidate['nodes']:>8,} "
+                  f"{candidate['accuracy']:>9.4f} {candidate['latencyMs']:>8.3f}ms")
+        if not self.compression['withinBudget']:
+            print(f"⚠️  No variant within the accuracy tolerance meets the latency budget; serving the fastest one")
+        
+        # Tree subsets were picked on half of the test split, so only the
+        # other half (the one every candidate was scored on) is unbiased
+        selected = next(c for c in self.compression['candidates'] if c['name'] == self.compression['selected'])
+        accuracy = selected['accuracy']
+        print(f"✅ Serving {self.compression['selected']} (accuracy {accuracy:.4f} on {self.compression['evaluationRows']} held-out rows)")
+        
+        return {
+            'full_accuracy': self.compression['candidates'][0]['accuracy'],
+            'accuracy': accuracy,
+            'variant': self.compression['selected']
+        }
     
     def evaluate_model(self, X_test, y_test):
         """Evaluate model performance"""
@@ -217,15 +276,17 @@ class AttackClassifier:
         encoder_file = os.path.join(self.model_dir, f'attack_encoder_{version}.pkl')
         features_file = os.path.join(self.model_dir, f'attack_features_{version}.json')
         
-        joblib.dump(self.model, model_file)
-        joblib.dump(self.scaler, scaler_file)
-        joblib.dump(self.label_encoder, encoder_file)
+        dump_artifact(self.model, model_file)
+        dump_artifact(self.scaler, scaler_file)
+        dump_artifact(self.label_encoder, encoder_file)
         
         import json
         with open(features_file, 'w') as f:
             json.dump({
                 'features': self.feature_names,
-                'classes': self.label_encoder.classes_.tolist()
+                'classes': self.label_encoder.classes_.tolist(),
+                'featureCache': self.feature_cache_key,
+                'compression': self.compression
             }, f, indent=2)
         
         print(f"✅ Model saved: {model_file}")
@@ -244,8 +305,8 @@ def main():
     # Generate dataset
     data = classifier.generate_attack_dataset(n_samples=5000)
     
-    # Train model
-    metrics = classifier.train_model(data)
+    # Train model (preprocessed matrices are cached per dataset)
+    metrics = classifier.train_model(features=classifier.load_features())
     
     # Save model
     classifier.save_model(version='1.0.0')
@@ -3,12 +3,12 @@ Train AI/ML model for network anomaly detection
 """
 import os
 import numpy as np
-import pandas as pd
 from datetime import datetime
-import joblib
+from services.model_store import dump_artifact
+from dataset_store import dataset_path, dataset_info, read_dataset
+from feature_cache import PROTOCOL_MAP, load_or_build, split_and_scale
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, precision_score, recall_score, f1_score
 
 class ModelTrainer:
@@ -22,25 +22,23 @@ class ModelTrainer:
         self.model = None
         self.scaler = StandardScaler()
         self.feature_names = []
+        self.feature_cache_key = None
         
         print(f"📁 Model directory: {model_dir}")
         print(f"📁 Data directory: {data_dir}")
     
-    def load_data(self, filename='synthetic_network_traffic.csv'):
-        """Load training data"""
-        filepath = os.path.join(self.data_dir, filename)
+    def load_data(self, filename='synthetic_network_traffic', columns=None):
+        """Load training data (only the given columns; hour/day_of_week come precomputed)"""
+        filepath = dataset_path(self.data_dir, filename)
         
-        if not os.path.exists(filepath):
-            raise FileNotFoundError(f"Dataset not found: {filepath}\nRun 'python prepare_dataset.py' first!")
+        if filepath is None:
+            raise FileNotFoundError(f"Dataset not found: {os.path.join(self.data_dir, filename)}\nRun 'python prepare_dataset.py' first!")
         
         print(f"\n📂 Loading dataset: {filepath}")
-        data = pd.read_csv(filepath)
+        data = read_dataset(self.data_dir, filename, columns=columns)
         
-        # Convert timestamp to features if it's a string
+        # The raw timestamp is only used through its derived features
         if 'timestamp' in data.columns:
-            data['timestamp'] = pd.to_datetime(data['timestamp'])
-            data['hour'] = data['timestamp'].dt.hour
-            data['day_of_week'] = data['timestamp'].dt.dayofweek
             data = data.drop('timestamp', axis=1)
         
         print(f"✅ Dataset loaded: {len(data)} samples, {len(data.columns)} columns")
@@ -64,8 +62,7 @@ class ModelTrainer:
         for col in categorical_cols:
             # Simple label encoding for protocol
             if col == 'protocol':
-                protocol_map = {'TCP': 1, 'UDP': 2, 'HTTP': 3, 'HTTPS': 4, 'SSH': 5, 'FTP': 6}
-                X[col] = X[col].map(protocol_map).fillna(0)
+                X[col] = X[col].map(PROTOCOL_MAP).fillna(0)
         
         # Store feature names
         self.feature_names = X.columns.tolist()
@@ -75,8 +72,33 @@ class ModelTrainer:
         
         return X, y
     
-    def train_model(self, X_train, contamination=0.1):
-        """Train Isolation Forest model"""
+    def load_features(self, filename='synthetic_network_traffic', test_size=0.2, random_state=42):
+        """Encoded, split and scaled matrices from the feature cache (built on a miss)"""
+        info = dataset_info(self.data_dir, filename)
+        if info is None:
+            raise FileNotFoundError(f"Dataset not found: {os.path.join(self.data_dir, filename)}\nRun 'python prepare_dataset.py' first!")
+        
+        schema = {
+            'trainer': 'anomaly_detector',
+            'columns': [col for col in info['columns'] if col != 'timestamp'],
+            'target': 'label',
+            'test_size': test_size,
+            'random_state': random_state
+        }
+        
+        def build(data):
+            print(f"\n📂 Preprocessing dataset: {info['path']}")
+            X, y = self.prepare_features(data)
+            return split_and_scale(X, y, self.scaler, test_size=test_size, random_state=random_state, stratify=True)
+        
+        features = load_or_build(self.data_dir, filename, schema, build)
+        self.scaler = features.scaler
+        self.feature_names = features.feature_names
+        self.feature_cache_key = features.key
+        return features
+    
+    def train_model(self, X_train, contamination=0.1, n_jobs=-1, scaled=False):
+        """Train Isolation Forest model (X_train already scaled if scaled=True)"""
         print(f"\n🤖 Training Isolation Forest model...")
         print(f"   Contamination rate: {contamination}")
         print(f"   Training samples: {len(X_train)}")
@@ -87,12 +109,12 @@ class ModelTrainer:
             max_samples=min(256, len(X_train)),
             random_state=42,
             n_estimators=100,
-            n_jobs=-1,
+            n_jobs=n_jobs,
             verbose=1
         )
         
         # Scale features
-        X_scaled = self.scaler.fit_transform(X_train)
+        X_scaled = X_train if scaled else self.scaler.fit_transform(X_train)
         
         # Train model
         print("Training in progress...")
@@ -100,12 +122,12 @@ class ModelTrainer:
         
         print("✅ Model training complete!")
     
-    def evaluate_model(self, X_test, y_test):
+    def evaluate_model(self, X_test, y_test, scaled=False):
         """Evaluate model performance"""
         print("\n📊 Evaluating model...")
         
         # Scale test data
-        X_scaled = self.scaler.transform(X_test)
+        X_scaled = X_test if scaled else self.scaler.transform(X_test)
         
         # Predict
         predictions = self.model.predict(X_scaled)
@@ -154,17 +176,17 @@ class ModelTrainer:
         features_file = os.path.join(self.model_dir, f'features_{version}.json')
         
         # Save model
-        joblib.dump(self.model, model_file)
+        dump_artifact(self.model, model_file)
         print(f"✅ Model saved: {model_file}")
         
         # Save scaler
-        joblib.dump(self.scaler, scaler_file)
+        dump_artifact(self.scaler, scaler_file)
         print(f"✅ Scaler saved: {scaler_file}")
         
         # Save feature names
         import json
         with open(features_file, 'w') as f:
-            json.dump({'features': self.feature_names}, f, indent=2)
+            json.dump({'features': self.feature_names, 'featureCache': self.feature_cache_key}, f, indent=2)
         print(f"✅ Features saved: {features_file}")
     
     def update_model_metrics(self, metrics, app_context=None):
@@ -207,26 +229,17 @@ def main():
     trainer = ModelTrainer()
     
     try:
-        # Load data
-        data = trainer.load_data()
-        
-        # Prepare features
-        X, y = trainer.prepare_features(data)
-        
-        # Split data
-        print("\n✂️  Splitting data into train/test sets...")
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, stratify=y
-        )
-        print(f"   Training set: {len(X_train)} samples")
-        print(f"   Test set: {len(X_test)} samples")
+        # Load, encode, split and scale data (cached per dataset)
+        features = trainer.load_features()
+        print(f"   Training set: {len(features.X_train)} samples")
+        print(f"   Test set: {len(features.X_test)} samples")
         
         # Train model
-        contamination = (y_train == 1).sum() / len(y_train)
-        trainer.train_model(X_train, contamination=contamination)
+        contamination = (features.y_train == 1).sum() / len(features.y_train)
+        trainer.train_model(features.X_train, contamination=contamination, scaled=True)
         
         # Evaluate model
-        metrics = trainer.evaluate_model(X_test, y_test)
+        metrics = trainer.evaluate_model(features.X_test, features.y_test, scaled=True)
         
         # Save model
         trainer.save_model(version='1.0.0')
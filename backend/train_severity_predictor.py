@@ -4,108 +4,104 @@ Dự đoán mức độ nghiêm trọng của alerts: Low, Medium, High, Critica
 """
 import os
 import numpy as np
-import pandas as pd
-import joblib
-from sklearn.ensemble import GradientBoostingClassifier
+from services.model_store import dump_artifact
+from prepare_dataset import sample_profiles
+from dataset_store import write_dataset, dataset_info
+from feature_cache import load_or_build, split_and_scale
+from boosting import boosting_engine, build_model, fit_model, boosting_iterations
 from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, accuracy_score
 
 class SeverityPredictor:
     """Train model to predict alert severity"""
     
-    def __init__(self, model_dir='./models', data_dir='./data/datasets'):
+    # Column specs of each severity (see prepare_dataset.sample_column)
+    SEVERITY_PROFILES = {
+        'low': {
+            'connection_rate': ('uniform', 0, 10),
+            'failed_attempts': ('randint', 1, 5),
+            'data_volume_mb': ('uniform', 0, 10),
+            'unique_sources': ('randint', 1, 3),
+            'unique_destinations': ('randint', 1, 3),
+            'unusual_ports': ('randint', 0, 2),
+            'time_window_minutes': ('uniform', 1, 60),
+            'is_encrypted': ('choice', [0, 1], [0.3, 0.7]),
+            'matches_known_signature': ('choice', [0, 1], [0.9, 0.1]),
+            'geographic_anomaly': ('choice', [0, 1], [0.95, 0.05]),
+            'affected_systems': ('randint', 1, 2),
+            'business_hours': ('choice', [0, 1], [0.3, 0.7]),
+            'severity': ('const', 'low')
+        },
+        'medium': {
+            'connection_rate': ('uniform', 10, 50),
+            'failed_attempts': ('randint', 5, 20),
+            'data_volume_mb': ('uniform', 10, 100),
+            'unique_sources': ('randint', 3, 10),
+            'unique_destinations': ('randint', 3, 10),
+            'unusual_ports': ('randint', 2, 5),
+            'time_window_minutes': ('uniform', 5, 30),
+            'is_encrypted': ('choice', [0, 1], [0.5, 0.5]),
+            'matches_known_signature': ('choice', [0, 1], [0.7, 0.3]),
+            'geographic_anomaly': ('choice', [0, 1], [0.8, 0.2]),
+            'affected_systems': ('randint', 2, 5),
+            'business_hours': ('choice', [0, 1], [0.5, 0.5]),
+            'severity': ('const', 'medium')
+        },
+        'high': {
+            'connection_rate': ('uniform', 50, 150),
+            'failed_attempts': ('randint', 20, 100),
+            'data_volume_mb': ('uniform', 100, 1000),
+            'unique_sources': ('randint', 10, 50),
+            'unique_destinations': ('randint', 10, 30),
+            'unusual_ports': ('randint', 5, 20),
+            'time_window_minutes': ('uniform', 1, 15),
+            'is_encrypted': ('choice', [0, 1], [0.7, 0.3]),
+            'matches_known_signature': ('choice', [0, 1], [0.4, 0.6]),
+            'geographic_anomaly': ('choice', [0, 1], [0.5, 0.5]),
+            'affected_systems': ('randint', 5, 20),
+            'business_hours': ('choice', [0, 1]),
+            'severity': ('const', 'high')
+        },
+        'critical': {
+            'connection_rate': ('uniform', 150, 500),
+            'failed_attempts': ('randint', 100, 1000),
+            'data_volume_mb': ('uniform', 1000, 10000),
+            'unique_sources': ('randint', 50, 200),
+            'unique_destinations': ('randint', 30, 100),
+            'unusual_ports': ('randint', 20, 100),
+            'time_window_minutes': ('uniform', 0.1, 5),
+            'is_encrypted': ('choice', [0, 1], [0.8, 0.2]),
+            'matches_known_signature': ('choice', [0, 1], [0.2, 0.8]),
+            'geographic_anomaly': ('choice', [0, 1], [0.3, 0.7]),
+            'affected_systems': ('randint', 20, 100),
+            'business_hours': ('choice', [0, 1]),
+            'severity': ('const', 'critical')
+        }
+    }
+    
+    def __init__(self, model_dir='./models', data_dir='./data/datasets', engine=None):
         self.model_dir = model_dir
         self.data_dir = data_dir
+        self.engine = boosting_engine(engine)
         os.makedirs(model_dir, exist_ok=True)
         
         self.model = None
         self.scaler = StandardScaler()
         self.label_encoder = LabelEncoder()
         self.feature_names = []
+        self.feature_cache_key = None
     
-    def generate_severity_dataset(self, n_samples=3000):
-        """Generate dataset with severity labels"""
+    def generate_severity_dataset(self, n_samples=3000, seed=42):
+        """Generate dataset with severity labels (reproducible for a seed)"""
         print(f"\n🔄 Generating severity prediction dataset...")
         
-        data = []
-        severities = ['low', 'medium', 'high', 'critical']
-        
-        for _ in range(n_samples):
-            severity = np.random.choice(severities, p=[0.3, 0.35, 0.25, 0.1])
-            
-            if severity == 'low':
-                record = {
-                    'connection_rate': np.random.uniform(0, 10),
-                    'failed_attempts': np.random.randint(1, 5),
-                    'data_volume_mb': np.random.uniform(0, 10),
-                    'unique_sources': np.random.randint(1, 3),
-                    'unique_destinations': np.random.randint(1, 3),
-                    'unusual_ports': np.random.randint(0, 2),
-                    'time_window_minutes': np.random.uniform(1, 60),
-                    'is_encrypted': np.random.choice([0, 1], p=[0.3, 0.7]),
-                    'matches_known_signature': np.random.choice([0, 1], p=[0.9, 0.1]),
-                    'geographic_anomaly': np.random.choice([0, 1], p=[0.95, 0.05]),
-                    'affected_systems': np.random.randint(1, 2),
-                    'business_hours': np.random.choice([0, 1], p=[0.3, 0.7]),
-                    'severity': 'low'
-                }
-            elif severity == 'medium':
-                record = {
-                    'connection_rate': np.random.uniform(10, 50),
-                    'failed_attempts': np.random.randint(5, 20),
-                    'data_volume_mb': np.random.uniform(10, 100),
-                    'unique_sources': np.random.randint(3, 10),
-                    'unique_destinations': np.random.randint(3, 10),
-                    'unusual_ports': np.random.randint(2, 5),
-                    'time_window_minutes': np.random.uniform(5, 30),
-                    'is_encrypted': np.random.choice([0, 1], p=[0.5, 0.5]),
-                    'matches_known_signature': np.random.choice([0, 1], p=[0.7, 0.3]),
-                    'geographic_anomaly': np.random.choice([0, 1], p=[0.8, 0.2]),
-                    'affected_systems': np.random.randint(2, 5),
-                    'business_hours': np.random.choice([0, 1], p=[0.5, 0.5]),
-                    'severity': 'medium'
-                }
-            elif severity == 'high':
-                record = {
-                    'connection_rate': np.random.uniform(50, 150),
-                    'failed_attempts': np.random.randint(20, 100),
-                    'data_volume_mb': np.random.uniform(100, 1000),
-                    'unique_sources': np.random.randint(10, 50),
-                    'unique_destinations': np.random.randint(10, 30),
-                    'unusual_ports': np.random.randint(5, 20),
-                    'time_window_minutes': np.random.uniform(1, 15),
-                    'is_encrypted': np.random.choice([0, 1], p=[0.7, 0.3]),
-                    'matches_known_signature': np.random.choice([0, 1], p=[0.4, 0.6]),
-                    'geographic_anomaly': np.random.choice([0, 1], p=[0.5, 0.5]),
-                    'affected_systems': np.random.randint(5, 20),
-                    'business_hours': np.random.choice([0, 1]),
-                    'severity': 'high'
-                }
-            else:  # critical
-                record = {
-                    'connection_rate': np.random.uniform(150, 500),
-                    'failed_attempts': np.random.randint(100, 1000),
-                    'data_volume_mb': np.random.uniform(1000, 10000),
-                    'unique_sources': np.random.randint(50, 200),
-                    'unique_destinations': np.random.randint(30, 100),
-                    'unusual_ports': np.random.randint(20, 100),
-                    'time_window_minutes': np.random.uniform(0.1, 5),
-                    'is_encrypted': np.random.choice([0, 1], p=[0.8, 0.2]),
-                    'matches_known_signature': np.random.choice([0, 1], p=[0.2, 0.8]),
-                    'geographic_anomaly': np.random.choice([0, 1], p=[0.3, 0.7]),
-                    'affected_systems': np.random.randint(20, 100),
-                    'business_hours': np.random.choice([0, 1]),
-                    'severity': 'critical'
-                }
-            
-            data.append(record)
-        
-        df = pd.DataFrame(data)
-        df = df.sample(frac=1, random_state=42).reset_index(drop=True)
-        
-        filepath = os.path.join(self.data_dir, 'severity_prediction.csv')
-        df.to_csv(filepath, index=False)
+        rng = np.random.default_rng(seed)
+        severities = list(self.SEVERITY_PROFILES)
+        
+        assignment = rng.choice(len(severities), size=n_samples, p=[0.3, 0.35, 0.25, 0.1])
+        df = sample_profiles(rng, list(self.SEVERITY_PROFILES.values()), assignment)
+        
+        filepath = write_dataset(df, self.data_dir, 'severity_prediction')
         
         print(f"✅ Severity dataset generated: {filepath}")
         print(f"   Total samples: {len(df)}")
@@ -115,26 +111,50 @@ class SeverityPredictor:
         
         return df
     
-    def train_model(self, data):
-        """Train Gradient Boosting classifier"""
-        print(f"\n🤖 Training Severity Prediction Model...")
-        
+    def prepare_features(self, data):
+        """Encode labels, split and scale the dataset"""
         X = data.drop('severity', axis=1)
         y = data['severity']
         
-        self.feature_names = X.columns.tolist()
         y_encoded = self.label_encoder.fit_transform(y)
         
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded
-        )
+        features = split_and_scale(X, y_encoded, self.scaler, test_size=0.2, random_state=42, stratify=True)
+        features.label_encoder = self.label_encoder
+        return features
+    
+    def load_features(self, filename='severity_prediction'):
+        """Prepared matrices from the feature cache (built on a miss)"""
+        info = dataset_info(self.data_dir, filename)
+        if info is None:
+            raise FileNotFoundError(f"Dataset not found: {os.path.join(self.data_dir, filename)}")
+        
+        schema = {
+            'trainer': 'severity_predictor',
+            'columns': info['columns'],
+            'target': 'severity',
+            'test_size': 0.2,
+            'random_state': 42
+        }
+        return load_or_build(self.data_dir, filename, schema, self.prepare_features)
+    
+    def train_model(self, data=None, features=None, n_jobs=-1):
+        """Train Gradient Boosting classifier (on data, or on already prepared features)"""
+        print(f"\n🤖 Training Severity Prediction Model ({self.engine} boosting)...")
+        
+        features = features or self.prepare_features(data)
+        self.scaler = features.scaler
+        self.label_encoder = features.label_encoder
+        self.feature_names = features.feature_names
+        self.feature_cache_key = features.key
         
-        print(f"   Training samples: {len(X_train)}")
+        X_train_scaled, X_test_scaled = features.X_train, features.X_test
+        y_train, y_test = features.y_train, features.y_test
         
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
+        print(f"   Training samples: {len(X_train_scaled)}")
         
-        self.model = GradientBoostingClassifier(
+        self.model = build_model(
+            'classifier',
+            engine=self.engine,
             n_estimators=150,
             learning_rate=0.1,
             max_depth=5,
@@ -143,8 +163,8 @@ class SeverityPredictor:
         )
         
         print("Training in progress...")
-        self.model.fit(X_train_scaled, y_train)
-        print("✅ Model training complete!")
+        fit_model(self.model, X_train_scaled, y_train, n_jobs=n_jobs)
+        print(f"✅ Model training complete! ({boosting_iterations(self.model)} boosting iterations)")
         
         return self.evaluate_model(X_test_scaled, y_test)
     
@@ -172,16 +192,19 @@ class SeverityPredictor:
         scaler_file = os.path.join(self.model_dir, f'severity_scaler_{version}.pkl')
         encoder_file = os.path.join(self.model_dir, f'severity_encoder_{version}.pkl')
         
-        joblib.dump(self.model, model_file)
-        joblib.dump(self.scaler, scaler_file)
-        joblib.dump(self.label_encoder, encoder_file)
+        dump_artifact(self.model, model_file)
+        dump_artifact(self.scaler, scaler_file)
+        dump_artifact(self.label_encoder, encoder_file)
         
         import json
         features_file = os.path.join(self.model_dir, f'severity_features_{version}.json')
         with open(features_file, 'w') as f:
             json.dump({
                 'features': self.feature_names,
-                'classes': self.label_encoder.classes_.tolist()
+                'classes': self.label_encoder.classes_.tolist(),
+                'engine': self.engine,
+                'iterations': boosting_iterations(self.model),
+                'featureCache': self.feature_cache_key
             }, f, indent=2)
         
         print(f"✅ All files saved successfully")
@@ -193,7 +216,7 @@ def main():
     
     predictor = SeverityPredictor()
     data = predictor.generate_severity_dataset(n_samples=3000)
-    metrics = predictor.train_model(data)
+    metrics = predictor.train_model(features=predictor.load_features())
     predictor.save_model(version='1.0.0')
     
     print("\n" + "=" * 60)
@@ -5,94 +5,85 @@ Dự đoán xu hướng network traffic để phát hiện anomalies sớm
 import os
 import numpy as np
 import pandas as pd
-import joblib
+from services.model_store import dump_artifact
+from dataset_store import write_dataset, dataset_info
+from feature_cache import load_or_build, split_and_scale
+from boosting import boosting_engine, build_model, fit_model, boosting_iterations
 from datetime import datetime, timedelta
-from sklearn.ensemble import GradientBoostingRegressor
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
 class TrafficForecaster:
     """Train model to forecast network traffic patterns"""
     
-    def __init__(self, model_dir='./models', data_dir='./data/datasets'):
+    def __init__(self, model_dir='./models', data_dir='./data/datasets', engine=None):
         self.model_dir = model_dir
         self.data_dir = data_dir
+        self.engine = boosting_engine(engine)
         os.makedirs(model_dir, exist_ok=True)
         
         self.model = None
         self.scaler = StandardScaler()
         self.feature_names = []
+        self.feature_cache_key = None
     
-    def generate_timeseries_dataset(self, n_days=30, samples_per_day=96):
-        """Generate time series traffic data (15-min intervals)"""
+    def generate_timeseries_dataset(self, n_days=30, samples_per_day=96, seed=42, end_time=None):
+        """Generate time series traffic data (15-min intervals, reproducible for a seed)"""
         print(f"\n🔄 Generating traffic forecasting dataset...")
         print(f"   Period: {n_days} days")
         print(f"   Samples per day: {samples_per_day} (15-min intervals)")
         
-        data = []
-        start_date = datetime.now() - timedelta(days=n_days)
+        rng = np.random.default_rng(seed)
+        start_date = pd.Timestamp(end_time or datetime.now()) - timedelta(days=n_days)
         
         total_samples = n_days * samples_per_day
-        
-        for i in range(total_samples):
-            timestamp = start_date + timedelta(minutes=15*i)
-            hour = timestamp.hour
-            day_of_week = timestamp.weekday()
-            day_of_month = timestamp.day
-            
-            # Base traffic with daily/weekly patterns
-            base_traffic = 100
-            
-            # Daily pattern (higher during business hours)
-            if 8 <= hour <= 18:
-                base_traffic *= np.random.uniform(2.0, 3.0)
-            elif 19 <= hour <= 23:
-                base_traffic *= np.random.uniform(1.5, 2.0)
-            else:
-                base_traffic *= np.random.uniform(0.5, 1.0)
-            
-            # Weekly pattern (lower on weekends)
-            if day_of_week >= 5:  # Weekend
-                base_traffic *= 0.6
-            
-            # Add some randomness
-            base_traffic *= np.random.uniform(0.8, 1.2)
-            
-            # Occasional spikes (simulate peaks)
-            if np.random.random() < 0.05:
-                base_traffic *= np.random.uniform(2.0, 4.0)
-            
-            record = {
-                'timestamp': timestamp,
-                'hour': hour,
-                'day_of_week': day_of_week,
-                'day_of_month': day_of_month,
-                'is_weekend': int(day_of_week >= 5),
-                'is_business_hours': int(8 <= hour <= 18),
-                'traffic_mbps': base_traffic,
-                'connections_count': int(base_traffic * np.random.uniform(5, 15)),
-                'packets_per_sec': int(base_traffic * np.random.uniform(50, 200)),
-                'avg_packet_size': np.random.uniform(400, 800),
-                'tcp_ratio': np.random.uniform(0.6, 0.9),
-                'udp_ratio': np.random.uniform(0.1, 0.3),
-                'http_ratio': np.random.uniform(0.3, 0.6),
-                # Lag features (previous intervals)
-                'traffic_lag_1': base_traffic * np.random.uniform(0.9, 1.1),
-                'traffic_lag_2': base_traffic * np.random.uniform(0.8, 1.2),
-                'traffic_lag_3': base_traffic * np.random.uniform(0.7, 1.3),
-            }
-            
-            data.append(record)
-        
-        df = pd.DataFrame(data)
+        timestamps = pd.date_range(start_date, periods=total_samples, freq='15min')
+        hour = timestamps.hour.to_numpy()
+        day_of_week = timestamps.dayofweek.to_numpy()
+        
+        # Daily pattern (higher during business hours)
+        business_hours = (hour >= 8) & (hour <= 18)
+        evening = (hour >= 19) & (hour <= 23)
+        low = np.select([business_hours, evening], [2.0, 1.5], 0.5)
+        high = np.select([business_hours, evening], [3.0, 2.0], 1.0)
+        base_traffic = 100 * rng.uniform(low, high)
+        
+        # Weekly pattern (lower on weekends)
+        is_weekend = day_of_week >= 5
+        base_traffic[is_weekend] *= 0.6
+        
+        # Add some randomness
+        base_traffic *= rng.uniform(0.8, 1.2, size=total_samples)
+        
+        # Occasional spikes (simulate peaks)
+        spikes = rng.random(total_samples) < 0.05
+        base_traffic[spikes] *= rng.uniform(2.0, 4.0, size=spikes.sum())
+        
+        df = pd.DataFrame({
+            'timestamp': timestamps,
+            'hour': hour,
+            'day_of_week': day_of_week,
+            'day_of_month': timestamps.day.to_numpy(),
+            'is_weekend': is_weekend.astype(int),
+            'is_business_hours': business_hours.astype(int),
+            'traffic_mbps': base_traffic,
+            'connections_count': (base_traffic * rng.uniform(5, 15, size=total_samples)).astype(int),
+            'packets_per_sec': (base_traffic * rng.uniform(50, 200, size=total_samples)).astype(int),
+            'avg_packet_size': rng.uniform(400, 800, size=total_samples),
+            'tcp_ratio': rng.uniform(0.6, 0.9, size=total_samples),
+            'udp_ratio': rng.uniform(0.1, 0.3, size=total_samples),
+            'http_ratio': rng.uniform(0.3, 0.6, size=total_samples),
+            # Lag features (previous intervals)
+            'traffic_lag_1': base_traffic * rng.uniform(0.9, 1.1, size=total_samples),
+            'traffic_lag_2': base_traffic * rng.uniform(0.8, 1.2, size=total_samples),
+            'traffic_lag_3': base_traffic * rng.uniform(0.7, 1.3, size=total_samples),
+        })
         
         # Create target (next interval's traffic)
         df['target_traffic'] = df['traffic_mbps'].shift(-1)
         df = df.dropna()
         
-        filepath = os.path.join(self.data_dir, 'traffic_forecasting.csv')
-        df.to_csv(filepath, index=False)
+        filepath = write_dataset(df, self.data_dir, 'traffic_forecasting')
         
         print(f"✅ Traffic forecasting dataset generated: {filepath}")
         print(f"   Total samples: {len(df):,}")
@@ -100,10 +91,8 @@ class TrafficForecaster:
         
         return df
     
-    def train_model(self, data):
-        """Train Gradient Boosting regressor"""
-        print(f"\n🤖 Training Traffic Forecasting Model...")
-        
+    def prepare_features(self, data):
+        """Split and scale the dataset"""
         # Drop timestamp and target
         feature_cols = [col for col in data.columns 
                        if col not in ['timestamp', 'target_traffic']]
@@ -111,19 +100,42 @@ class TrafficForecaster:
         X = data[feature_cols]
         y = data['target_traffic']
         
-        self.feature_names = X.columns.tolist()
+        # Time series - don't shuffle
+        return split_and_scale(X, y, self.scaler, test_size=0.2, random_state=42, shuffle=False)
+    
+    def load_features(self, filename='traffic_forecasting'):
+        """Prepared matrices from the feature cache (built on a miss)"""
+        info = dataset_info(self.data_dir, filename)
+        if info is None:
+            raise FileNotFoundError(f"Dataset not found: {os.path.join(self.data_dir, filename)}")
+        
+        schema = {
+            'trainer': 'traffic_forecaster',
+            'columns': [col for col in info['columns'] if col != 'timestamp'],
+            'target': 'target_traffic',
+            'test_size': 0.2,
+            'shuffle': False
+        }
+        return load_or_build(self.data_dir, filename, schema, self.prepare_features)
+    
+    def train_model(self, data=None, features=None, n_jobs=-1):
+        """Train Gradient Boosting regressor (on data, or on already prepared features)"""
+        print(f"\n🤖 Training Traffic Forecasting Model ({self.engine} boosting)...")
         
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, shuffle=False  # Time series - don't shuffle
-        )
+        features = features or self.prepare_features(data)
+        self.scaler = features.scaler
+        self.feature_names = features.feature_names
+        self.feature_cache_key = features.key
         
-        print(f"   Training samples: {len(X_train):,}")
-        print(f"   Test samples: {len(X_test):,}")
+        X_train_scaled, X_test_scaled = features.X_train, features.X_test
+        y_train, y_test = features.y_train, features.y_test
         
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
+        print(f"   Training samples: {len(X_train_scaled):,}")
+        print(f"   Test samples: {len(X_test_scaled):,}")
         
-        self.model = GradientBoostingRegressor(
+        self.model = build_model(
+            'regressor',
+            engine=self.engine,
             n_estimators=200,
             learning_rate=0.1,
             max_depth=5,
@@ -133,8 +145,8 @@ class TrafficForecaster:
         )
         
         print("Training in progress...")
-        self.model.fit(X_train_scaled, y_train)
-        print("✅ Model training complete!")
+        fit_model(self.model, X_train_scaled, y_train, n_jobs=n_jobs)
+        print(f"✅ Model training complete! ({boosting_iterations(self.model)} boosting iterations)")
         
         return self.evaluate_model(X_test_scaled, y_test)
     
@@ -156,7 +168,7 @@ class TrafficForecaster:
         # Show sample predictions
         print(f"\n🔍 Sample Predictions:")
         for i in range(min(5, len(y_test))):
-            actual = y_test.iloc[i]
+            actual = y_test[i]
             predicted = y_pred[i]
             error = abs(actual - predicted)
             print(f"   Actual: {actual:.2f} Mbps | Predicted: {predicted:.2f} Mbps | Error: {error:.2f}")
@@ -174,13 +186,18 @@ class TrafficForecaster:
         model_file = os.path.join(self.model_dir, f'traffic_forecaster_{version}.pkl')
         scaler_file = os.path.join(self.model_dir, f'traffic_scaler_{version}.pkl')
         
-        joblib.dump(self.model, model_file)
-        joblib.dump(self.scaler, scaler_file)
+        dump_artifact(self.model, model_file)
+        dump_artifact(self.scaler, scaler_file)
         
         import json
         features_file = os.path.join(self.model_dir, f'traffic_features_{version}.json')
         with open(features_file, 'w') as f:
-            json.dump({'features': self.feature_names}, f, indent=2)
+            json.dump({
+                'features': self.feature_names,
+                'engine': self.engine,
+                'iterations': boosting_iterations(self.model),
+                'featureCache': self.feature_cache_key
+            }, f, indent=2)
         
         print(f"✅ Model saved: {model_file}")
         print(f"✅ Scaler saved: {scaler_file}")
@@ -193,7 +210,7 @@ def main():
     
     forecaster = TrafficForecaster()
     data = forecaster.generate_timeseries_dataset(n_days=30, samples_per_day=96)
-    metrics = forecaster.train_model(data)
+    metrics = forecaster.train_model(features=forecaster.load_features())
     forecaster.save_model(version='1.0.0')
     
     print("\n" + "=" * 60)
@@ -9,6 +9,7 @@ from models.alert import Alert
 from models.network_traffic import NetworkTraffic
 from models.connection import Connection
 from database import db
+from services import traffic_rollups
 
 class DataGenerator:
     """Generate mock data for testing"""
@@ -122,6 +123,9 @@ class DataGenerator:
         db.session.bulk_save_objects(traffic_records)
         db.session.commit()
         
+        # Historical rows bypass ingest, so roll them up in one pass
+        traffic_rollups.backfill(db.session, datetime.utcnow() - timedelta(seconds=count * 10))
+        
         print(f"✅ Generated {count} traffic records")
         return traffic_records
     